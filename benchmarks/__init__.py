@@ -0,0 +1,4 @@
+"""package benchmarks
+
+Benchmarks of the program (run as modules, e.g. python3 -m benchmarks.bench_hashing)
+"""
@@ -0,0 +1,68 @@
+"""script bench_hashing
+
+Benchmark of throughput of computing digests of files for growing number of threads
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from file_manager.dedup import ContentHasher, DuplicateFinder
+from file_manager.inventory import FileInventory
+from file_manager.utils import get_all_files
+
+
+def prepare_corpus(path, num_of_files, file_size):
+    """Function to create files with the same size (pairs of files have identical content)
+
+    Args:
+        path (str): path to directory
+        num_of_files (int): number of files
+        file_size (int): size of every file
+    """
+    for i in range(num_of_files):
+        if i % 2 == 0:
+            content = os.urandom(file_size)
+        with open(os.path.join(path, "file{}".format(i)), "wb") as f:
+            f.write(content)
+
+def benchmark(path, jobs, mmap_threshold):
+    """Function to measure time of finding duplicates
+
+    Args:
+        path (str): path to directory with files
+        jobs (int): number of threads
+        mmap_threshold (int): minimal size of memory-mapped file
+
+    Returns:
+        float: time in seconds
+    """
+    inventory = FileInventory(get_all_files(path))
+    finder = DuplicateFinder(ContentHasher(mmap_threshold=mmap_threshold), jobs=jobs)
+    start = time.perf_counter()
+    finder.find(inventory, inventory.indices())
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=64)
+    parser.add_argument("--size", type=int, default=8 * 1024 * 1024)
+    parser.add_argument("--jobs", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--mmap_threshold", type=int, default=64 * 1024 * 1024)
+    parser.add_argument("--path", type=str, default=None, help="directory with existing corpus")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.path
+        if path is None:
+            path = tmp
+            prepare_corpus(path, args.files, args.size)
+        total = sum(record.size for record in get_all_files(path))
+
+        print("{:>5} {:>10} {:>10}".format("jobs", "time [s]", "MB/s"))
+        for jobs in args.jobs:
+            seconds = benchmark(path, jobs, args.mmap_threshold)
+            print("{:>5} {:>10.3f} {:>10.1f}".format(jobs, seconds, total / seconds / 1e6))
+
+if __name__ == "__main__":
+    main()
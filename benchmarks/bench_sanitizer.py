@@ -0,0 +1,91 @@
+"""script bench_sanitizer
+
+Benchmark of detecting and correcting wrong names of files: loop of str.replace versus compiled sanitizer
+"""
+import argparse
+import random
+import string
+import time
+
+from file_manager.changer import FileNameSanitizer
+from file_manager.utils import load_configuration
+
+
+def generate_names(num_of_names, bad_characters, seed=0):
+    """Function to generate random names of files (about 10% of them are wrong)
+
+    Args:
+        num_of_names (int): number of names
+        bad_characters (set(str)): wrong characters in files' names
+        seed (int, optional): seed of random generator. Defaults to 0.
+
+    Returns:
+        list(str): names of files
+    """
+    generator = random.Random(seed)
+    bad_characters = sorted(bad_characters)
+    names = list()
+    for _ in range(num_of_names):
+        name = "".join(generator.choices(string.ascii_letters + string.digits + "._", k=generator.randint(5, 30)))
+        if generator.random() < 0.1:
+            position = generator.randrange(len(name))
+            name = name[:position] + generator.choice(bad_characters) + name[position:]
+        names.append(name)
+    return names
+
+def old_sanitize(names, bad_characters, substitute):
+    """Function to correct names like previous implementation (set intersection and loop of str.replace)
+
+    Args:
+        names (list(str)): names of files
+        bad_characters (set(str)): wrong characters in files' names
+        substitute (str): substitute of wrong characters
+
+    Returns:
+        list(str): corrected wrong names
+    """
+    result = list()
+    for name in names:
+        if len(bad_characters.intersection(name)) > 0:
+            for char in bad_characters:
+                name = name.replace(char, substitute)
+            result.append(name)
+    return result
+
+def new_sanitize(names, sanitizer):
+    """Function to correct names by compiled sanitizer
+
+    Args:
+        names (list(str)): names of files
+        sanitizer (FileNameSanitizer): sanitizer of names
+
+    Returns:
+        list(str): corrected wrong names
+    """
+    return [sanitizer.sanitize(name) for name in names if sanitizer.is_wrong(name)]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--names", type=int, default=1000000)
+    parser.add_argument("--config", type=str, default="config/clean_files.ini")
+    args = parser.parse_args()
+
+    (_, bad_characters, substitute, _) = load_configuration(args.config)
+    names = generate_names(args.names, bad_characters)
+
+    start = time.perf_counter()
+    old = old_sanitize(names, bad_characters, substitute)
+    old_time = time.perf_counter() - start
+
+    sanitizer = FileNameSanitizer(bad_characters, substitute)
+    start = time.perf_counter()
+    new = new_sanitize(names, sanitizer)
+    new_time = time.perf_counter() - start
+
+    assert old == new
+    print("names: {}, wrong: {}".format(len(names), len(new)))
+    print("str.replace loop: {:.3f} s".format(old_time))
+    print("compiled sanitizer: {:.3f} s ({:.1f}x)".format(new_time, old_time / new_time))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""script bench_stages
+
+Benchmark of every stage of FileManager and of the whole run on generated corpus (results in JSON format)
+"""
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.corpus import add_arguments, generate_from_arguments, spec_from_arguments
+from file_manager.inventory import FileInventory
+from file_manager.manager import FileManager
+from file_manager.mover import move_files_to_main_dir
+from file_manager.utils import get_all_files
+
+# stages in the order of FileManager.manage_files (after scanning)
+STAGES = (
+    ("classify", lambda manager, roots: manager.classify_files(force=True)),
+    ("remove_empty_files", lambda manager, roots: manager.remove_empty_files()),
+    ("remove_temporary_files", lambda manager, roots: manager.remove_temporary_files()),
+    ("remove_duplicate_files", lambda manager, roots: manager.remove_duplicate_files()),
+    ("resolve_name_conflicts", lambda manager, roots: manager.resolve_name_conflicts(roots)),
+    ("change_bad_files_permissions", lambda manager, roots: manager.change_bad_files_permissions()),
+    ("rename_wrong_named_files", lambda manager, roots: manager.rename_wrong_named_files()),
+)
+
+
+def create_manager(args, inventory):
+    """Function to create manager which performs all actions without asking
+
+    Args:
+        args (argparse.Namespace): parsed arguments
+        inventory (FileInventory): inventory of files
+
+    Returns:
+        FileManager: manager of files
+    """
+    manager = FileManager(args.conf, inventory)
+    manager.set_parameters(action_duplicate=args.same_action, action_name_conflict=args.name_conflict)
+    manager.set_jobs(args.jobs)
+    return manager
+
+def measure_stages(roots, args):
+    """Function to measure time of scanning, every stage and moving files (one after another)
+
+    Args:
+        roots (list(str)): paths to main and copy directories
+        args (argparse.Namespace): parsed arguments
+
+    Returns:
+        dict(str, float): time of every stage in seconds
+    """
+    times = dict()
+    start = time.perf_counter()
+    inventory = FileInventory(get_all_files(roots[0], roots[1:]))
+    times["scan"] = time.perf_counter() - start
+
+    manager = create_manager(args, inventory)
+    for (name, stage) in STAGES:
+        start = time.perf_counter()
+        stage(manager, roots)
+        times[name] = time.perf_counter() - start
+    manager.directories.close()
+
+    start = time.perf_counter()
+    move_files_to_main_dir(roots[0], roots[1:], inventory, args.jobs)
+    times["move"] = time.perf_counter() - start
+    return times
+
+def measure_total(roots, args):
+    """Function to measure time of the whole run (scanning, managing and moving files)
+
+    Args:
+        roots (list(str)): paths to main and copy directories
+        args (argparse.Namespace): parsed arguments
+
+    Returns:
+        float: time in seconds
+    """
+    start = time.perf_counter()
+    manager = create_manager(args, FileInventory(get_all_files(roots[0], roots[1:])))
+    manager.manage_files(roots)
+    move_files_to_main_dir(roots[0], roots[1:], manager.get_inventory(), args.jobs)
+    return time.perf_counter() - start
+
+def describe(samples):
+    """Function to summarize repeated measurements
+
+    Args:
+        samples (list(float)): times in seconds
+
+    Returns:
+        dict: minimal, median and all times
+    """
+    return {"min": min(samples), "median": statistics.median(samples), "runs": samples}
+
+def current_commit():
+    """Function to get identifier of current commit (if the program is run from git repository)
+
+    Returns:
+        str: identifier of commit (None if unknown)
+    """
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(args):
+    """Function to run benchmark (every measurement uses freshly generated corpus)
+
+    Args:
+        args (argparse.Namespace): parsed arguments
+
+    Returns:
+        dict: results
+    """
+    stages = dict()
+    totals = list()
+    corpus = None
+    base = args.path if args.path is not None else None
+    for _ in range(args.repeat):
+        for total in (False, True):
+            with tempfile.TemporaryDirectory(dir=base) as path:
+                corpus = generate_from_arguments(path, args)
+                roots = corpus["roots"]
+                # messages about files are not measured
+                with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                    if total:
+                        totals.append(measure_total(roots, args))
+                    else:
+                        for name, seconds in measure_stages(roots, args).items():
+                            stages.setdefault(name, []).append(seconds)
+
+    corpus.pop("roots")
+    return {
+        "benchmark": "stages",
+        "commit": current_commit(),
+        "date": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "seed": args.seed,
+        "jobs": args.jobs,
+        "spec": spec_from_arguments(args).to_dict(),
+        "corpus": corpus,
+        "stages": {name: describe(samples) for name, samples in stages.items()},
+        "total": dict(describe(totals), files_per_second=corpus["files"] / statistics.median(totals)),
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    add_arguments(parser)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--jobs", type=int, default=1)
+    parser.add_argument("--same_action", type=str, default="old", choices=["old", "new", "link", "none"])
+    parser.add_argument("--name_conflict", type=str, default="both", choices=["newer", "older", "both"])
+    parser.add_argument("--path", type=str, default=None, help="directory in which corpus is generated (e.g. on tested filesystem)")
+    parser.add_argument("--output", type=str, default=None, help="file with results in JSON format (standard output if not given)")
+    args = parser.parse_args()
+
+    results = run(args)
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""script compare
+
+Comparison of two results of benchmark (e.g. from two commits) saved in JSON format
+"""
+import argparse
+import json
+import sys
+
+
+def load_times(path):
+    """Function to load median times of stages and of the whole run
+
+    Args:
+        path (str): file with results
+
+    Returns:
+        dict(str, float): median time of every measurement in seconds
+    """
+    with open(path, "r") as f:
+        results = json.load(f)
+    times = {name: result["median"] for name, result in results.get("stages", {}).items()}
+    if "total" in results:
+        times["total"] = results["total"]["median"]
+    return times
+
+def compare(old, new, threshold):
+    """Function to compare times
+
+    Args:
+        old (dict(str, float)): times of base results
+        new (dict(str, float)): times of compared results
+        threshold (float): relative growth of time treated as regression
+
+    Returns:
+        list(tuple(str, float, float, float, bool)): name, old time, new time, ratio and whether it is regression
+    """
+    rows = list()
+    for name in old:
+        if name in new:
+            ratio = new[name] / old[name] if old[name] > 0 else float("inf")
+            rows.append((name, old[name], new[name], ratio, ratio > 1 + threshold))
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("old", type=str, help="base results")
+    parser.add_argument("new", type=str, help="compared results")
+    parser.add_argument("--threshold", type=float, default=0.1, help="relative growth of time treated as regression")
+    args = parser.parse_args()
+
+    rows = compare(load_times(args.old), load_times(args.new), args.threshold)
+    print("{:<30} {:>10} {:>10} {:>8}".format("stage", "old [s]", "new [s]", "ratio"))
+    for (name, old, new, ratio, regression) in rows:
+        print("{:<30} {:>10.4f} {:>10.4f} {:>8.2f}{}".format(name, old, new, ratio, "  REGRESSION" if regression else ""))
+    sys.exit(1 if any(row[4] for row in rows) else 0)
+
+if __name__ == "__main__":
+    main()
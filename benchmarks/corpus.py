@@ -0,0 +1,194 @@
+"""script corpus
+
+Deterministic (seeded) generator of synthetic directory trees used by benchmarks
+"""
+import argparse
+import json
+import math
+import os
+import random
+
+from file_manager.utils import load_configuration, perm_to_num
+
+# fixed times of modification, so identical seeds give identical trees
+BASE_TIME_NS = 1600000000 * 10**9
+
+
+class CorpusSpec:
+    """class CorpusSpec
+
+    Class to describe generated corpus: shape of directory tree, distribution of sizes
+    (log-normal, limited by max_size) and ratios of special files
+    """
+    def __init__(self, files=10000, depth=3, fanout=4, copy_dirs=1, median_size=4096, size_sigma=1.5,
+                 max_size=16 * 1024 * 1024, duplicate_ratio=0.1, same_size_ratio=0.05, empty_ratio=0.01,
+                 temporary_ratio=0.02, bad_name_ratio=0.02, bad_permissions_ratio=0.05):
+        """init method
+
+        Args:
+            files (int, optional): number of files. Defaults to 10000.
+            depth (int, optional): depth of directory tree under every root. Defaults to 3.
+            fanout (int, optional): number of subdirectories of every directory. Defaults to 4.
+            copy_dirs (int, optional): number of copy directories (Y1, Y2,...). Defaults to 1.
+            median_size (int, optional): median size of file in bytes. Defaults to 4096.
+            size_sigma (float, optional): sigma of log-normal distribution of sizes. Defaults to 1.5.
+            max_size (int, optional): maximal size of file in bytes. Defaults to 16 MiB.
+            duplicate_ratio (float, optional): ratio of files identical to earlier file. Defaults to 0.1.
+            same_size_ratio (float, optional): ratio of files with size of earlier file but other content. Defaults to 0.05.
+            empty_ratio (float, optional): ratio of empty files. Defaults to 0.01.
+            temporary_ratio (float, optional): ratio of temporary files. Defaults to 0.02.
+            bad_name_ratio (float, optional): ratio of files with wrong characters in name. Defaults to 0.02.
+            bad_permissions_ratio (float, optional): ratio of files with wrong permissions. Defaults to 0.05.
+        """
+        self.files = files
+        self.depth = depth
+        self.fanout = fanout
+        self.copy_dirs = copy_dirs
+        self.median_size = median_size
+        self.size_sigma = size_sigma
+        self.max_size = max_size
+        self.duplicate_ratio = duplicate_ratio
+        self.same_size_ratio = same_size_ratio
+        self.empty_ratio = empty_ratio
+        self.temporary_ratio = temporary_ratio
+        self.bad_name_ratio = bad_name_ratio
+        self.bad_permissions_ratio = bad_permissions_ratio
+
+    def to_dict(self):
+        """Method to convert specification to dictionary
+
+        Returns:
+            dict: specification
+        """
+        return dict(vars(self))
+
+
+def directories_of_tree(root, depth, fanout):
+    """Function to list directories of tree (breadth-first)
+
+    Args:
+        root (str): path to root of tree
+        depth (int): depth of tree
+        fanout (int): number of subdirectories of every directory
+
+    Returns:
+        list(str): paths to directories
+    """
+    directories = [root]
+    level = [root]
+    for _ in range(depth):
+        level = [os.path.join(parent, "d{}".format(i)) for parent in level for i in range(fanout)]
+        directories.extend(level)
+    return directories
+
+def generate_corpus(path, spec, seed=0, bad_characters=(":",), temp_extensions=(".tmp",), permissions=0o644):
+    """Function to generate corpus (the same seed and specification give the same files)
+
+    Args:
+        path (str): path to directory in which roots X, Y1, Y2,... are created
+        spec (CorpusSpec): specification of corpus
+        seed (int, optional): seed of random generator. Defaults to 0.
+        bad_characters (iterable(str), optional): wrong characters in names of files. Defaults to (":",).
+        temp_extensions (iterable(str), optional): temporary extensions of files. Defaults to (".tmp",).
+        permissions (int, optional): correct permissions of files. Defaults to 0o644.
+
+    Returns:
+        dict: summary of corpus (roots, numbers of files of every kind and total size)
+    """
+    rng = random.Random(seed)
+    bad_characters = sorted(char for char in bad_characters if char)
+    temp_extensions = sorted(extension for extension in temp_extensions if extension)
+    roots = [os.path.join(path, "X")] + [os.path.join(path, "Y{}".format(i + 1)) for i in range(spec.copy_dirs)]
+    directories = [directory for root in roots for directory in directories_of_tree(root, spec.depth, spec.fanout)]
+    for directory in directories:
+        os.makedirs(directory, exist_ok=True)
+
+    summary = {"roots": roots, "directories": len(directories), "files": spec.files, "bytes": 0,
+               "duplicate": 0, "same_size": 0, "empty": 0, "temporary": 0, "bad_name": 0, "bad_permissions": 0}
+    # contents are described by (size, seed of content), so they are never kept in memory
+    originals = list()
+    mu = math.log(max(1, spec.median_size))
+    for i in range(spec.files):
+        draw = rng.random()
+        if draw < spec.empty_ratio:
+            (size, content_seed) = (0, 0)
+            summary["empty"] += 1
+        elif originals and draw < spec.empty_ratio + spec.duplicate_ratio:
+            (size, content_seed) = rng.choice(originals)
+            summary["duplicate"] += 1
+        elif originals and draw < spec.empty_ratio + spec.duplicate_ratio + spec.same_size_ratio:
+            (size, content_seed) = (rng.choice(originals)[0], rng.getrandbits(64))
+            summary["same_size"] += 1
+        else:
+            size = min(spec.max_size, max(1, int(rng.lognormvariate(mu, spec.size_sigma))))
+            content_seed = rng.getrandbits(64)
+            originals.append((size, content_seed))
+
+        name = "file{:07d}".format(i)
+        if bad_characters and rng.random() < spec.bad_name_ratio:
+            name = name[:4] + rng.choice(bad_characters) + name[4:]
+            summary["bad_name"] += 1
+        if temp_extensions and rng.random() < spec.temporary_ratio:
+            name += rng.choice(temp_extensions)
+            summary["temporary"] += 1
+        mode = permissions
+        if rng.random() < spec.bad_permissions_ratio:
+            mode = permissions ^ 0o020
+            summary["bad_permissions"] += 1
+
+        filename = os.path.join(rng.choice(directories), name)
+        with open(filename, "wb") as f:
+            if size > 0:
+                f.write(random.Random(content_seed).randbytes(size))
+        os.chmod(filename, mode)
+        os.utime(filename, ns=(BASE_TIME_NS + i * 10**9, BASE_TIME_NS + i * 10**9))
+        summary["bytes"] += size
+    return summary
+
+def add_arguments(parser):
+    """Function to add arguments describing corpus to parser
+
+    Args:
+        parser (argparse.ArgumentParser): parser of arguments
+    """
+    defaults = CorpusSpec()
+    for name, value in defaults.to_dict().items():
+        parser.add_argument("--" + name, type=type(value), default=value)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--conf", type=str, default="config/clean_files.ini", help="configuration (wrong characters, temporary extensions)")
+
+def spec_from_arguments(args):
+    """Function to create specification of corpus from parsed arguments
+
+    Args:
+        args (argparse.Namespace): parsed arguments
+
+    Returns:
+        CorpusSpec: specification of corpus
+    """
+    return CorpusSpec(**{name: getattr(args, name) for name in CorpusSpec().to_dict()})
+
+def generate_from_arguments(path, args):
+    """Function to generate corpus described by parsed arguments
+
+    Args:
+        path (str): path to directory in which corpus is created
+        args (argparse.Namespace): parsed arguments
+
+    Returns:
+        dict: summary of corpus
+    """
+    (permissions, bad_characters, _, temp_extensions) = load_configuration(args.conf)
+    return generate_corpus(path, spec_from_arguments(args), args.seed, bad_characters, temp_extensions,
+                           perm_to_num(permissions))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("path", type=str, help="directory in which corpus is created")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    print(json.dumps(generate_from_arguments(args.path, args), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""module cache
+
+Persistent cache of files' digests kept in SQLite database
+"""
+import os
+import sqlite3
+
+MAX_ENTRIES = 1000000
+
+
+def to_signed(value):
+    """Function to convert unsigned 64-bit integer (e.g. inode number) to signed one stored by SQLite
+
+    Args:
+        value (int): unsigned integer
+
+    Returns:
+        int: signed integer
+    """
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+def to_unsigned(value):
+    """Function to convert signed 64-bit integer stored by SQLite back to unsigned one
+
+    Args:
+        value (int): signed integer
+
+    Returns:
+        int: unsigned integer
+    """
+    return value + (1 << 64) if value < 0 else value
+
+
+class HashCache:
+    """class HashCache
+
+    Class to store partial and full digests of files between runs. Entries are keyed on
+    (device, inode, size, mtime_ns), so a file whose metadata did not change is never read again.
+    """
+    def __init__(self, path, max_entries=MAX_ENTRIES):
+        """init method
+
+        Args:
+            path (str): path to database file
+            max_entries (int, optional): maximal number of entries kept in database. Defaults to MAX_ENTRIES.
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS digests (
+                dev INTEGER, ino INTEGER, size INTEGER, mtime_ns INTEGER,
+                path TEXT, partial BLOB, full BLOB, last_seen INTEGER,
+                PRIMARY KEY (dev, ino, size, mtime_ns));
+            CREATE TABLE IF NOT EXISTS runs (id INTEGER PRIMARY KEY AUTOINCREMENT);
+        """)
+        self.run = self.connection.execute("INSERT INTO runs DEFAULT VALUES").lastrowid
+        self.seen = list()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(inventory, index):
+        """Method to get key of file in cache
+
+        Args:
+            inventory (FileInventory): inventory of files
+            index (int): index of file
+
+        Returns:
+            tuple(int): device, inode, size and mtime of file
+        """
+        return (to_signed(inventory.devices[index]), to_signed(inventory.inodes[index]),
+                inventory.sizes[index], inventory.mtimes[index])
+
+    def get(self, key):
+        """Method to get digests of file
+
+        Args:
+            key (tuple(int)): key of file
+
+        Returns:
+            tuple(bytes): partial and full digest (None if unknown)
+        """
+        row = self.connection.execute("SELECT partial, full FROM digests WHERE dev=? AND ino=? AND size=? AND mtime_ns=?",
+                                      key).fetchone()
+        if row is None:
+            self.misses += 1
+            return (None, None)
+        self.hits += 1
+        self.seen.append((self.run,) + key)
+        return row
+
+    def put(self, key, path, partial=None, full=None):
+        """Method to save digests of file
+
+        Args:
+            key (tuple(int)): key of file
+            path (str): name of file
+            partial (bytes, optional): partial digest. Defaults to None.
+            full (bytes, optional): full digest. Defaults to None.
+        """
+        self.connection.execute("""
+            INSERT INTO digests VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (dev, ino, size, mtime_ns) DO UPDATE SET
+                path=excluded.path, partial=COALESCE(excluded.partial, partial),
+                full=COALESCE(excluded.full, full), last_seen=excluded.last_seen
+        """, key + (path, partial, full, self.run))
+
+    def clear(self):
+        """Method to remove all entries (to rebuild cache)
+        """
+        self.connection.execute("DELETE FROM digests")
+
+    def evict_missing(self):
+        """Method to remove entries of files which were not used in this run and which no longer exist (or changed)
+
+        Returns:
+            int: number of removed entries
+        """
+        stale = list()
+        rows = self.connection.execute("SELECT dev, ino, size, mtime_ns, path FROM digests WHERE last_seen < ?", (self.run,))
+        for (dev, ino, size, mtime_ns, path) in rows.fetchall():
+            try:
+                st = os.stat(path)
+            except OSError:
+                stale.append((dev, ino, size, mtime_ns))
+                continue
+            if (to_signed(st.st_dev), to_signed(st.st_ino), st.st_size, st.st_mtime_ns) != (dev, ino, size, mtime_ns):
+                stale.append((dev, ino, size, mtime_ns))
+        self.connection.executemany("DELETE FROM digests WHERE dev=? AND ino=? AND size=? AND mtime_ns=?", stale)
+        return len(stale)
+
+    def evict_oldest(self):
+        """Method to remove the least recently used entries above the size cap
+
+        Returns:
+            int: number of removed entries
+        """
+        cursor = self.connection.execute("""
+            DELETE FROM digests WHERE rowid IN (
+                SELECT rowid FROM digests ORDER BY last_seen DESC LIMIT -1 OFFSET ?)
+        """, (self.max_entries,))
+        return cursor.rowcount
+
+    def close(self, evict=True):
+        """Method to save used entries, evict old ones and close database
+
+        Args:
+            evict (bool, optional): whether to evict entries of missing files and above the size cap. Defaults to True.
+        """
+        self.connection.executemany("UPDATE digests SET last_seen=? WHERE dev=? AND ino=? AND size=? AND mtime_ns=?",
+                                    self.seen)
+        self.seen = list()
+        if evict:
+            self.evict_missing()
+            self.evict_oldest()
+        self.connection.execute("DELETE FROM runs WHERE id < ?", (self.run,))
+        self.connection.commit()
+        self.connection.close()
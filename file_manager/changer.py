@@ -1,6 +1,62 @@
 import os
+import re
+from concurrent.futures import ThreadPoolExecutor
 
 from file_manager.utils import perm_to_num
+from file_manager.dirfd import DirectoryCache
+from file_manager.plan import CHMOD, RENAME
+from file_manager.log import ActionLog, KEEP
+
+# minimal number of files whose permissions are changed in parallel
+PARALLEL_THRESHOLD = 256
+
+
+class FileNameSanitizer:
+    """class FileNameSanitizer
+
+    Class to find and replace wrong characters in basenames of files. Translation table
+    and detecting pattern are compiled once from configuration.
+    """
+    def __init__(self, bad_characters, substitute_of_bad_char):
+        """init method
+
+        Args:
+            bad_characters (set(str)): wrong characters in files' names
+            substitute_of_bad_char (str): substitute of wrong characters in files' names
+        """
+        bad_characters = sorted((char for char in bad_characters if char), key=len, reverse=True)
+        self.substitute = substitute_of_bad_char
+        self.pattern = re.compile("|".join(re.escape(char) for char in bad_characters)) if bad_characters else None
+        self.translation = None
+        if all(len(char) == 1 for char in bad_characters):
+            self.translation = str.maketrans({char: substitute_of_bad_char for char in bad_characters})
+
+    def is_wrong(self, name):
+        """Method to check whether name contains wrong characters
+
+        Args:
+            name (str): basename of file
+
+        Returns:
+            bool: whether name is wrong
+        """
+        return self.pattern is not None and self.pattern.search(name) is not None
+
+    def sanitize(self, name):
+        """Method to replace wrong characters in name
+
+        Args:
+            name (str): basename of file
+
+        Returns:
+            str: correct name
+        """
+        if self.pattern is None:
+            return name
+        if self.translation is not None:
+            return name.translate(self.translation)
+        return self.pattern.sub(self.substitute, name)
+
 
 class FileChanger:
     """class FileChanger
@@ -8,20 +64,26 @@ class FileChanger:
     Class to change attributes of files (permissions and names)
     """
 
-    def __init__(self, permissions, substitute_of_bad_char, bad_characters):
+    def __init__(self, permissions, substitute_of_bad_char, bad_characters, directories=None, log=None):
         """init method
 
         Args:
             permissions (str): proposed permissions
             substitute_of_bad_char (str): substitute of wrong characters in files' names
             bad_characters (set(str)): wrong characters in files' names
+            directories (DirectoryCache, optional): open descriptors of directories used to change files. Defaults to None.
+            log (ActionLog, optional): log of actions (unbuffered verbose log if not given). Defaults to None.
         """
         self.permissions = permissions
         self.substitute_of_bad_char = substitute_of_bad_char
         self.bad_characters = bad_characters
+        self.sanitizer = FileNameSanitizer(bad_characters, substitute_of_bad_char)
+        self.directories = directories if directories is not None else DirectoryCache()
+        self.log = log if log is not None else ActionLog(buffer_size=0)
+        self.mode = perm_to_num(permissions)
 
     def generate_correct_filename(self, filename):
-        """Method to generate file name without wrong characters
+        """Method to generate file name without wrong characters (only basename of file is changed)
 
         Args:
             filename (str): (wrong) name of file
@@ -29,37 +91,37 @@ class FileChanger:
         Returns:
             str: correct name of file
         """
-        for char in self.bad_characters:
-            filename = filename.replace(char, self.substitute_of_bad_char)
-        return filename
+        (directory, name) = os.path.split(filename)
+        return os.path.join(directory, self.sanitizer.sanitize(name))
 
-    def process_wrong_named_file(self, filename, ask=True, action=False):
+    def process_wrong_named_file(self, filename, ask=True, action=False, new_filename=None):
         """Method to ask (or not) user and process wrong named file 
 
         Args:
             filename (str): name of file
             ask (bool, optional): whether to ask the user for an action. Defaults to True.
             action (bool, optional): action to prepare (True - keep, False - rename). Defaults to False.
+            new_filename (str, optional): new name of file (generated if not given). Defaults to None.
 
         Returns:
             str: processed name of file
         """
-        new_filename = self.generate_correct_filename(filename)
-        if action:
-            print("{} renamed to {}".format(filename, new_filename))
-            os.rename(filename, new_filename)
-            return new_filename
-        elif not (ask or action):
-            print("Wrong file name {} kept".format(filename))
-            return filename
-        text = "Filename {} is wrong. Do you want to rename to {}? [Y/n]: "
-        choice = input(text.format(filename, new_filename))
-        if choice.upper() in ("Y", ""):
-            os.rename(filename, new_filename)
-            return new_filename
-        return filename
-
-    def process_file_permissions(self, filename, perm, ask=True, action=False):
+        if new_filename is None:
+            new_filename = self.generate_correct_filename(filename)
+        if not action:
+            if not ask:
+                self.log.event(KEEP, filename, "wrong name")
+                return filename
+            text = "Filename {} is wrong. Do you want to rename to {}? [Y/n]: "
+            choice = self.log.ask(text.format(filename, new_filename))
+            if choice.upper() not in ("Y", ""):
+                self.log.event(KEEP, filename, "wrong name")
+                return filename
+        self.directories.rename(filename, new_filename)
+        self.log.event(RENAME, filename, target=new_filename)
+        return new_filename
+
+    def process_file_permissions(self, filename, perm, ask=True, action=False, mode=None):
         """Method to ask (or not) user and process wrong permissions of file
 
         Args:
@@ -67,20 +129,71 @@ class FileChanger:
             perm (str): permissions of file
             ask (bool, optional): whether to ask the user for an action. Defaults to True.
             action (bool, optional): action to prepare (True - keep, False - change permissions). Defaults to False.
+            mode (int, optional): target permissions (proposed permissions if not given). Defaults to None.
 
         Returns:
             bool: whether the permissions were changed or not
         """
-        if action:
-            print("Permissions of {} changed to {}".format(filename, self.permissions))
-            os.chmod(filename, perm_to_num(self.permissions))
-            return True
-        elif not (ask or action):
-            print("Permissions {} of {} kept".format(perm, filename))
-            return False
-        text = "Permissions of {} are {}. Do you want to change to {}? [Y/n]: "
-        choice = input(text.format(filename, perm, self.permissions))
-        if choice.upper() in ("Y", ""):
-            os.chmod(filename, perm_to_num(self.permissions))
-            return True
-        return False
\ No newline at end of file
+        if mode is None:
+            mode = self.mode
+        if not action:
+            if not ask:
+                self.log.event(KEEP, filename, "permissions", perm)
+                return False
+            text = "Permissions of {} are {}. Do you want to change to {:o}? [Y/n]: "
+            choice = self.log.ask(text.format(filename, perm, mode))
+            if choice.upper() not in ("Y", ""):
+                self.log.event(KEEP, filename, "permissions", perm)
+                return False
+        self.directories.chmod(filename, mode)
+        self.log.event(CHMOD, filename, target=format(mode, "o"))
+        return True
+
+    def change_permissions(self, files, jobs=1):
+        """Method to change permissions of many files without asking (directory by directory,
+        in parallel if more than one job is set and there are many files)
+
+        Args:
+            files (list(tuple(str, int))): names of files and their target permissions
+            jobs (int, optional): number of threads. Defaults to 1.
+
+        Returns:
+            list(bool): whether permissions of every file were changed
+        """
+        def change(batch, directories):
+            errors = list()
+            for (filename, mode) in batch:
+                try:
+                    directories.chmod(filename, mode)
+                    errors.append(None)
+                except OSError as e:
+                    errors.append(e)
+            return errors
+
+        def change_in_thread(batch):
+            # descriptors of directories are not shared between threads
+            with DirectoryCache(max_open=8) as directories:
+                return change(batch, directories)
+
+        if jobs > 1 and len(files) >= PARALLEL_THRESHOLD:
+            # files of one directory are changed by one thread (as far as possible)
+            order = sorted(range(len(files)), key=lambda position: os.path.dirname(files[position][0]))
+            size = -(-len(order) // jobs)
+            batches = [[files[position] for position in order[start:start + size]] for start in range(0, len(order), size)]
+            with ThreadPoolExecutor(max_workers=jobs) as executor:
+                sorted_errors = [error for batch_errors in executor.map(change_in_thread, batches) for error in batch_errors]
+            errors = [None] * len(files)
+            for position, error in zip(order, sorted_errors):
+                errors[position] = error
+            self.directories.profiler.count("chmod", sorted_errors.count(None))
+        else:
+            errors = change(files, self.directories)
+
+        changed = list()
+        for (filename, mode), error in zip(files, errors):
+            if error is None:
+                self.log.event(CHMOD, filename, target=format(mode, "o"))
+            else:
+                self.log.error("Cannot change permissions of {}: {}".format(filename, error), filename)
+            changed.append(error is None)
+        return changed
\ No newline at end of file
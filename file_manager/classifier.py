@@ -0,0 +1,73 @@
+"""module classifier
+
+Single-pass classification of files by their metadata (without any system call)
+"""
+
+from file_manager.permissions import PermissionPolicy
+from file_manager.temporary import TemporaryRules
+
+EMPTY = 1
+TEMPORARY = 2
+BAD_PERMISSIONS = 4
+WRONG_NAME = 8
+
+
+class FileClassifier:
+    """class FileClassifier
+
+    Class to evaluate all metadata rules for every file at once. Result of classification
+    is a set of flags (EMPTY, TEMPORARY, BAD_PERMISSIONS, WRONG_NAME) stored in inventory.
+    """
+    def __init__(self, attributes, sanitizer, temp_extensions, policy=None, temporary=None):
+        """init method
+
+        Args:
+            attributes (str): proposed permissions
+            sanitizer (FileNameSanitizer): sanitizer of files' names
+            temp_extensions (set(str)): temporary extensions of files
+            policy (PermissionPolicy, optional): policy of permissions (attributes for all files if not given). Defaults to None.
+            temporary (TemporaryRules, optional): rules of temporary files (temporary extensions if not given). Defaults to None.
+        """
+        self.attributes = attributes
+        self.sanitizer = sanitizer
+        self.temp_extensions = temp_extensions
+        self.policy = policy if policy is not None else PermissionPolicy.from_configuration(attributes)
+        self.temporary = temporary if temporary is not None else TemporaryRules.from_extensions(temp_extensions)
+
+    def classify(self, name, size, mode, directory=""):
+        """Method to classify file
+
+        Args:
+            name (str): basename of file
+            size (int): size of file
+            mode (int): mode of file
+            directory (str, optional): directory of file (used by rules with paths and rules of copy directories). Defaults to "".
+
+        Returns:
+            int: flags of file
+        """
+        flags = 0
+        if size == 0:
+            flags |= EMPTY
+        if self.temporary.is_temporary(directory, name):
+            flags |= TEMPORARY
+        if not self.policy.is_compliant(directory, name, mode):
+            flags |= BAD_PERMISSIONS
+        if self.sanitizer.is_wrong(name):
+            flags |= WRONG_NAME
+        return flags
+
+    def classify_inventory(self, inventory, classified=None):
+        """Method to classify all files from inventory (flags are stored in inventory)
+
+        Args:
+            inventory (FileInventory): inventory of files
+            classified (bytearray, optional): mask of files whose flags are already known (they are skipped). Defaults to None.
+        """
+        inventory.load_metadata()
+        flags = inventory.flags
+        known = len(classified) if classified is not None else 0
+        for index in inventory.indices():
+            if index < known and classified[index]:
+                continue
+            flags[index] = self.classify(inventory.names[index], inventory.sizes[index], inventory.modes[index], inventory.directory(index))
@@ -0,0 +1,153 @@
+"""module conflicts
+
+Resolving conflicts of files with the same relative path in main and copy directories (Y1, Y2,...)
+"""
+import os
+from collections import defaultdict
+
+from file_manager.spill import grouped_rows
+
+NEWER = "newer"
+OLDER = "older"
+BOTH = "both"
+
+
+def group_by_relative_path(inventory, roots):
+    """Function to group files from different roots by relative path (in one pass over inventory)
+
+    Args:
+        inventory (FileInventory): inventory of files
+        roots (list(str)): paths to main and copy directories
+
+    Returns:
+        list(list(int)): groups (with at least two files) of indices of files with the same relative path
+    """
+    prefixes = [(os.path.join(root, ""), root) for root in roots]
+    if inventory.spilled:
+        return list(grouped_rows(relative_paths(inventory, prefixes)))
+
+    # relative path of every directory is computed once
+    relative_directories = dict()
+    for dir_id, directory in enumerate(inventory.directories):
+        relative_directory = relative_to(directory, prefixes)
+        if relative_directory is not None:
+            relative_directories[dir_id] = relative_directory
+
+    groups = defaultdict(list)
+    for index in inventory.indices():
+        relative_directory = relative_directories.get(inventory.dir_ids[index])
+        if relative_directory is not None:
+            groups[(relative_directory, inventory.names[index])].append(index)
+    return [group for group in groups.values() if len(group) > 1]
+
+def relative_paths(inventory, prefixes):
+    """Function to get relative paths of files of spilled inventory (grouped on disk)
+
+    Args:
+        inventory (FileInventory): inventory of files
+        prefixes (list(tuple(str, str))): paths to roots (with and without separator at the end)
+
+    Yields:
+        tuple(bytes, int): relative path and index of file (files outside of roots are skipped)
+    """
+    # files are stored directory by directory, so relative path of directory is computed once in a row
+    (last_id, relative_directory) = (None, None)
+    for index in inventory.indices():
+        dir_id = inventory.dir_ids[index]
+        if dir_id != last_id:
+            (last_id, relative_directory) = (dir_id, relative_to(inventory.directories[dir_id], prefixes))
+        if relative_directory is not None:
+            yield (os.fsencode(os.path.join(relative_directory, inventory.names[index])), index)
+
+def relative_to(directory, prefixes):
+    """Function to get path of directory relative to its root
+
+    Args:
+        directory (str): path to directory
+        prefixes (list(tuple(str, str))): paths to roots (with and without separator at the end)
+
+    Returns:
+        str: relative path (None if directory is outside of roots)
+    """
+    for (prefix, root) in prefixes:
+        if os.path.join(directory, "").startswith(prefix):
+            return os.path.relpath(directory, root)
+    return None
+
+
+class ConflictResolver:
+    """class ConflictResolver
+
+    Class to choose which of files with the same relative path are kept. Identical files
+    (the same size and digest, cached digests are used when possible) are collapsed to one
+    (if removing duplicates is allowed, otherwise all of them are kept), for different files
+    the policy decides: keep newer, keep older or keep both (under different names).
+    """
+    def __init__(self, finder, policy=BOTH, identical=True):
+        """init method
+
+        Args:
+            finder (DuplicateFinder): finder of files with identical content
+            policy (str, optional): policy of conflicts (NEWER, OLDER or BOTH). Defaults to BOTH.
+            identical (bool, optional): whether identical files are collapsed to one. Defaults to True.
+        """
+        self.finder = finder
+        self.policy = policy
+        self.identical = identical
+
+    def choose(self, inventory, indices):
+        """Method to choose kept file according to policy
+
+        Args:
+            inventory (FileInventory): inventory of files
+            indices (list(int)): indices of files
+
+        Returns:
+            int: index of kept file (None if all files are kept)
+        """
+        if self.policy == NEWER:
+            return max(indices, key=lambda x: inventory.mtimes[x])
+        if self.policy == OLDER:
+            return min(indices, key=lambda x: inventory.mtimes[x])
+        return None
+
+    def resolve(self, inventory, roots):
+        """Method to find files which should be removed because of conflicts of names
+
+        Args:
+            inventory (FileInventory): inventory of files
+            roots (list(str)): paths to main and copy directories (files from earlier roots are preferred)
+
+        Returns:
+            list(tuple(int, int, str)): removed file, kept file and reason ("identical" or policy)
+        """
+        removed = list()
+        groups = group_by_relative_path(inventory, roots)
+        # digests of files of all groups are computed (or taken from cache) at once
+        numbers = {index: number for number, group in enumerate(groups) for index in group}
+        classes = defaultdict(list)
+        for identical in self.finder.find_in_groups(inventory, groups):
+            classes[numbers[identical[0]]].append(identical)
+
+        for number, group in enumerate(groups):
+            remaining = set(group)
+            for identical in classes[number]:
+                if not self.identical:
+                    # duplicates are kept, so they are not removed by policy either
+                    remaining.difference_update(identical)
+                    continue
+                kept = self.choose(inventory, identical)
+                if kept is None:
+                    kept = identical[0]
+                for index in identical:
+                    if index != kept:
+                        removed.append((index, kept, "identical"))
+                        remaining.discard(index)
+
+            remaining = sorted(remaining)
+            kept = self.choose(inventory, remaining) if len(remaining) > 1 else None
+            if kept is not None:
+                for index in remaining:
+                    if index != kept:
+                        removed.append((index, kept, self.policy))
+        return removed
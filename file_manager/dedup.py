@@ -0,0 +1,364 @@
+"""module dedup
+
+Staged search of files with identical content: size, then hash of the beginning and the end of file, then hash of the rest of file
+"""
+import hashlib
+import mmap
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from file_manager.profiler import NULL_PROFILER
+from file_manager.log import ActionLog
+
+PARTIAL_SIZE = 4096
+DIGEST_SIZE = 16
+BLOCK_SIZE = 1024 * 1024
+MMAP_THRESHOLD = 64 * 1024 * 1024
+
+
+class ContentHasher:
+    """class ContentHasher
+
+    Class to compute digests of files' content. Partial digest covers first and last
+    PARTIAL_SIZE bytes of file (so for small files it covers the whole content),
+    full digest covers only the rest of file and the partial digest. Therefore
+    every byte of file is read at most once.
+
+    Methods can be called from many threads: every thread reads into its own
+    preallocated buffer and files bigger than mmap_threshold are memory-mapped.
+    """
+    def __init__(self, partial_size=PARTIAL_SIZE, block_size=BLOCK_SIZE, mmap_threshold=MMAP_THRESHOLD):
+        """init method
+
+        Args:
+            partial_size (int, optional): number of bytes read from the beginning and the end of file. Defaults to PARTIAL_SIZE.
+            block_size (int, optional): number of bytes read at once. Defaults to BLOCK_SIZE.
+            mmap_threshold (int, optional): minimal size of file read by memory mapping. Defaults to MMAP_THRESHOLD.
+        """
+        self.partial_size = partial_size
+        self.block_size = block_size
+        self.mmap_threshold = mmap_threshold
+        self.local = threading.local()
+
+    def buffer(self):
+        """Method to get buffer of current thread
+
+        Returns:
+            memoryview: view of reused buffer
+        """
+        view = getattr(self.local, "view", None)
+        if view is None:
+            view = memoryview(bytearray(self.block_size))
+            self.local.view = view
+        return view
+
+    def is_partial_complete(self, size):
+        """Method to check whether partial digest covers the whole content of file
+
+        Args:
+            size (int): size of file
+
+        Returns:
+            bool: whether partial digest is also the full digest
+        """
+        return size <= 2 * self.partial_size
+
+    def partial_digest(self, filename, size):
+        """Method to compute digest of the beginning and the end of file
+
+        Args:
+            filename (str): name of file
+            size (int): size of file
+
+        Returns:
+            bytes: partial digest
+        """
+        digest = hashlib.blake2b(digest_size=DIGEST_SIZE)
+        with open(filename, "rb") as f:
+            if self.is_partial_complete(size):
+                digest.update(f.read())
+            else:
+                digest.update(f.read(self.partial_size))
+                f.seek(size - self.partial_size)
+                digest.update(f.read(self.partial_size))
+        return digest.digest()
+
+    def full_digest(self, filename, size, partial):
+        """Method to compute digest of the whole content of file
+
+        Args:
+            filename (str): name of file
+            size (int): size of file
+            partial (bytes): partial digest of file
+
+        Returns:
+            bytes: full digest
+        """
+        if self.is_partial_complete(size):
+            return partial
+        digest = hashlib.blake2b(partial, digest_size=DIGEST_SIZE)
+        (start, end) = (self.partial_size, size - self.partial_size)
+        with open(filename, "rb", buffering=0) as f:
+            if size >= self.mmap_threshold:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    with memoryview(mapped) as view:
+                        digest.update(view[start:min(end, len(mapped))])
+                return digest.digest()
+
+            view = self.buffer()
+            remaining = end - start
+            f.seek(start)
+            while remaining > 0:
+                read = f.readinto(view[:min(self.block_size, remaining)])
+                if not read:
+                    break
+                digest.update(view[:read])
+                remaining -= read
+        return digest.digest()
+
+    def bytes_read(self, size, position):
+        """Method to get number of bytes read to compute digest of file
+
+        Args:
+            size (int): size of file
+            position (int): kind of digest (0 - partial, 1 - full)
+
+        Returns:
+            int: number of bytes
+        """
+        if self.is_partial_complete(size):
+            return size if position == 0 else 0
+        return 2 * self.partial_size if position == 0 else size - 2 * self.partial_size
+
+
+class DuplicateFinder:
+    """class DuplicateFinder
+
+    Class to find groups of files with identical content
+    """
+    def __init__(self, hasher=None, cache=None, jobs=1, log=None):
+        """init method
+
+        Args:
+            hasher (ContentHasher, optional): hasher of files' content. Defaults to None.
+            cache (HashCache, optional): persistent cache of digests. Defaults to None.
+            jobs (int, optional): number of threads computing digests. Defaults to 1.
+            log (ActionLog, optional): log of errors (unbuffered standard output if not given). Defaults to None.
+        """
+        self.hasher = hasher if hasher is not None else ContentHasher()
+        self.cache = cache
+        self.jobs = jobs
+        self.profiler = NULL_PROFILER
+        self.log = log if log is not None else ActionLog(buffer_size=0)
+
+    def group_by_size(self, inventory, indices):
+        """Method to group files by size
+
+        Args:
+            inventory (FileInventory): inventory of files
+            indices (iterable(int)): indices of files in inventory
+
+        Returns:
+            list(list(int)): groups (with at least two files) of indices of files with the same size
+        """
+        groups = defaultdict(list)
+        for index in indices:
+            groups[inventory.sizes[index]].append(index)
+        return [group for group in groups.values() if len(group) > 1]
+
+    def group_by_inode(self, inventory, groups):
+        """Method to collapse files sharing one inode (hard links), which are identical without reading them
+
+        Args:
+            inventory (FileInventory): inventory of files
+            groups (list(list(int))): groups of indices of files with the same size
+
+        Returns:
+            list(list(int)), dict(int, list(int)): groups of representatives of inodes and all files of every representative
+        """
+        representatives = list()
+        aliases = dict()
+        for group in groups:
+            inodes = dict()
+            for index in group:
+                key = (inventory.devices[index], inventory.inodes[index])
+                if key in inodes:
+                    aliases[inodes[key]].append(index)
+                else:
+                    inodes[key] = index
+                    aliases[index] = [index]
+            representatives.append(list(inodes.values()))
+        return representatives, aliases
+
+    def compute(self, inventory, indices, digest_function):
+        """Method to compute digests of files (in parallel if more than one job is set)
+
+        Args:
+            inventory (FileInventory): inventory of files
+            indices (list(int)): indices of files
+            digest_function (callable): function computing digest of file by its index
+
+        Returns:
+            dict(int, bytes): digests of files (files which cannot be read are skipped)
+        """
+        def compute_one(index):
+            try:
+                return digest_function(index)
+            except (OSError, ValueError) as e:
+                # ValueError is raised when memory-mapped file was truncated
+                return e
+
+        if self.jobs > 1 and len(indices) > 1:
+            with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+                results = list(executor.map(compute_one, indices))
+        else:
+            results = [compute_one(index) for index in indices]
+
+        digests = dict()
+        for index, result in zip(indices, results):
+            if isinstance(result, Exception):
+                self.log.error("Cannot read {}: {}".format(inventory.path(index), result), inventory.path(index))
+            else:
+                digests[index] = result
+        return digests
+
+    def group_by_digest(self, group, digests):
+        """Method to split group of files by digest
+
+        Args:
+            group (list(int)): indices of files
+            digests (dict(int, bytes)): digests of files
+
+        Returns:
+            list(list(int)): groups of indices of files with the same digest
+        """
+        groups = defaultdict(list)
+        for index in group:
+            if index in digests:
+                groups[digests[index]].append(index)
+        return list(groups.values())
+
+    def cached_digests(self, inventory, indices, digests, position):
+        """Method to take digests of files from persistent cache
+
+        Args:
+            inventory (FileInventory): inventory of files
+            indices (list(int)): indices of files
+            digests (dict(int, bytes)): found digests (updated in place)
+            position (int): position of digest in entry of cache (0 - partial, 1 - full)
+
+        Returns:
+            list(int): indices of files whose digest is unknown
+        """
+        if self.cache is None:
+            return indices
+        missing = list()
+        for index in indices:
+            digest = self.cache.get(self.cache.key(inventory, index))[position]
+            if digest is None:
+                missing.append(index)
+            else:
+                digests[index] = digest
+        return missing
+
+    def store_digests(self, inventory, digests, position):
+        """Method to save computed digests of files in persistent cache
+
+        Args:
+            inventory (FileInventory): inventory of files
+            digests (dict(int, bytes)): computed digests
+            position (int): position of digest in entry of cache (0 - partial, 1 - full)
+        """
+        if self.cache is None:
+            return
+        for index, digest in digests.items():
+            if position == 0:
+                self.cache.put(self.cache.key(inventory, index), inventory.path(index), partial=digest)
+            else:
+                self.cache.put(self.cache.key(inventory, index), inventory.path(index), full=digest)
+
+    def count_read(self, inventory, digests, position):
+        """Method to count bytes read to compute digests (only if profiling is enabled)
+
+        Args:
+            inventory (FileInventory): inventory of files
+            digests (dict(int, bytes)): computed digests
+            position (int): kind of digests (0 - partial, 1 - full)
+        """
+        if self.profiler.enabled:
+            sizes = inventory.sizes
+            self.profiler.count("bytes_read", sum(self.hasher.bytes_read(sizes[index], position) for index in digests))
+
+    def find(self, inventory, indices):
+        """Method to find classes of files with identical content
+
+        Args:
+            inventory (FileInventory): inventory of files
+            indices (iterable(int)): indices of files in inventory
+
+        Returns:
+            list(list(int)): classes (with at least two files) of indices of identical files
+        """
+        return self.find_in_groups(inventory, [indices])
+
+    def find_in_groups(self, inventory, groups):
+        """Method to find classes of files with identical content within every group (digests of all groups are computed at once)
+
+        Args:
+            inventory (FileInventory): inventory of files
+            groups (list(iterable(int))): groups of indices of files in inventory (files of different groups are never compared)
+
+        Returns:
+            list(list(int)): classes (with at least two files of one group) of indices of identical files
+        """
+        hasher = self.hasher
+        same_size = [same_size for group in groups for same_size in self.group_by_size(inventory, group)]
+        (groups, aliases) = self.group_by_inode(inventory, same_size)
+        classes = list()
+
+        def split(groups, digests):
+            # files with unique digest are identical only to their hard links
+            for group in groups:
+                for same_digest in self.group_by_digest(group, digests):
+                    if len(same_digest) > 1:
+                        yield same_digest
+                    elif len(aliases[same_digest[0]]) > 1:
+                        classes.append(aliases[same_digest[0]])
+
+        # stage 2: beginning and end of files
+        candidates = [index for group in groups if len(group) > 1 for index in group]
+        partials = dict()
+        missing = self.cached_digests(inventory, candidates, partials, 0)
+        computed = self.compute(inventory, missing,
+                                lambda index: hasher.partial_digest(inventory.path(index), inventory.sizes[index]))
+        self.store_digests(inventory, computed, 0)
+        self.count_read(inventory, computed, 0)
+        partials.update(computed)
+
+        identical = list()
+        big_groups = list()
+        for group in groups:
+            if len(group) == 1:
+                # hard links of one file need no digest
+                partials[group[0]] = None
+        for same_partial in split(groups, partials):
+            if hasher.is_partial_complete(inventory.sizes[same_partial[0]]):
+                identical.append(same_partial)
+            else:
+                big_groups.append(same_partial)
+
+        # stage 3: rest of files
+        candidates = [index for group in big_groups for index in group]
+        fulls = dict()
+        missing = self.cached_digests(inventory, candidates, fulls, 1)
+        computed = self.compute(inventory, missing,
+                                lambda index: hasher.full_digest(inventory.path(index), inventory.sizes[index], partials[index]))
+        self.store_digests(inventory, computed, 1)
+        self.count_read(inventory, computed, 1)
+        fulls.update(computed)
+        identical.extend(split(big_groups, fulls))
+
+        for group in identical:
+            classes.append([index for representative in group for index in aliases[representative]])
+        return classes
@@ -0,0 +1,220 @@
+"""module dirfd
+
+Operations on files relative to open file descriptors of their directories (bounded LRU cache of descriptors)
+"""
+import os
+import stat
+import errno
+from collections import OrderedDict
+
+from file_manager.naming import rename_noreplace
+from file_manager.profiler import NULL_PROFILER
+
+MAX_OPEN = 64
+DIRECTORY_FLAGS = os.O_RDONLY | os.O_DIRECTORY | getattr(os, "O_CLOEXEC", 0)
+
+
+def change_mode(dir_fd, name, mode):
+    """Function to change permissions of file in directory (symbolic links are refused)
+
+    Args:
+        dir_fd (int): descriptor of directory
+        name (str): basename of file
+        mode (int): new permissions
+
+    Raises:
+        OSError: file is a symbolic link (ELOOP)
+    """
+    try:
+        file_fd = os.open(name, os.O_PATH | os.O_NOFOLLOW | os.O_CLOEXEC, dir_fd=dir_fd)
+    except AttributeError:
+        # O_PATH is not supported: check and change (small race window)
+        if stat.S_ISLNK(os.stat(name, dir_fd=dir_fd, follow_symlinks=False).st_mode):
+            raise OSError(errno.ELOOP, os.strerror(errno.ELOOP), name)
+        os.chmod(name, mode, dir_fd=dir_fd)
+        return
+    try:
+        if stat.S_ISLNK(os.fstat(file_fd).st_mode):
+            raise OSError(errno.ELOOP, os.strerror(errno.ELOOP), name)
+        # descriptor opened with O_PATH cannot be used by fchmod
+        try:
+            os.chmod("/proc/self/fd/{}".format(file_fd), mode)
+        except FileNotFoundError:
+            # /proc is not mounted
+            os.chmod(name, mode, dir_fd=dir_fd)
+    finally:
+        os.close(file_fd)
+
+
+class DirectoryCache:
+    """class DirectoryCache
+
+    Class to keep open file descriptors of recently used directories. Operations on files
+    use *at system calls (unlinkat, fchmodat, renameat, fstatat), so the kernel does not
+    resolve the whole path again and the last component of path is never followed if it
+    was replaced by a symbolic link.
+    """
+    def __init__(self, max_open=MAX_OPEN):
+        """init method
+
+        Args:
+            max_open (int, optional): maximal number of open descriptors. Defaults to MAX_OPEN.
+        """
+        # two directories are needed at once to rename files
+        self.max_open = max(2, max_open)
+        self.descriptors = OrderedDict()
+        self.profiler = NULL_PROFILER
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def get(self, directory):
+        """Method to get descriptor of directory (it is opened relatively to its parent if the parent is open)
+
+        Args:
+            directory (str): path to directory
+
+        Returns:
+            int: file descriptor
+        """
+        directory = directory or "."
+        fd = self.descriptors.get(directory)
+        if fd is not None:
+            self.descriptors.move_to_end(directory)
+            return fd
+
+        (parent, name) = os.path.split(directory)
+        parent_fd = self.descriptors.get(parent or ".") if name else None
+        if parent_fd is not None:
+            fd = os.open(name, DIRECTORY_FLAGS, dir_fd=parent_fd)
+        else:
+            fd = os.open(directory, DIRECTORY_FLAGS)
+        self.descriptors[directory] = fd
+        if len(self.descriptors) > self.max_open:
+            (_, oldest) = self.descriptors.popitem(last=False)
+            os.close(oldest)
+        return fd
+
+    def split(self, path):
+        """Method to get descriptor of directory and basename of file
+
+        Args:
+            path (str): name of file
+
+        Returns:
+            int, str: file descriptor of directory and basename of file
+        """
+        (directory, name) = os.path.split(path)
+        return self.get(directory), name
+
+    def forget_removed(self, paths):
+        """Method to close descriptors of directories (of given files) which were removed since opening
+
+        Args:
+            paths (iterable(str)): names of files
+
+        Returns:
+            bool: whether any descriptor was closed
+        """
+        closed = False
+        for path in paths:
+            directory = os.path.dirname(path) or "."
+            fd = self.descriptors.get(directory)
+            if fd is not None and os.fstat(fd).st_nlink == 0:
+                os.close(self.descriptors.pop(directory))
+                closed = True
+        return closed
+
+    def call(self, function, *paths):
+        """Method to call function with descriptors of directories and basenames of files (it is
+        called again if descriptor of directory turns out to be stale, e.g. directory was created again)
+
+        Args:
+            function (callable): function taking pairs (descriptor, basename) of every file
+            paths (str): names of files
+
+        Returns:
+            object: result of function
+        """
+        try:
+            return function(*[self.split(path) for path in paths])
+        except FileNotFoundError:
+            if not self.forget_removed(paths):
+                raise
+            return function(*[self.split(path) for path in paths])
+
+    def stat(self, path, follow_symlinks=False):
+        """Method to get metadata of file (symbolic links are not followed by default)
+
+        Args:
+            path (str): name of file
+            follow_symlinks (bool, optional): whether to get metadata of target of symbolic link. Defaults to False.
+
+        Returns:
+            os.stat_result: metadata of file
+        """
+        st = self.call(lambda file: os.stat(file[1], dir_fd=file[0], follow_symlinks=follow_symlinks), path)
+        self.profiler.count("stat")
+        return st
+
+    def unlink(self, path):
+        """Method to remove file
+
+        Args:
+            path (str): name of file
+        """
+        self.call(lambda file: os.unlink(file[1], dir_fd=file[0]), path)
+        self.profiler.count("unlink")
+
+    def chmod(self, path, mode):
+        """Method to change permissions of file (symbolic links are refused)
+
+        Args:
+            path (str): name of file
+            mode (int): new permissions
+        """
+        self.call(lambda file: change_mode(file[0], file[1], mode), path)
+        self.profiler.count("chmod")
+
+    def rename(self, source, target):
+        """Method to rename file only if target name is free
+
+        Args:
+            source (str): name of file
+            target (str): new name of file
+
+        Raises:
+            FileExistsError: target name is already used
+        """
+        self.call(lambda src, dst: rename_noreplace(src[1], dst[1], src[0], dst[0]), source, target)
+        self.profiler.count("rename")
+
+    def replace(self, source, target):
+        """Method to rename file replacing target
+
+        Args:
+            source (str): name of file
+            target (str): new name of file
+        """
+        self.call(lambda src, dst: os.replace(src[1], dst[1], src_dir_fd=src[0], dst_dir_fd=dst[0]), source, target)
+
+    def link(self, source, target):
+        """Method to create hard link
+
+        Args:
+            source (str): name of existing file
+            target (str): name of link
+        """
+        self.call(lambda src, dst: os.link(src[1], dst[1], src_dir_fd=src[0], dst_dir_fd=dst[0], follow_symlinks=False),
+                  source, target)
+        self.profiler.count("link")
+
+    def close(self):
+        """Method to close all descriptors
+        """
+        for fd in self.descriptors.values():
+            os.close(fd)
+        self.descriptors.clear()
@@ -0,0 +1,327 @@
+"""module inventory
+
+Compact columnar storage of scanned files and their metadata
+"""
+import os
+import sys
+from array import array
+
+from file_manager.scanner import FileRecord
+from file_manager.spill import SpilledArray, SpilledStrings, SpilledIds
+
+ACTIVE = 0
+REMOVED = 1
+UNLOADED = 2
+
+# numbers of files after which memory used by inventory is checked (the number is doubled after every check)
+MEMORY_CHECK = 4096
+COLUMNS = ("dir_ids", "sizes", "modes", "mtimes", "ctimes", "inodes", "devices", "states", "flags")
+
+
+class FileInventory:
+    """class FileInventory
+
+    Class to store files found during scanning. Every directory path is stored once,
+    basenames are kept in a list and metadata in typed arrays (columns) indexed by
+    the number of file. Removing and renaming of files only changes the columns in place.
+
+    Memory use per file (64-bit CPython): 50 bytes of columns (8 bytes for each of size,
+    mtime, ctime, inode and device, 4 bytes for mode and directory id, 1 byte for state
+    and 1 byte for flags of classification),
+    8 bytes of pointer in the list of basenames and the basename itself (49 bytes plus
+    its length for ASCII names). For a typical name it is about 120 bytes, instead of
+    about 250 bytes for a record object with a full path.
+
+    With memory limit, inventory which would exceed it is spilled: basenames and paths of
+    directories are moved to temporary SQLite databases (only recently used blocks of them
+    are kept in memory) and columns of metadata to memory-mapped temporary files.
+    """
+    def __init__(self, files=None, memory_limit=None):
+        """init method
+
+        Args:
+            files (iterable(str or FileRecord), optional): files to add. Defaults to None.
+            memory_limit (int, optional): number of bytes above which inventory is spilled to disk (no limit if None). Defaults to None.
+        """
+        self.directories = list()
+        self.directory_ids = dict()
+        self.names = list()
+        self.dir_ids = array("I")
+        self.sizes = array("q")
+        self.modes = array("I")
+        self.mtimes = array("q")
+        self.ctimes = array("q")
+        self.inodes = array("Q")
+        self.devices = array("Q")
+        self.states = array("B")
+        self.flags = array("B")
+        self.active = 0
+        self.unloaded = 0
+        self.memory_limit = memory_limit
+        self.spilled = False
+        self.next_check = MEMORY_CHECK
+
+        if files is not None:
+            self.extend(files)
+
+    def __len__(self):
+        """Number of files which are not removed
+
+        Returns:
+            int: number of files
+        """
+        return self.active
+
+    def directory_id(self, directory):
+        """Method to get id of (interned) directory path
+
+        Args:
+            directory (str): path to directory
+
+        Returns:
+            int: id of directory
+        """
+        dir_id = self.directory_ids.get(directory)
+        if dir_id is None:
+            dir_id = len(self.directories)
+            self.directories.append(directory)
+            self.directory_ids[directory] = dir_id
+        return dir_id
+
+    def add(self, path, size=0, mode=0, mtime_ns=0, ctime_ns=0, ino=0, dev=0, state=ACTIVE):
+        """Method to add file to inventory
+
+        Args:
+            path (str): name of file
+            size (int, optional): size of file. Defaults to 0.
+            mode (int, optional): mode of file. Defaults to 0.
+            mtime_ns (int, optional): time of last modification in nanoseconds. Defaults to 0.
+            ctime_ns (int, optional): time of last status change in nanoseconds. Defaults to 0.
+            ino (int, optional): inode number. Defaults to 0.
+            dev (int, optional): device identifier. Defaults to 0.
+            state (int, optional): state of file (ACTIVE or UNLOADED). Defaults to ACTIVE.
+
+        Returns:
+            int: index of file
+        """
+        directory, name = os.path.split(path)
+        self.dir_ids.append(self.directory_id(directory))
+        self.names.append(name)
+        self.sizes.append(size)
+        self.modes.append(mode)
+        self.mtimes.append(mtime_ns)
+        self.ctimes.append(ctime_ns)
+        self.inodes.append(ino)
+        self.devices.append(dev)
+        self.states.append(state)
+        self.flags.append(0)
+        self.active += 1
+        if state == UNLOADED:
+            self.unloaded += 1
+        if self.memory_limit is not None and len(self.names) >= self.next_check:
+            self.check_memory()
+        return len(self.names) - 1
+
+    def add_record(self, record):
+        """Method to add file by its record
+
+        Args:
+            record (FileRecord): record of file
+
+        Returns:
+            int: index of file
+        """
+        return self.add(record.path, record.size, record.mode, record.mtime_ns,
+                        record.ctime_ns, record.ino, record.dev)
+
+    def extend(self, files):
+        """Method to add many files (metadata of bare names of files is read on first use)
+
+        Args:
+            files (iterable(str or FileRecord)): names or records of files
+        """
+        for file in files:
+            if isinstance(file, FileRecord):
+                self.add_record(file)
+            else:
+                self.add(file, state=UNLOADED)
+
+    def merge(self, other):
+        """Method to append all files of other inventory (e.g. batch scanned by another process)
+
+        Args:
+            other (FileInventory): inventory of files
+        """
+        dir_ids = [self.directory_id(directory) for directory in other.directories]
+        self.dir_ids.extend(array("I", (dir_ids[dir_id] for dir_id in other.dir_ids)))
+        self.names.extend(other.names)
+        for column in COLUMNS[1:]:
+            getattr(self, column).extend(getattr(other, column))
+        self.active += other.active
+        self.unloaded += other.unloaded
+        if self.memory_limit is not None and len(self.names) >= self.next_check:
+            self.check_memory()
+
+    def check_memory(self):
+        """Method to spill inventory before it exceeds memory limit
+        """
+        # memory is checked again after the number of files is doubled
+        self.next_check = max(MEMORY_CHECK, 2 * len(self.names))
+        if not self.spilled and 2 * self.memory_usage() > self.memory_limit:
+            self.spill()
+
+    def spill(self):
+        """Method to move basenames, paths of directories and columns of metadata to temporary files
+        """
+        if self.spilled:
+            return
+        self.names = SpilledStrings(self.names)
+        self.directories = SpilledStrings(self.directories, indexed=True)
+        self.directory_ids = SpilledIds(self.directories)
+        for column in COLUMNS:
+            values = getattr(self, column)
+            setattr(self, column, SpilledArray(values.typecode, values))
+        self.spilled = True
+
+    def load_metadata(self):
+        """Method to read metadata of files added by bare names
+        """
+        if self.unloaded == 0:
+            return
+        for index, state in enumerate(self.states):
+            if state == UNLOADED:
+                self.update(index, os.stat(self.path(index)))
+        self.unloaded = 0
+
+    def update(self, index, st):
+        """Method to replace metadata of file
+
+        Args:
+            index (int): index of file
+            st (os.stat_result): metadata of file
+        """
+        self.sizes[index] = st.st_size
+        self.modes[index] = st.st_mode
+        self.mtimes[index] = st.st_mtime_ns
+        self.ctimes[index] = st.st_ctime_ns
+        self.inodes[index] = st.st_ino
+        self.devices[index] = st.st_dev
+        if self.states[index] == UNLOADED:
+            self.states[index] = ACTIVE
+
+    def path(self, index):
+        """Method to get name of file
+
+        Args:
+            index (int): index of file
+
+        Returns:
+            str: name of file
+        """
+        return os.path.join(self.directories[self.dir_ids[index]], self.names[index])
+
+    def directory(self, index):
+        """Method to get directory of file
+
+        Args:
+            index (int): index of file
+
+        Returns:
+            str: path to directory
+        """
+        return self.directories[self.dir_ids[index]]
+
+    def record(self, index):
+        """Method to get record of file
+
+        Args:
+            index (int): index of file
+
+        Returns:
+            FileRecord: record of file
+        """
+        return FileRecord(self.path(index), self.sizes[index], self.modes[index], self.mtimes[index],
+                          self.ctimes[index], self.inodes[index], self.devices[index])
+
+    def is_removed(self, index):
+        """Method to check whether file is removed
+
+        Args:
+            index (int): index of file
+
+        Returns:
+            bool: whether file is removed
+        """
+        return self.states[index] == REMOVED
+
+    def remove(self, index):
+        """Method to mark file as removed
+
+        Args:
+            index (int): index of file
+        """
+        if self.states[index] != REMOVED:
+            self.states[index] = REMOVED
+            self.active -= 1
+
+    def rename(self, index, new_path):
+        """Method to change name (and directory) of file
+
+        Args:
+            index (int): index of file
+            new_path (str): new name of file
+        """
+        directory, name = os.path.split(new_path)
+        self.dir_ids[index] = self.directory_id(directory)
+        self.names[index] = name
+
+    def indices(self):
+        """Method to get indices of files which are not removed
+
+        Yields:
+            int: index of file
+        """
+        removed = REMOVED
+        for index, state in enumerate(self.states):
+            if state != removed:
+                yield index
+
+    def flagged(self, flag, indices=None):
+        """Method to get indices of files (which are not removed) with given flag of classification
+
+        Args:
+            flag (int): flag of classification
+            indices (iterable(int), optional): indices of checked files (all files if not given). Defaults to None.
+
+        Yields:
+            int: index of file
+        """
+        (states, flags) = (self.states, self.flags)
+        for index in (range(len(flags)) if indices is None else indices):
+            if flags[index] & flag and states[index] != REMOVED:
+                yield index
+
+    def paths(self):
+        """Method to get names of files which are not removed
+
+        Returns:
+            list(str): names of files
+        """
+        return [self.path(index) for index in self.indices()]
+
+    def memory_usage(self):
+        """Method to estimate memory used by inventory
+
+        Returns:
+            int: number of bytes
+        """
+        if self.spilled:
+            # columns of metadata are mapped from files, so their pages can be dropped
+            return self.names.memory_usage() + self.directories.memory_usage()
+        columns = (self.dir_ids, self.sizes, self.modes, self.mtimes, self.ctimes,
+                   self.inodes, self.devices, self.states, self.flags)
+        usage = sum(column.itemsize * len(column) for column in columns)
+        usage += sys.getsizeof(self.names) + sum(sys.getsizeof(name) for name in self.names)
+        usage += sum(sys.getsizeof(directory) for directory in self.directories)
+        usage += sys.getsizeof(self.directories) + sys.getsizeof(self.directory_ids)
+        return usage
@@ -0,0 +1,183 @@
+"""module log
+
+Buffered log of actions performed on files (text or JSON Lines) with summary of counts and bytes per action
+"""
+import sys
+import json
+from collections import defaultdict
+
+from file_manager.plan import REMOVE, LINK, CHMOD, RENAME
+from file_manager.profiler import NULL_PROFILER
+
+# levels of log
+ERROR = 0
+SUMMARY = 1
+VERBOSE = 2
+LEVELS = {"error": ERROR, "summary": SUMMARY, "verbose": VERBOSE}
+
+# number of lines kept in memory before writing
+BUFFER_SIZE = 1024
+
+# actions which are not planned
+KEEP = "keep"
+FAILED = "failed"
+
+TEXT = {
+    REMOVE: "{path} removed",
+    KEEP: "{path} kept",
+    LINK: "{path} replaced with link to {target}",
+    CHMOD: "Permissions of {path} changed to {target}",
+    RENAME: "{path} renamed to {target}",
+    FAILED: "{path} failed",
+}
+
+
+def format_size(size):
+    """Function to format number of bytes
+
+    Args:
+        size (int): number of bytes
+
+    Returns:
+        str: size with unit
+    """
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if size < 1024:
+            break
+        size /= 1024
+    else:
+        unit = "TiB"
+    return "{} {}".format(size, unit) if unit == "B" else "{:.1f} {}".format(size, unit)
+
+
+class ActionLog:
+    """class ActionLog
+
+    Class to report actions performed on files. Messages about single files are formatted only
+    at verbose level and are written in batches; every action is counted (with bytes of files)
+    for summary.
+    """
+    def __init__(self, level=VERBOSE, json_lines=False, stream=None, buffer_size=BUFFER_SIZE):
+        """init method
+
+        Args:
+            level (int, optional): level of log (ERROR, SUMMARY or VERBOSE). Defaults to VERBOSE.
+            json_lines (bool, optional): whether to write messages in JSON Lines format. Defaults to False.
+            stream (file, optional): output stream (standard output if not given). Defaults to None.
+            buffer_size (int, optional): number of lines kept before writing (0 - write every line at once). Defaults to BUFFER_SIZE.
+        """
+        self.level = level
+        self.json_lines = json_lines
+        self.stream = stream
+        self.buffer_size = buffer_size
+        self.lines = list()
+        self.counts = defaultdict(lambda: [0, 0])
+        self.profiler = NULL_PROFILER
+
+    def write(self, line):
+        """Method to write line (through buffer)
+
+        Args:
+            line (str): line without end of line
+        """
+        self.lines.append(line)
+        if len(self.lines) > self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        """Method to write buffered lines
+        """
+        if self.lines:
+            stream = self.stream if self.stream is not None else sys.stdout
+            stream.write("\n".join(self.lines) + "\n")
+            stream.flush()
+            self.lines.clear()
+
+    def event(self, action, path, reason=None, target=None, size=0):
+        """Method to report action performed on file
+
+        Args:
+            action (str): action (REMOVE, KEEP, LINK, CHMOD, RENAME or FAILED)
+            path (str): name of file
+            reason (str, optional): reason of action (e.g. "empty", "duplicate"). Defaults to None.
+            target (str, optional): related name (e.g. new name, kept duplicate, new permissions). Defaults to None.
+            size (int, optional): size of file in bytes. Defaults to 0.
+        """
+        count = self.counts[(action, reason)]
+        count[0] += 1
+        count[1] += size
+        if self.level < VERBOSE:
+            return
+        if self.json_lines:
+            self.write(json.dumps({"action": action, "path": path, "reason": reason, "target": target, "size": size}))
+            return
+        text = TEXT[action].format(path=path, target=target)
+        if reason is not None:
+            if target is not None and action in (REMOVE, KEEP, FAILED):
+                text += " ({}: {})".format(reason, target)
+            else:
+                text += " ({})".format(reason)
+        self.write(text)
+
+    def message(self, text, level=SUMMARY):
+        """Method to report message not related to single action
+
+        Args:
+            text (str): message
+            level (int, optional): minimal level of log at which message is written. Defaults to SUMMARY.
+        """
+        if self.level >= level:
+            self.write(json.dumps({"message": text}) if self.json_lines else text)
+
+    def error(self, text, path=None):
+        """Method to report error (written at every level)
+
+        Args:
+            text (str): message
+            path (str, optional): name of file (counted as failed if given). Defaults to None.
+        """
+        if path is not None:
+            count = self.counts[(FAILED, None)]
+            count[0] += 1
+        self.write(json.dumps({"error": text, "path": path}) if self.json_lines else text)
+
+    def ask(self, question):
+        """Method to ask the user (buffered lines are written before, waiting is timed by profiler)
+
+        Args:
+            question (str): question
+
+        Returns:
+            str: answer
+        """
+        self.flush()
+        with self.profiler.prompt():
+            return input(question)
+
+    def summary_rows(self):
+        """Method to get numbers of files and bytes of every action
+
+        Returns:
+            list(tuple(str, str, int, int)): action, reason, number of files and number of bytes
+        """
+        return [(action, reason, files, size)
+                for (action, reason), (files, size) in sorted(self.counts.items(), key=lambda x: (x[0][0], x[0][1] or ""))]
+
+    def summary(self):
+        """Method to write summary of all actions (at summary and verbose levels)
+        """
+        if self.level < SUMMARY or not self.counts:
+            return
+        if self.json_lines:
+            self.write(json.dumps({"summary": [{"action": action, "reason": reason, "files": files, "bytes": size}
+                                               for (action, reason, files, size) in self.summary_rows()]}))
+            return
+        for (action, reason, files, size) in self.summary_rows():
+            name = action if reason is None else "{} ({})".format(action, reason)
+            self.write("{}: {} files, {}".format(name, files, format_size(size)))
+
+    def close(self):
+        """Method to write summary and all buffered lines
+        """
+        self.summary()
+        self.flush()
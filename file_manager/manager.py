@@ -1,9 +1,21 @@
 import os
 import stat
-
-from file_manager.utils import load_configuration, extension_of, file_size
+from collections import defaultdict
+
+from file_manager.utils import load_configuration, load_permission_rules, load_temporary_rules
+from file_manager.inventory import FileInventory
+from file_manager.classifier import FileClassifier, EMPTY, TEMPORARY, BAD_PERMISSIONS, WRONG_NAME
+from file_manager.plan import ActionPlan, REMOVE, CHMOD, RENAME
+from file_manager.conflicts import ConflictResolver
+from file_manager.naming import NameIndex
+from file_manager.dirfd import DirectoryCache
 from file_manager.remover import FileRemover
 from file_manager.changer import FileChanger
+from file_manager.profiler import NULL_PROFILER
+from file_manager.log import ActionLog
+from file_manager.permissions import PermissionPolicy
+from file_manager.temporary import TemporaryRules
+from file_manager.spill import needs_spill, sorted_groups, spilled_groups
 
 
 class FileManager:
@@ -16,14 +28,16 @@ class FileManager:
 
         Args:
             conf_path (str): path to configuration file
-            filenames (list, optional): list of files' names to manage. Defaults to [].
+            filenames (list or FileInventory, optional): list of files' names (or records of files) or inventory of files to manage. Defaults to [].
         """
         (attr, bad, sub, temp) = load_configuration(conf_path)
         self.attributes = attr
         self.bad_characters = bad
         self.substitute = sub
         self.temp_extensions = temp
-        self.filenames = filenames
+        self.policy = PermissionPolicy.from_configuration(attr, load_permission_rules(conf_path))
+        self.temporary = TemporaryRules(*load_temporary_rules(conf_path))
+        self.set_filenames(filenames)
 
         self.ask_empty = False
         self.action_empty = True
@@ -34,9 +48,16 @@ class FileManager:
         self.ask_permissions = False
         self.action_permissions = True
         self.action_duplicate = 'old'
+        self.action_name_conflict = 'both'
 
-        self.remover = FileRemover()
-        self.changer = FileChanger(attr, sub, bad)
+        # descriptors of directories are shared by all operations on files
+        self.directories = DirectoryCache()
+        self.log = ActionLog()
+        self.remover = FileRemover(directories=self.directories, log=self.log)
+        self.changer = FileChanger(attr, sub, bad, self.directories, self.log)
+        self.classifier = FileClassifier(attr, self.changer.sanitizer, temp, self.policy, self.temporary)
+        self.profiler = NULL_PROFILER
+        self.memory_limit = None
 
     def get_filenames(self):
         """Getter of filenames
@@ -44,15 +65,92 @@ class FileManager:
         Returns:
             list(str): files' names
         """
-        return self.filenames
+        return self.inventory.paths()
 
     def set_filenames(self, filenames):
         """Setter of filenames
 
         Args:
-            filenames (list(str)): list of files' names
+            filenames (list(str or FileRecord) or FileInventory): list of files' names (or records of files) or inventory of files
+        """
+        if isinstance(filenames, FileInventory):
+            self.inventory = filenames
+        else:
+            self.inventory = FileInventory(filenames)
+        self.classified = False
+        self.known_flags = None
+
+    def get_inventory(self):
+        """Getter of inventory
+
+        Returns:
+            FileInventory: inventory of files with their metadata
+        """
+        return self.inventory
+
+    def set_known_flags(self, classified):
+        """Setter of mask of files whose flags of classification are already known (e.g. from snapshot of previous run)
+
+        Args:
+            classified (bytearray): mask of files (indexed like inventory)
+        """
+        self.known_flags = classified
+
+    def set_roots(self, roots):
+        """Setter of main and copy directories (rules of temporary files may differ between them)
+
+        Args:
+            roots (list(str)): paths to main and copy directories
+        """
+        self.temporary.set_roots(roots[1:])
+
+    def set_hash_cache(self, cache):
+        """Setter of persistent cache of files' digests used to find duplicates
+
+        Args:
+            cache (HashCache): cache of digests (None to disable)
         """
-        self.filenames = filenames
+        self.remover.finder.cache = cache
+
+    def set_jobs(self, jobs):
+        """Setter of number of threads used to compute digests of files
+
+        Args:
+            jobs (int): number of threads
+        """
+        self.remover.finder.jobs = jobs
+
+    def set_profiler(self, profiler):
+        """Setter of profiler which records time of stages and operations on files
+
+        Args:
+            profiler (RunProfiler): profiler (None to disable profiling)
+        """
+        self.profiler = profiler if profiler is not None else NULL_PROFILER
+        self.directories.profiler = self.profiler
+        self.remover.finder.profiler = self.profiler
+
+    def set_memory_limit(self, memory_limit):
+        """Setter of memory limit (inventory is spilled to disk and files are grouped by size on disk if they would exceed it)
+
+        Args:
+            memory_limit (int): maximal number of bytes (None to disable limit)
+        """
+        self.memory_limit = memory_limit
+        self.inventory.memory_limit = memory_limit
+        if memory_limit is not None:
+            self.inventory.check_memory()
+
+    def set_log(self, log):
+        """Setter of log of actions performed on files
+
+        Args:
+            log (ActionLog): log of actions
+        """
+        self.log = log
+        self.remover.log = log
+        self.remover.finder.log = log
+        self.changer.log = log
 
     def get_temp_extensions(self):
         """Getter of temp_extensions
@@ -72,7 +170,8 @@ class FileManager:
 
     def set_parameters(self, ask_empty=False, action_empty=True, ask_temporary=False,
                        action_temporary=True, ask_wrong_name=False, action_wrong_name=True,
-                       ask_permissions=False, action_permissions=True, action_duplicate='old'):
+                       ask_permissions=False, action_permissions=True, action_duplicate='old',
+                       action_name_conflict='both'):
         """Setter of managing parameters
 
         Args:
@@ -84,7 +183,8 @@ class FileManager:
             action_wrong_name (bool, optional): default action about wrong named files (True - keep, False - rename). Defaults to True.
             ask_permissions (bool, optional): wheter ask to change wrong permissions of files. Defaults to False.
             action_permissions (bool, optional): default action about wrong permissions of files (True - keep, False - change). Defaults to True.
-            action_duplicate (str, optional): default action about duplicated files ("new" - remove newer file, "old" - remove older files, "none" - keep both). Defaults to 'old'.
+            action_duplicate (str, optional): default action about duplicated files ("new" - remove newer file, "old" - remove older files, "link" - replace newer file with link to older one, "none" - keep both). Defaults to 'old'.
+            action_name_conflict (str, optional): default action about different files with the same relative path in main and copy directories ("newer" - keep newer file, "older" - keep older file, "both" - keep both). Defaults to 'both'.
         """
         self.ask_empty = ask_empty
         self.action_empty = action_empty
@@ -95,90 +195,234 @@ class FileManager:
         self.ask_permissions = ask_permissions
         self.action_permissions = action_permissions
         self.action_duplicate = action_duplicate
+        self.action_name_conflict = action_name_conflict
 
-    def remove_empty_files(self):
-        """Method to remove all empty files (with asking user or not)
-        """
-        new_filenames = self.filenames[:]
-        for filename in self.filenames:
-            if file_size(filename) == 0:
-                if self.remover.process_empty_file(filename, self.ask_empty, self.action_empty):
-                    new_filenames.remove(filename)
-        self.filenames = new_filenames
+    def classify_files(self, force=False):
+        """Method to classify all files in one pass (empty, temporary, with wrong permissions or name)
 
-    def rename_wrong_named_files(self):
-        """Method to rename all wrong named files (with asking user or not)
+        Args:
+            force (bool, optional): whether to classify files again. Defaults to False.
         """
-        new_filenames = list()
-        for filename in self.filenames:
-            if len(self.bad_characters.intersection(filename)) > 0:
-                filename = self.changer.process_wrong_named_file(filename, self.ask_wrong_name, self.action_wrong_name)
-            new_filenames.append(filename)
-        self.filenames = new_filenames
+        if force or not self.classified:
+            self.classifier.classify_inventory(self.inventory, self.known_flags)
+            self.classified = True
+            self.profiler.count("files_examined", len(self.inventory))
 
-    def remove_temporary_files(self):
-        """Method to remove all temporary files (with asking user or not)
-        """
-        new_filenames = self.get_filenames()[:]
-        for filename in self.filenames:
-            if extension_of(filename) in self.temp_extensions or filename[-1] == "~":
-                if self.remover.process_temporary_file(filename, self.ask_temporary, self.action_temporary):
-                    new_filenames.remove(filename)
-        self.filenames = new_filenames
+    def remove_empty_files(self, indices=None):
+        """Method to remove all empty files (with asking user or not)
 
-    def change_bad_files_permissions(self):
-        """Method to change all wrong permissions of files (with asking user or not)
+        Args:
+            indices (list(int), optional): indices of checked files (all files if not given). Defaults to None.
         """
-        for filename in self.filenames:
-            perm = os.stat(filename).st_mode
-            perm = stat.filemode(perm)
+        self.classify_files()
+        inventory = self.inventory
+        for index in inventory.flagged(EMPTY, indices):
+            if self.remover.process_empty_file(inventory.path(index), self.ask_empty, self.action_empty):
+                inventory.remove(index)
 
-            if perm != self.attributes:
-                self.changer.process_file_permissions(filename, perm, self.ask_permissions, self.action_permissions)
+    def correct_filenames(self, indices=None):
+        """Method to generate correct names of all wrong named files, directory by directory (names
+        which collide with existing files or with each other get suffix _1, _2,...)
 
-    def sort_and_group_filenames_by_size(self):
-        """Method to sort files by size
+        Args:
+            indices (list(int), optional): indices of checked files (all files if not given). Defaults to None.
+
+        Returns:
+            dict(int, list(tuple(int, str))): indices and new names of files in every directory
+        """
+        inventory = self.inventory
+        by_directory = defaultdict(list)
+        for index in inventory.flagged(WRONG_NAME, indices):
+            by_directory[inventory.dir_ids[index]].append(index)
+        if not by_directory:
+            return dict()
+
+        names = NameIndex()
+        for index in inventory.indices():
+            if inventory.dir_ids[index] in by_directory:
+                names.add(inventory.path(index))
+
+        renames = dict()
+        for dir_id, indices in by_directory.items():
+            directory = inventory.directories[dir_id]
+            renames[dir_id] = [(index, names.allocate(os.path.join(directory, self.changer.sanitizer.sanitize(inventory.names[index]))))
+                               for index in indices]
+        return renames
+
+    def rename_wrong_named_files(self, indices=None):
+        """Method to rename all wrong named files (with asking user or not)
+
+        Args:
+            indices (list(int), optional): indices of checked files (all files if not given). Defaults to None.
+        """
+        self.classify_files()
+        inventory = self.inventory
+        for renames in self.correct_filenames(indices).values():
+            for (index, new_filename) in renames:
+                filename = inventory.path(index)
+                try:
+                    new_filename = self.changer.process_wrong_named_file(filename, self.ask_wrong_name, self.action_wrong_name, new_filename)
+                except OSError as e:
+                    self.log.error("Cannot rename {}: {}".format(filename, e), filename)
+                    continue
+                if new_filename != filename:
+                    inventory.rename(index, new_filename)
+                    inventory.flags[index] &= ~WRONG_NAME
+
+    def remove_temporary_files(self, indices=None):
+        """Method to remove all temporary files (with asking user or not)
 
-        Yields:
-            list(str): group of names of files with the same size
+        Args:
+            indices (list(int), optional): indices of checked files (all files if not given). Defaults to None.
         """
-        # sort by size
-        self.filenames = sorted(self.filenames, key=lambda x: os.path.getsize(x))
+        self.classify_files()
+        inventory = self.inventory
+        for index in inventory.flagged(TEMPORARY, indices):
+            if self.remover.process_temporary_file(inventory.path(index), self.ask_temporary, self.action_temporary, inventory.sizes[index]):
+                inventory.remove(index)
 
-        files_same_size = []
-        for i in range(len(self.filenames)):
-            filename = self.filenames[i]
+    def change_bad_files_permissions(self, indices=None):
+        """Method to change all wrong permissions of files to permissions given by policy (with asking user or not,
+        without asking permissions are changed in one pass)
 
-            if len(files_same_size) == 0:
-                files_same_size.append(filename)
-            elif file_size(filename) == file_size(files_same_size[-1]):
-                files_same_size.append(filename)
-            else:
-                yield files_same_size
-                files_same_size = [filename]
+        Args:
+            indices (list(int), optional): indices of checked files (all files if not given). Defaults to None.
+        """
+        self.classify_files()
+        inventory = self.inventory
+        modes = inventory.modes
+        targets = [(index, self.policy.target(inventory.directory(index), inventory.names[index], modes[index]))
+                   for index in inventory.flagged(BAD_PERMISSIONS, indices)]
+        if self.action_permissions:
+            changed = self.changer.change_permissions([(inventory.path(index), mode) for (index, mode) in targets],
+                                                      self.remover.finder.jobs)
+        else:
+            changed = [self.changer.process_file_permissions(inventory.path(index), stat.filemode(modes[index]),
+                                                             self.ask_permissions, False, mode)
+                       for (index, mode) in targets]
+        for (index, mode), is_changed in zip(targets, changed):
+            if is_changed:
+                modes[index] = stat.S_IFMT(modes[index]) | mode
+                inventory.flags[index] &= ~BAD_PERMISSIONS
 
+    def sort_and_group_filenames_by_size(self):
+        """Method to sort files by size (on disk if sorting in memory would exceed memory limit)
 
-            if i == len(self.filenames) - 1:
-                yield files_same_size
+        Returns:
+            iterator(list(int)): groups of indices (in inventory) of files with the same size
+        """
+        inventory = self.inventory
+        inventory.load_metadata()
+        if needs_spill(inventory, self.memory_limit):
+            # files with unique size are not yielded, so only their number is known
+            self.profiler.count("spilled_files", len(inventory))
+            return spilled_groups(inventory)
+        return sorted_groups(inventory)
 
     def remove_duplicate_files(self):
         """Method to removeduplicated files (with asking user or not)
         """
-        removed_filenames = list()
-
         for group in self.sort_and_group_filenames_by_size():
-            filenames = self.remover.process_group_of_filenames_by_size(group, self.action_duplicate)
-            removed_filenames.extend(filenames)
+            self.remover.process_group_of_inventory(self.inventory, group, self.action_duplicate)
 
-        self.filenames = [filename for filename in self.filenames if filename not in removed_filenames]
+    def resolve_name_conflicts(self, roots):
+        """Method to resolve conflicts of files with the same relative path in main and copy directories
 
-    def manage_files(self):
-        """Method to manage all files
+        Args:
+            roots (list(str)): paths to main and copy directories
         """
-        self.remove_empty_files()
-        self.remove_temporary_files()
-        self.remove_duplicate_files()
+        inventory = self.inventory
+        # identical files are removed only if duplicates may be removed (asking the user if action is not set)
+        resolver = ConflictResolver(self.remover.finder, self.action_name_conflict,
+                                    self.action_duplicate not in ("none", "link"))
+        for (removed, kept, reason) in resolver.resolve(inventory, roots):
+            (filename, target) = (inventory.path(removed), inventory.path(kept))
+            reason = "name conflict, {}".format(reason)
+            if self.action_duplicate is None and reason == "name conflict, identical":
+                text = "{} is identical to {} with the same relative path. Remove? [Y/n]: "
+                if self.log.ask(text.format(filename, target)).upper() not in ("Y", ""):
+                    self.remover.keep_file(filename, reason=reason, target=target, size=inventory.sizes[removed])
+                    continue
+            self.remover.remove_file(filename, reason=reason, target=target, size=inventory.sizes[removed])
+            inventory.remove(removed)
+
+    def manage_files(self, roots=None):
+        """Method to manage all files (files are classified once, only finding duplicates reads them)
 
-        self.change_bad_files_permissions()
-        self.rename_wrong_named_files()
+        Args:
+            roots (list(str), optional): paths to main and copy directories to resolve conflicts of names. Defaults to None.
+        """
+        profiler = self.profiler
+        if roots is not None:
+            self.set_roots(roots)
+        with profiler.stage("classify"):
+            self.classify_files(force=True)
+        try:
+            with profiler.stage("remove_empty_files"):
+                self.remove_empty_files()
+            with profiler.stage("remove_temporary_files"):
+                self.remove_temporary_files()
+            with profiler.stage("remove_duplicate_files"):
+                self.remove_duplicate_files()
+            if roots is not None:
+                with profiler.stage("resolve_name_conflicts"):
+                    self.resolve_name_conflicts(roots)
+
+            with profiler.stage("change_bad_files_permissions"):
+                self.change_bad_files_permissions()
+            with profiler.stage("rename_wrong_named_files"):
+                self.rename_wrong_named_files()
+        finally:
+            self.directories.close()
+            self.log.flush()
     
+
+    def plan_files(self, roots=None):
+        """Method to plan managing of all files without touching them (actions which would be asked about are planned too)
+
+        Args:
+            roots (list(str), optional): paths to main and copy directories to resolve conflicts of names. Defaults to None.
+
+        Returns:
+            ActionPlan: plan of actions
+        """
+        plan = ActionPlan()
+        inventory = self.inventory
+        if roots is not None:
+            self.set_roots(roots)
+        self.classify_files(force=True)
+
+        for (flag, reason, ask, action) in ((EMPTY, "empty", self.ask_empty, self.action_empty),
+                                            (TEMPORARY, "temporary", self.ask_temporary, self.action_temporary)):
+            if ask or action:
+                for index in inventory.flagged(flag):
+                    plan.add(REMOVE, inventory, index, reason)
+                    inventory.remove(index)
+
+        action_duplicate = self.action_duplicate if self.action_duplicate is not None else "old"
+        for group in self.sort_and_group_filenames_by_size():
+            self.remover.plan_group_of_inventory(inventory, group, plan, action_duplicate)
+
+        if roots is not None:
+            resolver = ConflictResolver(self.remover.finder, self.action_name_conflict,
+                                        action_duplicate not in ("none", "link"))
+            for (removed, kept, reason) in resolver.resolve(inventory, roots):
+                target = inventory.path(kept) if reason == "identical" else None
+                plan.add(REMOVE, inventory, removed, "name conflict ({})".format(reason), target=target)
+                inventory.remove(removed)
+
+        if self.ask_permissions or self.action_permissions:
+            for index in inventory.flagged(BAD_PERMISSIONS):
+                mode = self.policy.target(inventory.directory(index), inventory.names[index], inventory.modes[index])
+                plan.add(CHMOD, inventory, index, "permissions", mode=mode)
+                inventory.modes[index] = stat.S_IFMT(inventory.modes[index]) | mode
+                inventory.flags[index] &= ~BAD_PERMISSIONS
+
+        if self.ask_wrong_name or self.action_wrong_name:
+            for renames in self.correct_filenames().values():
+                for (index, new_filename) in renames:
+                    plan.add(RENAME, inventory, index, "wrong name", target=new_filename)
+                    inventory.rename(index, new_filename)
+                    inventory.flags[index] &= ~WRONG_NAME
+
+        return plan
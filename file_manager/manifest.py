@@ -0,0 +1,293 @@
+"""module manifest
+
+Exportable manifest of scanned directory trees (SQLite database) with relative paths, metadata and digests of files, compared and merged without touching the files
+"""
+import os
+import socket
+import sqlite3
+from contextlib import contextmanager
+from urllib.parse import quote
+
+from file_manager.dedup import DuplicateFinder
+
+# digests written to manifest
+NO_DIGESTS = "none"
+PARTIAL = "partial"
+FULL = "full"
+DIGESTS = (NO_DIGESTS, PARTIAL, FULL)
+
+BATCH_SIZE = 10000
+
+
+class Manifest:
+    """class Manifest
+
+    Class to store files of directory trees (from one or many hosts) independently of the
+    trees: every file is kept as path relative to its root with size, mtime, mode and
+    digests of content. Manifests of other hosts (or of parts of one tree scanned on many
+    machines) can be merged, and two manifests can be compared to find identical files and
+    files with the same relative path but different content.
+    """
+    def __init__(self, path, read_only=False):
+        """init method
+
+        Args:
+            path (str): path to database file
+            read_only (bool, optional): whether existing manifest is only read (it is never created). Defaults to False.
+
+        Raises:
+            FileNotFoundError: read manifest does not exist
+        """
+        self.path = path
+        if read_only:
+            if not os.path.isfile(path):
+                raise FileNotFoundError(path)
+            self.connection = sqlite3.connect("file:{}?mode=ro".format(quote(os.path.abspath(path))), uri=True)
+            return
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS roots (
+                id INTEGER PRIMARY KEY, host TEXT, path TEXT, UNIQUE (host, path));
+            CREATE TABLE IF NOT EXISTS files (
+                root INTEGER, path TEXT, size INTEGER, mtime_ns INTEGER, mode INTEGER,
+                partial BLOB, full BLOB, PRIMARY KEY (root, path)) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS files_content ON files (size, partial);
+            CREATE INDEX IF NOT EXISTS files_path ON files (path);
+        """)
+
+    def add_root(self, host, path):
+        """Method to get id of root (added if it is not in manifest yet)
+
+        Args:
+            host (str): name of host
+            path (str): absolute path to root
+
+        Returns:
+            int: id of root
+        """
+        self.connection.execute("INSERT OR IGNORE INTO roots (host, path) VALUES (?, ?)", (host, path))
+        return self.connection.execute("SELECT id FROM roots WHERE host = ? AND path = ?", (host, path)).fetchone()[0]
+
+    def roots(self, schema="main"):
+        """Method to get roots of manifest
+
+        Args:
+            schema (str, optional): name of database ("main" or attached manifest). Defaults to "main".
+
+        Returns:
+            dict(int, str): location ("host:path") of every root by its id
+        """
+        rows = self.connection.execute("SELECT id, host, path FROM {}.roots".format(schema))
+        return {root: "{}:{}".format(host, path) for (root, host, path) in rows}
+
+    def __len__(self):
+        """Number of files in manifest
+
+        Returns:
+            int: number of files
+        """
+        return self.connection.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    def digests(self, inventory, indices, finder, digests):
+        """Method to compute (or take from cache of finder) digests of files
+
+        Args:
+            inventory (FileInventory): inventory of files
+            indices (list(int)): indices of files
+            finder (DuplicateFinder): finder with hasher, cache and threads used to compute digests
+            digests (str): kind of digests (NO_DIGESTS, PARTIAL or FULL)
+
+        Returns:
+            dict(int, bytes), dict(int, bytes): partial and full digests of files (files which cannot be read are skipped)
+        """
+        (partials, fulls) = (dict(), dict())
+        if digests == NO_DIGESTS:
+            return partials, fulls
+        (hasher, sizes) = (finder.hasher, inventory.sizes)
+        # empty files are identical to each other, but they are never reported as duplicates
+        indices = [index for index in indices if sizes[index] > 0]
+        missing = finder.cached_digests(inventory, indices, partials, 0)
+        computed = finder.compute(inventory, missing, lambda index: hasher.partial_digest(inventory.path(index), sizes[index]))
+        finder.store_digests(inventory, computed, 0)
+        finder.count_read(inventory, computed, 0)
+        partials.update(computed)
+
+        # partial digest of small file covers its whole content
+        big = list()
+        for index, partial in partials.items():
+            if hasher.is_partial_complete(sizes[index]):
+                fulls[index] = partial
+            else:
+                big.append(index)
+        if digests == FULL:
+            missing = finder.cached_digests(inventory, big, fulls, 1)
+            computed = finder.compute(inventory, missing,
+                                      lambda index: hasher.full_digest(inventory.path(index), sizes[index], partials[index]))
+            finder.store_digests(inventory, computed, 1)
+            finder.count_read(inventory, computed, 1)
+            fulls.update(computed)
+        return partials, fulls
+
+    def export(self, inventory, roots, finder=None, digests=FULL, host=None):
+        """Method to write files of directory trees to manifest (previous files of the same roots are replaced)
+
+        Args:
+            inventory (FileInventory): inventory of files
+            roots (list(str)): paths to main and copy directories
+            finder (DuplicateFinder, optional): finder used to compute digests (with its cache and threads). Defaults to None.
+            digests (str, optional): kind of digests (NO_DIGESTS, PARTIAL or FULL). Defaults to FULL.
+            host (str, optional): name of host (name of this machine if not given). Defaults to None.
+
+        Returns:
+            int: number of written files
+        """
+        if digests not in DIGESTS:
+            raise ValueError("Wrong kind of digests: {}".format(digests))
+        finder = finder if finder is not None else DuplicateFinder()
+        host = host if host is not None else socket.gethostname()
+        # nested roots are matched before their parents
+        paths = sorted(((os.path.normpath(root), os.path.abspath(root)) for root in roots),
+                       key=lambda x: len(x[0]), reverse=True)
+        root_ids = [(root, self.add_root(host, absolute)) for (root, absolute) in paths]
+        self.connection.executemany("DELETE FROM files WHERE root = ?", ((root_id,) for (_, root_id) in root_ids))
+
+        locations = dict()
+
+        def locate(directory):
+            location = locations.get(directory)
+            if location is None:
+                normalized = os.path.normpath(directory)
+                location = (None, None)
+                for (root, root_id) in root_ids:
+                    if normalized == root or normalized.startswith(root.rstrip(os.sep) + os.sep):
+                        location = (root_id, os.path.relpath(normalized, root))
+                        break
+                locations[directory] = location
+            return location
+
+        written = 0
+        batch = list()
+        for index in inventory.indices():
+            batch.append(index)
+            if len(batch) >= BATCH_SIZE:
+                written += self.write(inventory, batch, locate, finder, digests)
+                batch = list()
+        written += self.write(inventory, batch, locate, finder, digests)
+        self.connection.commit()
+        return written
+
+    def write(self, inventory, indices, locate, finder, digests):
+        """Method to write batch of files to manifest
+
+        Args:
+            inventory (FileInventory): inventory of files
+            indices (list(int)): indices of files
+            locate (callable): function giving id of root and relative path of directory
+            finder (DuplicateFinder): finder used to compute digests
+            digests (str): kind of digests
+
+        Returns:
+            int: number of written files
+        """
+        (partials, fulls) = self.digests(inventory, indices, finder, digests)
+        rows = list()
+        for index in indices:
+            (root_id, directory) = locate(inventory.directory(index))
+            if root_id is None:
+                # file outside of all roots (e.g. moved by other program)
+                continue
+            path = os.path.normpath(os.path.join(directory, inventory.names[index]))
+            rows.append((root_id, path, inventory.sizes[index], inventory.mtimes[index], inventory.modes[index],
+                         partials.get(index), fulls.get(index)))
+        self.connection.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        return len(rows)
+
+    @contextmanager
+    def attached(self, path):
+        """Method to open other manifest in the same connection (as database "other")
+
+        Args:
+            path (str): path to other manifest
+
+        Yields:
+            dict(int, str): locations of roots of other manifest
+        """
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+        self.connection.execute("ATTACH DATABASE ? AS other", (path,))
+        try:
+            yield self.roots("other")
+        finally:
+            self.connection.commit()
+            self.connection.execute("DETACH DATABASE other")
+
+    def merge(self, path):
+        """Method to add all roots and files of other manifest (files of the same roots are replaced)
+
+        Args:
+            path (str): path to other manifest
+
+        Returns:
+            int: number of added files
+        """
+        added = 0
+        with self.attached(path):
+            for (root, host, root_path) in self.connection.execute("SELECT id, host, path FROM other.roots").fetchall():
+                root_id = self.add_root(host, root_path)
+                self.connection.execute("DELETE FROM files WHERE root = ?", (root_id,))
+                added += self.connection.execute("""INSERT INTO files SELECT ?, path, size, mtime_ns, mode, partial, full
+                                                    FROM other.files WHERE root = ?""", (root_id, root)).rowcount
+        return added
+
+    def duplicates(self, path):
+        """Method to find files of this manifest identical to files of other manifest
+
+        Files are identical if their full digests are equal; if full digest of any of them
+        is unknown (manifest with partial digests), equal partial digests make them probably identical.
+
+        Args:
+            path (str): path to other manifest
+
+        Yields:
+            tuple(str, str, int, bool): location of file, location of identical file in other manifest, size and whether full digests were compared
+        """
+        with self.attached(path) as other_roots:
+            roots = self.roots()
+            rows = self.connection.execute("""
+                SELECT a.root, a.path, b.root, b.path, a.size, a.full IS NOT NULL AND b.full IS NOT NULL
+                FROM files a JOIN other.files b ON a.size = b.size AND a.partial = b.partial
+                WHERE a.size > 0 AND (a.full IS NULL OR b.full IS NULL OR a.full = b.full)
+                ORDER BY a.size DESC, a.root, a.path, b.root, b.path""")
+            for (root, name, other_root, other_name, size, verified) in rows:
+                yield (os.path.join(roots[root], name), os.path.join(other_roots[other_root], other_name),
+                       size, bool(verified))
+
+    def conflicts(self, path):
+        """Method to find files with the same relative path in this and other manifest but with different content
+
+        Args:
+            path (str): path to other manifest
+
+        Yields:
+            tuple(str, str, str): location of file, location of file in other manifest and reason ("size", "content" or "mtime" if digests are unknown)
+        """
+        with self.attached(path) as other_roots:
+            roots = self.roots()
+            rows = self.connection.execute("""
+                SELECT a.root, a.path, b.root, b.path,
+                       CASE WHEN a.size != b.size THEN 'size'
+                            WHEN a.size = 0 THEN NULL
+                            WHEN a.partial IS NOT NULL AND b.partial IS NOT NULL THEN
+                                CASE WHEN a.partial != b.partial OR a.full != b.full THEN 'content' END
+                            WHEN a.mtime_ns != b.mtime_ns THEN 'mtime' END AS reason
+                FROM files a JOIN other.files b ON a.path = b.path
+                WHERE reason IS NOT NULL
+                ORDER BY a.path, a.root, b.root""")
+            for (root, name, other_root, other_name, reason) in rows:
+                yield (os.path.join(roots[root], name), os.path.join(other_roots[other_root], other_name), reason)
+
+    def close(self):
+        """Method to save changes and close database
+        """
+        self.connection.commit()
+        self.connection.close()
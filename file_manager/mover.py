@@ -0,0 +1,240 @@
+"""module mover
+
+Moving files from copy directories (Y1, Y2,...) to main directory: rename on the same device, zero-copy transfer between devices
+"""
+import os
+import errno
+import time
+import shutil
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+
+from file_manager.scanner import walk_files
+from file_manager.utils import generate_unique_filename
+from file_manager.naming import NameIndex, rename_noreplace
+from file_manager.log import ActionLog
+
+# number of files moved at once (files of copy directory are never listed all together)
+BATCH_SIZE = 10000
+
+
+def copy_file(source, target):
+    """Function to copy content of file in kernel (copy_file_range or sendfile) and preserve its metadata
+
+    Args:
+        source (str): name of copied file
+        target (str): name of new file
+
+    Raises:
+        FileExistsError: target name is already used
+        OSError: copying failed (target is removed)
+    """
+    with open(source, "rb") as src:
+        # target is created only if its name is free, so a file of other program is never removed below
+        dst = open(target, "xb")
+        try:
+            with dst:
+                (src_fd, dst_fd) = (src.fileno(), dst.fileno())
+                size = os.fstat(src_fd).st_size
+                offset = 0
+                try:
+                    while offset < size:
+                        copied = os.copy_file_range(src_fd, dst_fd, size - offset)
+                        if copied == 0:
+                            break
+                        offset += copied
+                except (OSError, AttributeError):
+                    # copy_file_range is not supported (e.g. old kernel or other platform)
+                    while offset < size:
+                        copied = os.sendfile(dst_fd, src_fd, offset, size - offset)
+                        if copied == 0:
+                            break
+                        offset += copied
+            shutil.copystat(source, target)
+        except BaseException:
+            # partial copy (e.g. no space left on device) is not left behind
+            os.unlink(target)
+            raise
+
+class FileMover:
+    """class FileMover
+
+    Class to move files to main directory. Files on the same device as main directory are renamed,
+    other files are copied in kernel by several threads and removed afterwards.
+    """
+    def __init__(self, main_dir_path, jobs=1, index=None, log=None):
+        """init method
+
+        Args:
+            main_dir_path (str): path to main directory
+            jobs (int, optional): number of files copied between devices at once. Defaults to 1.
+            index (NameIndex, optional): index of names of files in main directory (if not given, main directory is scanned). Defaults to None.
+            log (ActionLog, optional): log of errors (unbuffered standard output if not given). Defaults to None.
+        """
+        self.log = log if log is not None else ActionLog(buffer_size=0)
+        self.main_dir_path = main_dir_path
+        self.main_dev = os.stat(main_dir_path).st_dev
+        self.jobs = jobs
+        self.stats = {"rename": [0, 0, 0.0], "copy": [0, 0, 0.0]}
+        self.created_directories = set()
+        if index is None:
+            index = NameIndex.from_paths(record.path for record in walk_files(main_dir_path))
+        self.index = index
+
+    def place(self, filename, new_filename, function):
+        """Method to put file under new name, name is changed when it turns out to be used (e.g. by other process)
+
+        Args:
+            filename (str): name of moved file
+            new_filename (str): proposed new name of file
+            function (callable): function moving file, it raises FileExistsError if new name is used
+
+        Returns:
+            str: new name of file
+        """
+        while True:
+            try:
+                function(filename, new_filename)
+                return new_filename
+            except FileExistsError:
+                new_filename = self.index.allocate(new_filename)
+
+    def make_directory(self, directory):
+        """Method to create directory (with parents) in main directory
+
+        Args:
+            directory (str): path to directory
+        """
+        if directory not in self.created_directories:
+            os.makedirs(directory, exist_ok=True)
+            self.created_directories.add(directory)
+
+    def move_between_devices(self, source, target):
+        """Method to move file from other device
+
+        Args:
+            source (str): name of moved file
+            target (str): proposed new name of file
+
+        Returns:
+            str: new name of file
+        """
+        target = self.place(source, target, copy_file)
+        os.remove(source)
+        return target
+
+    def move(self, files, copy_path):
+        """Method to move files from copy directory
+
+        Args:
+            files (list(tuple)): moved files (name, size, device, index in inventory or None)
+            copy_path (str): path to copy directory
+
+        Returns:
+            list(tuple(int, str)): indices (in inventory) and new names of moved files
+        """
+        same_device = list()
+        other_device = list()
+        moved = list()
+        for (filename, size, dev, index) in files:
+            new_filename = generate_unique_filename(filename, self.main_dir_path, copy_path, self.index)
+            self.make_directory(os.path.dirname(new_filename))
+            if dev == self.main_dev:
+                same_device.append((filename, new_filename, size, index))
+            else:
+                other_device.append((filename, new_filename, size, index))
+
+        start = time.perf_counter()
+        for (filename, new_filename, size, index) in same_device:
+            try:
+                new_filename = self.place(filename, new_filename, rename_noreplace)
+            except OSError as e:
+                if e.errno != errno.EXDEV:
+                    self.log.error("Cannot move {} to {}: {}".format(filename, new_filename, e), filename)
+                    continue
+                # the same device mounted in other place
+                other_device.append((filename, new_filename, size, index))
+                continue
+            moved.append((index, new_filename))
+            self.count("rename", size)
+        self.stats["rename"][2] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(1, self.jobs)) as executor:
+            futures = [(executor.submit(self.move_between_devices, filename, new_filename), filename, new_filename, size, index)
+                       for (filename, new_filename, size, index) in other_device]
+            for (future, filename, new_filename, size, index) in futures:
+                try:
+                    new_filename = future.result()
+                except OSError as e:
+                    self.log.error("Cannot move {} to {}: {}".format(filename, new_filename, e), filename)
+                    continue
+                moved.append((index, new_filename))
+                self.count("copy", size)
+        self.stats["copy"][2] += time.perf_counter() - start
+        return moved
+
+    def count(self, kind, size):
+        """Method to count moved file
+
+        Args:
+            kind (str): kind of moving ("rename" or "copy")
+            size (int): size of file
+        """
+        self.stats[kind][0] += 1
+        self.stats[kind][1] += size
+
+    def summary(self):
+        """Method to prepare summary of moving (number of files, bytes and throughput)
+
+        Returns:
+            str: summary
+        """
+        lines = list()
+        for kind, (files, size, seconds) in self.stats.items():
+            if files == 0:
+                continue
+            seconds = max(seconds, 1e-9)
+            lines.append("{}: {} files, {:.1f} MB in {:.3f} s ({:.1f} files/s, {:.1f} MB/s)".format(
+                "Moved (same device)" if kind == "rename" else "Copied (other device)",
+                files, size / 1e6, seconds, files / seconds, size / seconds / 1e6))
+        return "\n".join(lines)
+
+
+def move_files_to_main_dir(main_dir_path, copy_paths, inventory=None, jobs=1, log=None):
+    """Function to move all files from copy directories (Y1, Y2,...) to main directory
+
+    Args:
+        main_dir_path (str): path to main directory
+        copy_paths (list(str)): paths to copy directories
+        inventory (FileInventory, optional): inventory of already scanned files (updated in place). Defaults to None.
+        jobs (int, optional): number of files copied between devices at once. Defaults to 1.
+        log (ActionLog, optional): log of errors. Defaults to None.
+
+    Returns:
+        FileMover: mover with statistics of moving
+    """
+    index = None
+    if inventory is not None:
+        # names of spilled inventory are not gathered in memory, directories are read when they are used
+        index = NameIndex.from_disk() if inventory.spilled else NameIndex.from_inventory(inventory, main_dir_path)
+    mover = FileMover(main_dir_path, jobs, index, log)
+    for copy_path in copy_paths:
+        if inventory is None:
+            files = ((record.path, record.size, record.dev, None) for record in walk_files(copy_path))
+        else:
+            prefix = os.path.join(copy_path, "")
+            directories = set(dir_id for dir_id, directory in enumerate(inventory.directories)
+                              if os.path.join(directory, "").startswith(prefix))
+            files = ((inventory.path(index), inventory.sizes[index], inventory.devices[index], index)
+                     for index in inventory.indices() if inventory.dir_ids[index] in directories)
+
+        while True:
+            batch = list(islice(files, BATCH_SIZE))
+            if not batch:
+                break
+            for (index, new_filename) in mover.move(batch, copy_path):
+                if index is not None:
+                    inventory.rename(index, new_filename)
+                    inventory.devices[index] = mover.main_dev
+    return mover
@@ -0,0 +1,166 @@
+"""module naming
+
+In-memory index of names of files used to give unique names without probing filesystem
+"""
+import os
+import errno
+import ctypes
+import threading
+from collections import defaultdict
+
+AT_FDCWD = -100
+RENAME_NOREPLACE = 1
+
+try:
+    _libc = ctypes.CDLL(None, use_errno=True)
+    _renameat2 = _libc.renameat2
+    _renameat2.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_int, ctypes.c_char_p, ctypes.c_uint)
+except (OSError, AttributeError):
+    _renameat2 = None
+
+
+def rename_noreplace(source, target, src_dir_fd=None, dst_dir_fd=None):
+    """Function to atomically rename file only if target name is free
+
+    Args:
+        source (str): name of file
+        target (str): new name of file
+        src_dir_fd (int, optional): descriptor of directory of source (names are relative to it). Defaults to None.
+        dst_dir_fd (int, optional): descriptor of directory of target (names are relative to it). Defaults to None.
+
+    Raises:
+        FileExistsError: target name is already used
+    """
+    if _renameat2 is not None:
+        result = _renameat2(AT_FDCWD if src_dir_fd is None else src_dir_fd, os.fsencode(source),
+                            AT_FDCWD if dst_dir_fd is None else dst_dir_fd, os.fsencode(target), RENAME_NOREPLACE)
+        if result == 0:
+            return
+        error = ctypes.get_errno()
+        if error not in (errno.ENOSYS, errno.EINVAL):
+            raise OSError(error, os.strerror(error), source, None, target)
+    # renameat2 is not supported (by system or filesystem): link fails if target exists
+    os.link(source, target, src_dir_fd=src_dir_fd, dst_dir_fd=dst_dir_fd, follow_symlinks=False)
+    os.unlink(source, dir_fd=src_dir_fd)
+
+
+class DirectoryNames(dict):
+    """class DirectoryNames
+
+    Class to store names of files in every directory, read from disk when directory is used for the first time
+    """
+    def __missing__(self, directory):
+        try:
+            names = set(os.listdir(directory))
+        except OSError:
+            names = set()
+        self[directory] = names
+        return names
+
+
+class NameIndex:
+    """class NameIndex
+
+    Class to store names of files in every directory and next free number of suffix
+    for every base name, so that unique name is found in constant time
+    """
+    def __init__(self):
+        """init method
+        """
+        self.names = defaultdict(set)
+        self.next_suffix = dict()
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_inventory(cls, inventory, root=None):
+        """Method to create index of files from inventory
+
+        Args:
+            inventory (FileInventory): inventory of files
+            root (str, optional): only files from this directory (and its subdirectories) are indexed. Defaults to None.
+
+        Returns:
+            NameIndex: index of names
+        """
+        index = cls()
+        prefix = os.path.join(root, "") if root is not None else ""
+        for file_index in inventory.indices():
+            directory = inventory.directory(file_index)
+            if os.path.join(directory, "").startswith(prefix):
+                index.names[directory].add(inventory.names[file_index])
+        return index
+
+    @classmethod
+    def from_disk(cls):
+        """Method to create index of files which reads names of every directory from disk on first use
+        (memory is used only for directories to which files are moved)
+
+        Returns:
+            NameIndex: index of names
+        """
+        index = cls()
+        index.names = DirectoryNames()
+        return index
+
+    @classmethod
+    def from_paths(cls, paths):
+        """Method to create index of files from their names
+
+        Args:
+            paths (iterable(str)): names of files
+
+        Returns:
+            NameIndex: index of names
+        """
+        index = cls()
+        for path in paths:
+            index.add(path)
+        return index
+
+    def add(self, path):
+        """Method to mark name as used
+
+        Args:
+            path (str): name of file
+        """
+        (directory, name) = os.path.split(path)
+        self.names[directory].add(name)
+
+    def discard(self, path):
+        """Method to mark name as free
+
+        Args:
+            path (str): name of file
+        """
+        (directory, name) = os.path.split(path)
+        self.names[directory].discard(name)
+
+    def __contains__(self, path):
+        (directory, name) = os.path.split(path)
+        return name in self.names[directory]
+
+    def allocate(self, path):
+        """Method to give unique name of file (proposed name or name with suffix _1, _2,...) and mark it as used
+
+        Args:
+            path (str): proposed name of file
+
+        Returns:
+            str: unique name of file
+        """
+        (directory, name) = os.path.split(path)
+        with self.lock:
+            names = self.names[directory]
+            if name not in names:
+                names.add(name)
+                return path
+            (base, extension) = os.path.splitext(name)
+            key = (directory, base, extension)
+            i = self.next_suffix.get(key, 1)
+            candidate = "{}_{}{}".format(base, i, extension)
+            while candidate in names:
+                i += 1
+                candidate = "{}_{}{}".format(base, i, extension)
+            self.next_suffix[key] = i + 1
+            names.add(candidate)
+            return os.path.join(directory, candidate)
@@ -0,0 +1,140 @@
+"""module permissions
+
+Policy of permissions of files compiled once from configuration (per-path rules with numeric target modes)
+"""
+import os
+import re
+import stat
+import fnmatch
+
+from file_manager.utils import perm_to_num, extension_of
+
+ANY_EXECUTE = stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH
+
+
+def parse_mode(text):
+    """Function to convert permissions from configuration (symbolic "rwxr-xr-x" or octal "755") to number
+
+    Args:
+        text (str): permissions
+
+    Returns:
+        int: numeric permissions
+
+    Raises:
+        ValueError: wrong permissions
+    """
+    text = text.strip()
+    if text and all(char in "01234567" for char in text):
+        return int(text, 8)
+    if len(text) not in (9, 10):
+        raise ValueError("Wrong permissions: {}".format(text))
+    try:
+        return perm_to_num(text)
+    except KeyError:
+        raise ValueError("Wrong permissions: {}".format(text)) from None
+
+
+class PermissionRule:
+    """class PermissionRule
+
+    Class of rule giving permissions of files selected by glob of path (or basename if glob has no "/"),
+    by extensions or by execute permission
+    """
+    def __init__(self, selector, mode):
+        """init method
+
+        Args:
+            selector (str): glob of basename (e.g. "*.sh") or of the end of path (e.g. "data/*"), extensions (e.g. ".sh .py") or "executable"
+            mode (int): target permissions
+        """
+        self.selector = selector
+        self.mode = mode
+        self.pattern = None
+        self.extensions = None
+        self.executable = False
+        if selector == "executable":
+            self.executable = True
+        elif selector.startswith(".") and not any(char in selector for char in "*?[/"):
+            self.extensions = set(selector.split())
+        else:
+            self.on_path = "/" in selector
+            # glob with "/" matches the end of path at any depth (like patterns of temporary files)
+            self.pattern = re.compile(fnmatch.translate("*/" + selector.lstrip("/") if self.on_path else selector))
+
+    def matches(self, directory, name, mode):
+        """Method to check whether rule selects file
+
+        Args:
+            directory (str): directory of file
+            name (str): basename of file
+            mode (int): current mode of file
+
+        Returns:
+            bool: whether file is selected
+        """
+        if self.executable:
+            return bool(mode & ANY_EXECUTE)
+        if self.extensions is not None:
+            return extension_of(name) in self.extensions
+        return self.pattern.match("/" + os.path.join(directory, name) if self.on_path else name) is not None
+
+
+class PermissionPolicy:
+    """class PermissionPolicy
+
+    Class to find target permissions of file: the first matching rule wins, otherwise the default
+    permissions are used. Only permission bits of regular files are compared (as numbers, without
+    any system call), so files with already correct permissions are never touched.
+    """
+    def __init__(self, default_mode, rules=()):
+        """init method
+
+        Args:
+            default_mode (int): permissions of files not selected by any rule
+            rules (iterable(PermissionRule), optional): rules in order of priority. Defaults to ().
+        """
+        self.default_mode = default_mode
+        self.rules = list(rules)
+
+    @classmethod
+    def from_configuration(cls, permissions, rules=()):
+        """Method to compile policy from configuration
+
+        Args:
+            permissions (str): default permissions (symbolic or octal)
+            rules (iterable(tuple(str, str)), optional): selectors and permissions of rules. Defaults to ().
+
+        Returns:
+            PermissionPolicy: policy
+        """
+        return cls(parse_mode(permissions), [PermissionRule(selector, parse_mode(mode)) for (selector, mode) in rules])
+
+    def target(self, directory, name, mode):
+        """Method to get target permissions of file
+
+        Args:
+            directory (str): directory of file
+            name (str): basename of file
+            mode (int): current mode of file
+
+        Returns:
+            int: target permissions
+        """
+        for rule in self.rules:
+            if rule.matches(directory, name, mode):
+                return rule.mode
+        return self.default_mode
+
+    def is_compliant(self, directory, name, mode):
+        """Method to check whether permissions of file are correct (files other than regular are always correct)
+
+        Args:
+            directory (str): directory of file
+            name (str): basename of file
+            mode (int): current mode of file
+
+        Returns:
+            bool: whether permissions are correct
+        """
+        return not stat.S_ISREG(mode) or stat.S_IMODE(mode) == self.target(directory, name, mode)
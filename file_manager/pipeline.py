@@ -0,0 +1,322 @@
+"""module pipeline
+
+Streaming pipeline (asyncio with bounded queues): files are classified, removed and hashed while directories are still walked
+"""
+import asyncio
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from file_manager.cache import HashCache
+from file_manager.classifier import EMPTY, TEMPORARY
+from file_manager.utils import get_all_files
+
+BATCH_SIZE = 512
+QUEUE_SIZE = 16
+
+
+class DigestMemo:
+    """class DigestMemo
+
+    Class to keep digests computed during walking in memory (in front of persistent cache, if any),
+    so finding duplicates at the end of walking does not read files again. It has the interface of HashCache.
+    """
+    key = staticmethod(HashCache.key)
+
+    def __init__(self, cache=None):
+        """init method
+
+        Args:
+            cache (HashCache, optional): persistent cache of digests. Defaults to None.
+        """
+        self.cache = cache
+        self.digests = dict()
+
+    def get(self, key):
+        """Method to get digests of file
+
+        Args:
+            key (tuple(int)): key of file
+
+        Returns:
+            tuple(bytes): partial and full digest (None if unknown)
+        """
+        digests = self.digests.get(key)
+        if digests is None:
+            if self.cache is None:
+                return (None, None)
+            digests = tuple(self.cache.get(key))
+            if digests != (None, None):
+                self.digests[key] = digests
+        return digests
+
+    def put(self, key, path, partial=None, full=None):
+        """Method to save digests of file
+
+        Args:
+            key (tuple(int)): key of file
+            path (str): name of file
+            partial (bytes, optional): partial digest. Defaults to None.
+            full (bytes, optional): full digest. Defaults to None.
+        """
+        (old_partial, old_full) = self.digests.get(key, (None, None))
+        self.digests[key] = (partial if partial is not None else old_partial, full if full is not None else old_full)
+        if self.cache is not None:
+            self.cache.put(key, path, partial, full)
+
+
+class StreamingPipeline:
+    """class StreamingPipeline
+
+    Class to manage files in stages connected by bounded queues: walker, classifier, remover of
+    empty and temporary files, partial hasher and full hasher. Blocking calls run in threads.
+    Digests are computed as soon as second file of the same size (or with the same partial digest)
+    appears. When walking ends, the remaining actions (duplicates, conflicts of names, permissions,
+    names) are performed by the manager exactly as in batch mode, but with digests already known.
+
+    Only compact inventory of files is kept for the whole run; records of files are passed in batches.
+    """
+    def __init__(self, manager, roots, batch_size=BATCH_SIZE, queue_size=QUEUE_SIZE, rules=None):
+        """init method
+
+        Args:
+            manager (FileManager): manager of files (with empty inventory)
+            roots (list(str)): paths to main and copy directories
+            batch_size (int, optional): number of files passed between stages at once. Defaults to BATCH_SIZE.
+            queue_size (int, optional): maximal number of batches waiting between stages. Defaults to QUEUE_SIZE.
+            rules (WalkRules, optional): rules pruning directory trees. Defaults to None.
+        """
+        self.manager = manager
+        self.roots = roots
+        self.rules = rules
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.finder = manager.remover.finder
+        self.memo = DigestMemo(self.finder.cache)
+        self.by_size = defaultdict(list)
+        self.by_partial = defaultdict(list)
+        self.inodes = set()
+
+    def run(self):
+        """Method to manage all files
+        """
+        asyncio.run(self.main())
+
+    async def main(self):
+        """Method to run all stages and perform remaining actions
+        """
+        manager = self.manager
+        # files are classified by the pipeline as they come
+        manager.classified = True
+        manager.set_roots(self.roots)
+        queues = [asyncio.Queue(self.queue_size) for _ in range(4)]
+        profiler = manager.profiler
+        self.finder.cache = self.memo
+        try:
+            with profiler.stage("stream"), ThreadPoolExecutor(max_workers=1) as walker, \
+                    ThreadPoolExecutor(max_workers=max(1, self.finder.jobs)) as pool:
+                self.pool = pool
+                await asyncio.gather(self.walk(walker, queues[0]),
+                                     self.stage(queues[0], queues[1], self.classify),
+                                     self.stage(queues[1], queues[2], self.remove),
+                                     self.stage(queues[2], queues[3], self.hash_partial),
+                                     self.stage(queues[3], None, self.hash_full))
+
+            # the same actions in the same order as in FileManager.manage_files
+            try:
+                with profiler.stage("remove_duplicate_files"):
+                    manager.remove_duplicate_files()
+                with profiler.stage("resolve_name_conflicts"):
+                    manager.resolve_name_conflicts(self.roots)
+                with profiler.stage("change_bad_files_permissions"):
+                    manager.change_bad_files_permissions()
+                with profiler.stage("rename_wrong_named_files"):
+                    manager.rename_wrong_named_files()
+            finally:
+                manager.directories.close()
+                manager.log.flush()
+        finally:
+            self.finder.cache = self.memo.cache
+
+    async def walk(self, executor, output):
+        """Stage walking directories (in separate thread)
+
+        Args:
+            executor (ThreadPoolExecutor): executor of walking
+            output (asyncio.Queue): queue of batches of records of files
+        """
+        loop = asyncio.get_running_loop()
+
+        def produce():
+            batch = []
+            for record in get_all_files(self.roots[0], self.roots[1:], self.rules, self.manager.profiler):
+                batch.append(record)
+                if len(batch) == self.batch_size:
+                    # waits while the queue is full
+                    asyncio.run_coroutine_threadsafe(output.put(batch), loop).result()
+                    batch = []
+            if batch:
+                asyncio.run_coroutine_threadsafe(output.put(batch), loop).result()
+
+        try:
+            await loop.run_in_executor(executor, produce)
+        finally:
+            await output.put(None)
+
+    async def stage(self, input, output, function):
+        """Method to run stage until end of input (None) is received
+
+        Args:
+            input (asyncio.Queue): queue of input batches
+            output (asyncio.Queue): queue of output batches (None for last stage)
+            function (coroutine function): function processing batch and returning output batch
+        """
+        try:
+            while True:
+                batch = await input.get()
+                if batch is None:
+                    break
+                result = await function(batch)
+                if output is not None and result:
+                    await output.put(result)
+        except Exception:
+            # earlier stages must not wait for free place in queue forever
+            while batch is not None:
+                batch = await input.get()
+            raise
+        finally:
+            if output is not None:
+                await output.put(None)
+
+    async def classify(self, records):
+        """Stage adding files to inventory and classifying them
+
+        Args:
+            records (list(FileRecord)): records of files
+
+        Returns:
+            list(int): indices of files
+        """
+        inventory = self.manager.inventory
+        classifier = self.manager.classifier
+        indices = []
+        for record in records:
+            index = inventory.add_record(record)
+            inventory.flags[index] = classifier.classify(inventory.names[index], record.size, record.mode, inventory.directory(index))
+            indices.append(index)
+        self.manager.profiler.count("files_examined", len(records))
+        return indices
+
+    async def remove(self, indices):
+        """Stage removing empty and temporary files (in thread, the user may be asked)
+
+        Files are removed in thread, but inventory is changed only by the event loop
+        (the classifier adds files to it at the same time).
+
+        Args:
+            indices (list(int)): indices of files
+
+        Returns:
+            list(int): indices of remaining files
+        """
+        manager = self.manager
+        inventory = manager.inventory
+        empty = [(index, inventory.path(index)) for index in inventory.flagged(EMPTY, indices)]
+        temporary = [(index, inventory.path(index), inventory.sizes[index]) for index in inventory.flagged(TEMPORARY, indices)]
+
+        def remove():
+            remover = manager.remover
+            removed = set(index for (index, filename) in empty
+                          if remover.process_empty_file(filename, manager.ask_empty, manager.action_empty))
+            removed.update(index for (index, filename, size) in temporary if index not in removed and
+                           remover.process_temporary_file(filename, manager.ask_temporary, manager.action_temporary, size))
+            return removed
+
+        for index in await asyncio.get_running_loop().run_in_executor(self.pool, remove):
+            inventory.remove(index)
+        return [index for index in indices if not inventory.is_removed(index)]
+
+    async def compute(self, indices, function):
+        """Method to compute digests of files in threads
+
+        Args:
+            indices (list(int)): indices of files
+            function (callable): function computing digest of file by its index
+
+        Returns:
+            dict(int, bytes): digests of files (files which cannot be read are skipped)
+        """
+        loop = asyncio.get_running_loop()
+
+        def compute_one(index):
+            try:
+                return function(index)
+            except (OSError, ValueError) as e:
+                # file is reported when duplicates are found
+                return e
+
+        results = await asyncio.gather(*[loop.run_in_executor(self.pool, compute_one, index) for index in indices])
+        return {index: result for index, result in zip(indices, results) if not isinstance(result, Exception)}
+
+    async def hash_partial(self, indices):
+        """Stage computing partial digests of files which have other file (other inode) with the same size
+
+        Args:
+            indices (list(int)): indices of files
+
+        Returns:
+            list(int): indices of files which need full digest
+        """
+        inventory = self.manager.inventory
+        hasher = self.finder.hasher
+        needed = []
+        for index in indices:
+            inode = (inventory.devices[index], inventory.inodes[index])
+            if inode in self.inodes:
+                # hard link of known file
+                continue
+            self.inodes.add(inode)
+            group = self.by_size[inventory.sizes[index]]
+            group.append(index)
+            if len(group) == 2:
+                needed.extend(group)
+            elif len(group) > 2:
+                needed.append(index)
+
+        partials = dict()
+        missing = self.finder.cached_digests(inventory, needed, partials, 0)
+        computed = await self.compute(missing, lambda index: hasher.partial_digest(inventory.path(index), inventory.sizes[index]))
+        self.finder.store_digests(inventory, computed, 0)
+        self.finder.count_read(inventory, computed, 0)
+        partials.update(computed)
+
+        full_needed = []
+        for index in needed:
+            if index not in partials or hasher.is_partial_complete(inventory.sizes[index]):
+                continue
+            group = self.by_partial[(inventory.sizes[index], partials[index])]
+            group.append(index)
+            if len(group) == 2:
+                full_needed.extend(group)
+            elif len(group) > 2:
+                full_needed.append(index)
+        return full_needed
+
+    async def hash_full(self, indices):
+        """Stage computing full digests of files which have other file with the same partial digest
+
+        Args:
+            indices (list(int)): indices of files
+
+        Returns:
+            list(int): indices of hashed files
+        """
+        inventory = self.manager.inventory
+        hasher = self.finder.hasher
+        memo = self.memo
+        fulls = dict()
+        missing = self.finder.cached_digests(inventory, indices, fulls, 1)
+        partials = {index: memo.get(memo.key(inventory, index))[0] for index in missing}
+        computed = await self.compute(missing, lambda index: hasher.full_digest(inventory.path(index), inventory.sizes[index], partials[index]))
+        self.finder.store_digests(inventory, computed, 1)
+        self.finder.count_read(inventory, computed, 1)
+        return list(computed)
@@ -0,0 +1,232 @@
+"""module plan
+
+Plan of actions (saved as JSON Lines) prepared without touching files and applied later
+"""
+import os
+import json
+from collections import defaultdict
+
+from file_manager.dirfd import DirectoryCache
+
+REMOVE = "remove"
+LINK = "link"
+CHMOD = "chmod"
+RENAME = "rename"
+
+# order of actions applied in one directory
+ORDER = {REMOVE: 0, LINK: 1, CHMOD: 2, RENAME: 3}
+# renaming can change names of files kept instead of removed or linked duplicates in other directories,
+# so all renames are applied after all other actions
+PHASES = ((REMOVE, LINK, CHMOD), (RENAME,))
+
+
+class PlannedAction:
+    """class PlannedAction
+
+    Class to store one planned action with expected metadata of file
+    """
+    __slots__ = ("action", "path", "reason", "size", "mtime_ns", "target", "mode")
+
+    def __init__(self, action, path, reason, size, mtime_ns, target=None, mode=None):
+        """init method
+
+        Args:
+            action (str): action (REMOVE, LINK, CHMOD or RENAME)
+            path (str): name of file
+            reason (str): reason of action (e.g. "empty", "temporary", "duplicate")
+            size (int): expected size of file
+            mtime_ns (int): expected time of last modification of file in nanoseconds
+            target (str, optional): new name of file (RENAME) or name of kept identical file (LINK or REMOVE of duplicate). Defaults to None.
+            mode (int, optional): new permissions of file (CHMOD). Defaults to None.
+        """
+        self.action = action
+        self.path = path
+        self.reason = reason
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.target = target
+        self.mode = mode
+
+    def to_dict(self):
+        """Method to convert action to dictionary
+
+        Returns:
+            dict: action
+        """
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data):
+        """Method to create action from dictionary
+
+        Args:
+            data (dict): action
+
+        Returns:
+            PlannedAction: action
+        """
+        return cls(**data)
+
+    def __str__(self):
+        if self.action in (RENAME, LINK):
+            return "{} {} -> {} ({})".format(self.action, self.path, self.target, self.reason)
+        if self.action == CHMOD:
+            return "{} {} {:o} ({})".format(self.action, self.path, self.mode, self.reason)
+        return "{} {} ({})".format(self.action, self.path, self.reason)
+
+
+class ActionPlan:
+    """class ActionPlan
+
+    Class to store list of planned actions
+    """
+    def __init__(self, actions=None):
+        """init method
+
+        Args:
+            actions (list(PlannedAction), optional): planned actions. Defaults to None.
+        """
+        self.actions = actions if actions is not None else list()
+
+    def __len__(self):
+        return len(self.actions)
+
+    def __iter__(self):
+        return iter(self.actions)
+
+    def add(self, action, inventory, index, reason, target=None, mode=None):
+        """Method to plan action on file from inventory
+
+        Args:
+            action (str): action (REMOVE, LINK, CHMOD or RENAME)
+            inventory (FileInventory): inventory of files
+            index (int): index of file
+            reason (str): reason of action
+            target (str, optional): new name of file (RENAME) or name of kept identical file (LINK or REMOVE of duplicate). Defaults to None.
+            mode (int, optional): new permissions of file (CHMOD). Defaults to None.
+        """
+        self.actions.append(PlannedAction(action, inventory.path(index), reason, inventory.sizes[index],
+                                          inventory.mtimes[index], target, mode))
+
+    def save(self, path):
+        """Method to save plan in JSON Lines format
+
+        Args:
+            path (str): name of file with plan
+        """
+        with open(path, "w") as f:
+            for action in self.actions:
+                f.write(json.dumps(action.to_dict()) + "\n")
+
+    @classmethod
+    def load(cls, path):
+        """Method to load plan saved in JSON Lines format
+
+        Args:
+            path (str): name of file with plan
+
+        Returns:
+            ActionPlan: plan
+        """
+        with open(path, "r") as f:
+            return cls([PlannedAction.from_dict(json.loads(line)) for line in f if line.strip()])
+
+    def by_directory(self, kinds=None):
+        """Method to group actions by directory (actions in one directory are ordered: removing, linking, changing permissions, renaming)
+
+        Args:
+            kinds (iterable(str), optional): kinds of grouped actions (all actions if not given). Defaults to None.
+
+        Returns:
+            dict(str, list(PlannedAction)): actions of every directory
+        """
+        kinds = set(kinds) if kinds is not None else set(ORDER)
+        groups = defaultdict(list)
+        for action in self.actions:
+            if action.action in kinds:
+                groups[os.path.dirname(action.path)].append(action)
+        for actions in groups.values():
+            actions.sort(key=lambda x: ORDER[x.action])
+        return groups
+
+    def phases(self):
+        """Method to group actions into phases applied one after another (removing, linking and changing
+        permissions of all files first, then renaming), actions of every phase are grouped by directory
+
+        Returns:
+            list(dict(str, list(PlannedAction))): actions of every directory in every phase
+        """
+        return [self.by_directory(kinds) for kinds in PHASES]
+
+
+def is_unchanged(action, directories=None):
+    """Function to check whether file has the same metadata as during planning
+    (and whether kept identical file still exists before removing or linking duplicate)
+
+    Args:
+        action (PlannedAction): planned action
+        directories (DirectoryCache, optional): open descriptors of directories. Defaults to None.
+
+    Returns:
+        bool: whether file is unchanged
+    """
+    if directories is None:
+        directories = DirectoryCache()
+    try:
+        st = directories.stat(action.path)
+        if action.action in (REMOVE, LINK) and action.target is not None:
+            if directories.stat(action.target).st_size != action.size:
+                return False
+    except OSError:
+        return False
+    return st.st_size == action.size and st.st_mtime_ns == action.mtime_ns
+
+def apply_action(action, remover):
+    """Function to perform planned action
+
+    Args:
+        action (PlannedAction): planned action
+        remover (FileRemover): remover used to link files (its descriptors of directories are used by all actions)
+
+    Returns:
+        bool: whether action was performed
+    """
+    directories = remover.directories
+    if action.action == REMOVE:
+        directories.unlink(action.path)
+    elif action.action == LINK:
+        return remover.link_file(action.target, action.path)
+    elif action.action == CHMOD:
+        directories.chmod(action.path, action.mode)
+    elif action.action == RENAME:
+        directories.rename(action.path, action.target)
+    return True
+
+def apply_plan(plan, remover, log=None):
+    """Function to apply plan (every file is verified before action, actions of every phase are performed directory by directory)
+
+    Args:
+        plan (ActionPlan): plan of actions
+        remover (FileRemover): remover used to link files
+        log (ActionLog, optional): log of skipped and failed actions (log of remover if not given). Defaults to None.
+
+    Returns:
+        dict(str, int): number of performed actions of every kind and numbers of skipped and failed actions
+    """
+    log = log if log is not None else remover.log
+    counts = defaultdict(int)
+    with remover.directories as directories:
+        for phase in plan.phases():
+            for directory, actions in sorted(phase.items()):
+                for action in actions:
+                    if not is_unchanged(action, directories):
+                        log.error("{} changed since planning, skipped".format(action.path))
+                        counts["skipped"] += 1
+                        continue
+                    try:
+                        performed = apply_action(action, remover)
+                    except OSError as e:
+                        log.error("{} failed: {}".format(action, e), action.path)
+                        performed = False
+                    counts[action.action if performed else "failed"] += 1
+    return dict(counts)
@@ -1,8 +1,8 @@
 """script prepare
 
-Script to prepare testing two-level directory tree
+Script to prepare testing two-level directory tree (run as python3 -m file_manager.prepare PATH CONF COPY_DIRS)
 """
-from utils import load_configuration, prepare_subfiles
+from file_manager.utils import load_configuration, prepare_subfiles
 from sys import argv
 
 if len(argv) > 3:
@@ -0,0 +1,187 @@
+"""module profiler
+
+Measuring time of stages of run and counting operations on files (report in JSON and Prometheus text format)
+"""
+import os
+import sys
+import json
+import time
+import contextlib
+from collections import defaultdict
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+PREFIX = "file_manager"
+
+
+def peak_rss():
+    """Function to get peak resident set size of process
+
+    Returns:
+        int: number of bytes (None if unknown)
+    """
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return usage if sys.platform == "darwin" else usage * 1024
+
+
+class NullProfiler:
+    """class NullProfiler
+
+    Class of disabled profiler: every method does nothing, so instrumented code costs one call
+    """
+    enabled = False
+    _stage = contextlib.nullcontext()
+
+    def stage(self, name):
+        """Method to measure time of stage (used as context manager)
+
+        Args:
+            name (str): name of stage
+
+        Returns:
+            contextlib.AbstractContextManager: context of stage
+        """
+        return self._stage
+
+    def prompt(self):
+        """Method to measure time of waiting for answer of the user (used as context manager)
+
+        Returns:
+            contextlib.AbstractContextManager: context of waiting
+        """
+        return self._stage
+
+    def count(self, name, value=1):
+        """Method to increase counter
+
+        Args:
+            name (str): name of counter
+            value (int, optional): increase of counter. Defaults to 1.
+        """
+
+
+NULL_PROFILER = NullProfiler()
+
+
+class RunProfiler(NullProfiler):
+    """class RunProfiler
+
+    Class to record wall time of every stage, counters of operations (files examined, stat calls,
+    bytes read for comparison, unlinks, chmods, renames, links) and peak memory of run. Time of
+    waiting for answers of the user is reported as separate stage "prompt" and is not included
+    in time of stages during which questions were asked.
+    """
+    enabled = True
+
+    def __init__(self):
+        """init method
+        """
+        self.started = time.perf_counter()
+        self.stages = defaultdict(float)
+        self.counters = defaultdict(int)
+        self.waiting = 0.0
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """Method to measure time of stage (used as context manager, time of repeated stage is summed)
+
+        Args:
+            name (str): name of stage
+        """
+        start = time.perf_counter()
+        waiting = self.waiting
+        try:
+            yield
+        finally:
+            self.stages[name] += time.perf_counter() - start - (self.waiting - waiting)
+
+    @contextlib.contextmanager
+    def prompt(self):
+        """Method to measure time of waiting for answer of the user (used as context manager)
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.waiting += elapsed
+            self.stages["prompt"] += elapsed
+            self.counters["prompts"] += 1
+
+    def count(self, name, value=1):
+        """Method to increase counter
+
+        Args:
+            name (str): name of counter
+            value (int, optional): increase of counter. Defaults to 1.
+        """
+        self.counters[name] += value
+
+    def report(self):
+        """Method to prepare report of run
+
+        Returns:
+            dict: time of stages, counters, peak memory and total time
+        """
+        return {
+            "total_seconds": time.perf_counter() - self.started,
+            "stages": dict(self.stages),
+            "counters": dict(self.counters),
+            "peak_rss_bytes": peak_rss(),
+        }
+
+    def save_json(self, path):
+        """Method to save report in JSON format
+
+        Args:
+            path (str): name of file
+        """
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=2)
+            f.write("\n")
+
+    def prometheus(self):
+        """Method to prepare report in Prometheus text format
+
+        Returns:
+            str: report
+        """
+        report = self.report()
+        lines = [
+            "# HELP {}_stage_seconds Wall time of stage of the last run.".format(PREFIX),
+            "# TYPE {}_stage_seconds gauge".format(PREFIX),
+        ]
+        for name, seconds in sorted(report["stages"].items()):
+            lines.append('{}_stage_seconds{{stage="{}"}} {:.6f}'.format(PREFIX, name, seconds))
+        lines.append("# HELP {}_operations Number of operations in the last run.".format(PREFIX))
+        lines.append("# TYPE {}_operations gauge".format(PREFIX))
+        for name, value in sorted(report["counters"].items()):
+            lines.append('{}_operations{{operation="{}"}} {}'.format(PREFIX, name, value))
+        lines.append("# HELP {}_run_seconds Wall time of the last run.".format(PREFIX))
+        lines.append("# TYPE {}_run_seconds gauge".format(PREFIX))
+        lines.append("{}_run_seconds {:.6f}".format(PREFIX, report["total_seconds"]))
+        if report["peak_rss_bytes"] is not None:
+            lines.append("# HELP {}_peak_rss_bytes Peak resident set size of the last run.".format(PREFIX))
+            lines.append("# TYPE {}_peak_rss_bytes gauge".format(PREFIX))
+            lines.append("{}_peak_rss_bytes {}".format(PREFIX, report["peak_rss_bytes"]))
+        lines.append("# HELP {}_last_run_timestamp_seconds Time of the end of the last run.".format(PREFIX))
+        lines.append("# TYPE {}_last_run_timestamp_seconds gauge".format(PREFIX))
+        lines.append("{}_last_run_timestamp_seconds {:.3f}".format(PREFIX, time.time()))
+        return "\n".join(lines) + "\n"
+
+    def save_prometheus(self, path):
+        """Method to save report for textfile collector of Prometheus node exporter (file is replaced atomically)
+
+        Args:
+            path (str): name of file (*.prom)
+        """
+        temporary = "{}.{}.tmp".format(path, os.getpid())
+        with open(temporary, "w") as f:
+            f.write(self.prometheus())
+        os.replace(temporary, path)
@@ -1,60 +1,169 @@
 import os
-import filecmp
+import errno
+import fcntl
+import shutil
 from itertools import combinations
 
+from file_manager.scanner import as_record
+from file_manager.inventory import FileInventory
+from file_manager.dedup import DuplicateFinder
+from file_manager.dirfd import DirectoryCache
+from file_manager.plan import REMOVE, LINK
+from file_manager.log import ActionLog, KEEP
+
+# ioctl cloning file (reflink) on Linux
+FICLONE = 0x40049409
+
+
 class FileRemover:
     """class FileRemover
 
     Class to remove empty, temporary or duplicated files
     """
-    def remove_file(self, filename, output=True):
-        """Method to remove file and print message
+    def __init__(self, finder=None, directories=None, log=None):
+        """init method
+
+        Args:
+            finder (DuplicateFinder, optional): finder of files with identical content. Defaults to None.
+            directories (DirectoryCache, optional): open descriptors of directories used to remove and link files. Defaults to None.
+            log (ActionLog, optional): log of actions (unbuffered verbose log if not given). Defaults to None.
+        """
+        self.log = log if log is not None else ActionLog(buffer_size=0)
+        self.finder = finder if finder is not None else DuplicateFinder(log=self.log)
+        self.directories = directories if directories is not None else DirectoryCache()
+
+    def remove_file(self, filename, output=True, reason=None, target=None, size=0):
+        """Method to remove file and log it
 
         Args:
             filename (str): name of file
             output (bool or str, optional): result (True of False) of removing or name of removed file. Defaults to True.
+            reason (str, optional): reason of removing (e.g. "empty"). Defaults to None.
+            target (str, optional): name of related kept file (e.g. identical file). Defaults to None.
+            size (int, optional): size of file. Defaults to 0.
 
         Returns:
             bool or str: result (True of False) of removing or name of removed file
         """
-        print("{} removed".format(filename))
-        os.remove(filename)
+        self.directories.unlink(filename)
+        self.log.event(REMOVE, filename, reason, target, size)
         return output
 
-    def keep_file(self, filename, output=False):
-        """Method to print message about keeping file
+    def reflink_file(self, source, target):
+        """Method to create copy of file sharing its blocks (reflink) if filesystem supports it
+
+        Args:
+            source (str): name of existing file
+            target (str): name of new file
+
+        Returns:
+            bool: whether the copy was created
+        """
+        with open(source, "rb") as src:
+            fd = os.open(target, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+            try:
+                fcntl.ioctl(fd, FICLONE, src.fileno())
+            except OSError:
+                os.close(fd)
+                os.remove(target)
+                return False
+            os.close(fd)
+        try:
+            shutil.copystat(source, target)
+        except OSError:
+            os.remove(target)
+            return False
+        return True
+
+    def link_file(self, source, target):
+        """Method to atomically replace file with hard link (or reflink) to another file
+
+        Args:
+            source (str): name of kept file
+            target (str): name of replaced file
+
+        Returns:
+            bool: whether the file was replaced
+        """
+        (directory, name) = os.path.split(target)
+        temporary = os.path.join(directory, ".{}.{}.tmp".format(name, os.getpid()))
+        try:
+            self.directories.link(source, temporary)
+        except OSError as e:
+            try:
+                if e.errno == errno.EXDEV or not self.reflink_file(source, temporary):
+                    return False
+            except OSError:
+                # e.g. stale temporary file of other process (not removed) or unreadable source
+                return False
+        try:
+            self.directories.replace(temporary, target)
+        except OSError:
+            try:
+                self.directories.unlink(temporary)
+            except OSError:
+                pass
+            return False
+        return True
+
+    def process_linked_files(self, filename1, filename2):
+        """Method to replace newer of duplicated files with link to older one
+
+        Args:
+            filename1 (str or FileRecord): name (or record) of first file
+            filename2 (str or FileRecord): name (or record) of second file
+
+        Returns:
+            str: name of replaced file (None if files were kept)
+        """
+        (record1, record2) = sorted([as_record(filename1), as_record(filename2)], key=lambda x: x.ctime_ns)
+        (filename1, filename2) = (record1.path, record2.path)
+
+        if record1.dev == record2.dev and self.link_file(filename1, filename2):
+            self.log.event(LINK, filename2, "duplicate", filename1, record2.size)
+            return filename2
+        self.log.event(KEEP, filename2, "cannot be linked", filename1, record2.size)
+        return None
+
+    def keep_file(self, filename, output=False, reason=None, target=None, size=0):
+        """Method to log keeping file
 
         Args:
             filename (str): name of file
-            output (bool, optional): result of removing file. Defaults to Faldr.
+            output (bool, optional): result of removing file. Defaults to False.
+            reason (str, optional): reason of removing which was not performed (e.g. "empty"). Defaults to None.
+            target (str, optional): name of related file (e.g. identical file). Defaults to None.
+            size (int, optional): size of file. Defaults to 0.
 
         Returns:
             bool: result of removing file
         """
-        print("{} kept".format(filename))
+        self.log.event(KEEP, filename, reason, target, size)
         return output
 
-    def ask_to_remove(self, filename, ask, action):
+    def ask_to_remove(self, filename, ask, action, reason=None, size=0):
         """Method to ask to remove file and perform chosen operation
 
         Args:
             filename (str): name of file
             ask (bool): whether to ask the user for an action
             action (bool): action to prepare (True - keep, False - remove)
+            reason (str, optional): reason of removing (e.g. "empty"). Defaults to None.
+            size (int, optional): size of file. Defaults to 0.
 
         Returns:
             bool: result of removing
         """
         if action:
-            return self.remove_file(filename)
+            return self.remove_file(filename, True, reason, size=size)
         elif not (ask or action):
-            return self.keep_file(filename)
+            return self.keep_file(filename, False, reason, size=size)
 
-        choice = input("Remove? [Y/n]: ")
+        choice = self.log.ask("File {} is {}. Remove? [Y/n]: ".format(filename, reason))
         if choice.upper() in ("Y", ""):
-            return self.remove_file(filename)
+            return self.remove_file(filename, True, reason, size=size)
 
-        return False
+        return self.keep_file(filename, False, reason, size=size)
 
     def process_empty_file(self, filename, ask=True, action=False):
         """Method to process empty file
@@ -67,66 +176,133 @@ class FileRemover:
         Returns:
             bool: result of removing
         """
-        print("File {} is empty".format(filename))
-        return self.ask_to_remove(filename, ask, action)
+        return self.ask_to_remove(filename, ask, action, "empty")
 
-    def process_temporary_file(self, filename, ask=True, action=False):
+    def process_temporary_file(self, filename, ask=True, action=False, size=0):
         """Method to process temporary file
 
         Args:
             filename (str): name of file
             ask (bool): whether to ask the user for an action
             action (bool): action to prepare (True - keep, False - remove)
+            size (int, optional): size of file. Defaults to 0.
 
         Returns:
             bool: result of removing
         """
-        print("File {} is temporary".format(filename))
-        return self.ask_to_remove(filename, ask, action)
+        return self.ask_to_remove(filename, ask, action, "temporary", size)
 
     def process_duplicate_files(self, filename1, filename2, action=None):
         """Method to process duplicated files
 
         Args:
-            filename1 (str): name of first file
-            filename2 (str): name of second file
+            filename1 (str or FileRecord): name (or record) of first file
+            filename2 (str or FileRecord): name (or record) of second file
             action (str): action to prepare ("new" - remove newer file, "old" - remove older file, "none" - keep both files)
 
         Returns:
             str: name of removed file
         """
-        (filename1, filename2) = sorted([filename1, filename2], key=lambda x: os.path.getctime(x))
+        (record1, record2) = sorted([as_record(filename1), as_record(filename2)], key=lambda x: x.ctime_ns)
+        (filename1, filename2) = (record1.path, record2.path)
 
-        print("{} (old) and {} (new) are identical.".format(filename1, filename2))
         if action == "new":
-            return self.remove_file(filename2, filename2)
+            return self.remove_file(filename2, filename2, "duplicate", filename1, record2.size)
         elif action == "old":
-            return self.remove_file(filename1, filename1)
+            return self.remove_file(filename1, filename1, "duplicate", filename2, record1.size)
         elif action == "none":
-            print("{} (old) and {} (new) kept".format(filename1, filename2))
-            return None
+            return self.keep_file(filename2, None, "duplicate", filename1, record2.size)
 
-        choice = input("Which remove? Old, New or nonE? [O/n/e]: ".format(filename1))
+        text = "{} (old) and {} (new) are identical. Which remove? Old, New or nonE? [O/n/e]: "
+        choice = self.log.ask(text.format(filename1, filename2))
         if choice.upper() in ("O", ""):
-            return self.remove_file(filename1, filename1)
+            return self.remove_file(filename1, filename1, "duplicate", filename2, record1.size)
         elif choice.upper() == "N":
-            return self.remove_file(filename2, filename2)
-        return None
+            return self.remove_file(filename2, filename2, "duplicate", filename1, record2.size)
+        return self.keep_file(filename2, None, "duplicate", filename1, record2.size)
+
+    def process_group_of_inventory(self, inventory, indices, action="none", new=None):
+        """Method to process group of files (with the same size) from inventory to find and remove duplicated files
+
+        Args:
+            inventory (FileInventory): inventory of files
+            indices (list(int)): indices of files in inventory
+            action (str, optional): action to prepare ("new" - remove newer file, "old" - remove older file, "link" - replace newer file with link to older one, "none" - keep both files). Defaults to "none".
+            new (set(int), optional): indices of new files (only pairs with at least one new file are processed, all pairs if not given). Defaults to None.
+
+        Returns:
+            list(int): indices of removed files
+        """
+        removed_indices = list()
+        for identical in self.finder.find(inventory, indices):
+            for pair in combinations(identical, 2):
+                if new is not None and pair[0] not in new and pair[1] not in new:
+                    continue
+                if not (inventory.is_removed(pair[0]) or inventory.is_removed(pair[1])):
+                    (record1, record2) = (inventory.record(pair[0]), inventory.record(pair[1]))
+                    if action == "link":
+                        if (record1.dev, record1.ino) != (record2.dev, record2.ino):
+                            self.process_linked_files_of_inventory(inventory, pair)
+                        continue
+                    removed_filename = self.process_duplicate_files(record1, record2, action)
+                    if removed_filename is not None:
+                        removed_index = pair[0] if removed_filename == record1.path else pair[1]
+                        inventory.remove(removed_index)
+                        removed_indices.append(removed_index)
+        return removed_indices
+
+    def process_linked_files_of_inventory(self, inventory, pair):
+        """Method to replace newer of duplicated files from inventory with link to older one
+
+        Args:
+            inventory (FileInventory): inventory of files
+            pair (tuple(int)): indices of files in inventory
+        """
+        (record1, record2) = (inventory.record(pair[0]), inventory.record(pair[1]))
+        linked_filename = self.process_linked_files(record1, record2)
+        if linked_filename is not None:
+            # times from scanning are kept to choose the older file in next pairs
+            linked = pair[1] if linked_filename == record2.path else pair[0]
+            st = os.stat(linked_filename)
+            inventory.inodes[linked] = st.st_ino
+            inventory.devices[linked] = st.st_dev
+
+    def plan_group_of_inventory(self, inventory, indices, plan, action="old"):
+        """Method to plan removing (or linking) duplicated files from inventory without touching them
+
+        Args:
+            inventory (FileInventory): inventory of files
+            indices (list(int)): indices of files in inventory
+            plan (ActionPlan): plan of actions (updated in place)
+            action (str, optional): action to plan ("new" - remove newer file, "old" - remove older file, "link" - replace newer file with link to older one, "none" - keep both files). Defaults to "old".
+        """
+        if action == "none":
+            return
+        for identical in self.finder.find(inventory, indices):
+            for pair in combinations(identical, 2):
+                if inventory.is_removed(pair[0]) or inventory.is_removed(pair[1]):
+                    continue
+                (older, newer) = sorted(pair, key=lambda x: inventory.ctimes[x])
+                if action == "link":
+                    if (inventory.devices[older], inventory.inodes[older]) != (inventory.devices[newer], inventory.inodes[newer]):
+                        plan.add(LINK, inventory, newer, "duplicate", target=inventory.path(older))
+                        inventory.inodes[newer] = inventory.inodes[older]
+                    continue
+                (removed, kept) = (newer, older) if action == "new" else (older, newer)
+                plan.add(REMOVE, inventory, removed, "duplicate", target=inventory.path(kept))
+                inventory.remove(removed)
 
     def process_group_of_filenames_by_size(self, filenames, action="none"):
         """Method to process group of filenames to find and remove duplicated files
 
         Args:
-            filenames (list(str)): list of files' names
+            filenames (list(str or FileRecord)): list of files' names (or records of files)
             action (str, optional): action to prepare ("new" - remove newer file, "old" - remove older file, "none" - keep both files). Defaults to "none".
 
         Returns:
             list(str): list of names of removed files
         """
-        removed_filenames = list()
-        for pair in combinations(filenames, 2):
-            if os.path.exists(pair[0]) and os.path.exists(pair[1]):
-                if filecmp.cmp(pair[0], pair[1], False):
-                    removed_filename = self.process_duplicate_files(*pair, action)
-                    removed_filenames.append(removed_filename)
-        return removed_filenames
+        inventory = FileInventory(filenames)
+        inventory.load_metadata()
+        removed_indices = self.process_group_of_inventory(inventory, list(range(len(filenames))), action)
+        return [inventory.path(index) for index in removed_indices]
@@ -0,0 +1,250 @@
+"""module scanner
+
+Single-pass directory walker which yields files together with their cached metadata
+"""
+import os
+
+from file_manager.dirfd import DirectoryCache
+from file_manager.profiler import NULL_PROFILER
+from file_manager.temporary import PatternMatcher
+
+
+class FileRecord:
+    """class FileRecord
+
+    Class to store name of file with its metadata taken from one stat call
+    """
+    __slots__ = ("path", "size", "mode", "mtime_ns", "ctime_ns", "ino", "dev")
+
+    def __init__(self, path, size, mode, mtime_ns, ctime_ns, ino, dev):
+        """init method
+
+        Args:
+            path (str): name of file
+            size (int): size of file
+            mode (int): mode of file (type and permissions)
+            mtime_ns (int): time of last modification in nanoseconds
+            ctime_ns (int): time of last status change in nanoseconds
+            ino (int): inode number
+            dev (int): device identifier
+        """
+        self.path = path
+        self.size = size
+        self.mode = mode
+        self.mtime_ns = mtime_ns
+        self.ctime_ns = ctime_ns
+        self.ino = ino
+        self.dev = dev
+
+    @classmethod
+    def from_stat(cls, path, st):
+        """Method to create record from result of stat
+
+        Args:
+            path (str): name of file
+            st (os.stat_result): metadata of file
+
+        Returns:
+            FileRecord: record of file
+        """
+        return cls(path, st.st_size, st.st_mode, st.st_mtime_ns, st.st_ctime_ns, st.st_ino, st.st_dev)
+
+    @classmethod
+    def from_path(cls, path):
+        """Method to create record of file by its name
+
+        Args:
+            path (str): name of file
+
+        Returns:
+            FileRecord: record of file
+        """
+        return cls.from_stat(path, os.stat(path))
+
+    @classmethod
+    def lazy(cls, path):
+        """Method to create record of file whose metadata is read (once) on first use
+
+        Args:
+            path (str): name of file
+
+        Returns:
+            FileRecord: record of file
+        """
+        record = cls.__new__(cls)
+        record.path = path
+        return record
+
+    def __getattr__(self, name):
+        # called only for metadata which has not been read yet
+        if name not in self.__slots__ or name == "path":
+            raise AttributeError(name)
+        st = os.stat(self.path)
+        self.size = st.st_size
+        self.mode = st.st_mode
+        self.mtime_ns = st.st_mtime_ns
+        self.ctime_ns = st.st_ctime_ns
+        self.ino = st.st_ino
+        self.dev = st.st_dev
+        return getattr(self, name)
+
+    @property
+    def ctime(self):
+        """Time of last status change in seconds
+
+        Returns:
+            float: ctime of file
+        """
+        return self.ctime_ns / 1e9
+
+    @property
+    def mtime(self):
+        """Time of last modification in seconds
+
+        Returns:
+            float: mtime of file
+        """
+        return self.mtime_ns / 1e9
+
+    def __repr__(self):
+        return "FileRecord({!r}, size={})".format(self.path, self.size)
+
+
+def as_record(file):
+    """Function to get record of file (for bare names of files metadata is read on first use)
+
+    Args:
+        file (str or FileRecord): name or record of file
+
+    Returns:
+        FileRecord: record of file
+    """
+    if isinstance(file, FileRecord):
+        return file
+    return FileRecord.lazy(file)
+
+class WalkRules:
+    """class WalkRules
+
+    Class of rules pruning directory trees during walking: excluded globs (of names or, if glob
+    contains "/", of ends of paths), maximal depth and staying on filesystem of the root. Pruned
+    directories are never listed and pruned files are never statted; pruned entries are counted.
+    """
+    def __init__(self, exclude=(), max_depth=None, one_file_system=False):
+        """init method
+
+        Args:
+            exclude (iterable(str), optional): globs of excluded files and directories. Defaults to ().
+            max_depth (int, optional): number of levels of subdirectories read below the root (no limit if None). Defaults to None.
+            one_file_system (bool, optional): whether to skip directories on other filesystems than the root. Defaults to False.
+        """
+        exclude = list(exclude)
+        self.exclude = PatternMatcher(exclude) if exclude else None
+        self.max_depth = max_depth
+        self.one_file_system = one_file_system
+        self.pruned = 0
+
+    def is_excluded(self, directory, name):
+        """Method to check whether file (or directory) is excluded (excluded entries are counted)
+
+        Args:
+            directory (str): path to parent directory
+            name (str): basename of file
+
+        Returns:
+            bool: whether file is excluded
+        """
+        if self.exclude is not None and self.exclude.matches(directory, name):
+            self.pruned += 1
+            return True
+        return False
+
+    def prunes(self, directory, name, depth, root_dev, entry=None, profiler=NULL_PROFILER):
+        """Method to check whether subdirectory is pruned (pruned directories are counted)
+
+        Args:
+            directory (str): path to parent directory
+            name (str): basename of subdirectory
+            depth (int): depth of subdirectory (1 for subdirectories of the root)
+            root_dev (int): device of the root
+            entry (os.DirEntry, optional): entry of subdirectory from listing of parent (to avoid stat). Defaults to None.
+            profiler (RunProfiler, optional): profiler counting stat calls. Defaults to NULL_PROFILER.
+
+        Returns:
+            bool: whether subdirectory is pruned
+        """
+        if self.is_excluded(directory, name):
+            return True
+        if self.max_depth is not None and depth > self.max_depth:
+            self.pruned += 1
+            return True
+        if self.one_file_system:
+            st = entry.stat() if entry is not None else os.stat(os.path.join(directory, name))
+            profiler.count("stat")
+            if st.st_dev != root_dev:
+                self.pruned += 1
+                return True
+        return False
+
+
+def read_directory(directory, directories, depth=0, rules=None, root_dev=None):
+    """Function to read files (with metadata) and subdirectories of one directory
+
+    Args:
+        directory (str): path to directory
+        directories (DirectoryCache): open descriptors of directories (stat calls are counted by its profiler)
+        depth (int, optional): depth of directory below the root. Defaults to 0.
+        rules (WalkRules, optional): rules pruning directory tree. Defaults to None.
+        root_dev (int, optional): device of the root (used only in one-filesystem mode). Defaults to None.
+
+    Returns:
+        list(FileRecord), list(tuple(str, int)): records of files (sorted by names) and paths and depths of subdirectories which are not pruned
+    """
+    records = []
+    subdirectories = []
+    profiler = directories.profiler
+    with os.scandir(directories.get(directory)) as entries:
+        for entry in sorted(entries, key=lambda x: x.name):
+            filename = os.path.join(directory, entry.name)
+            if entry.is_dir():
+                if rules is None or not rules.prunes(directory, entry.name, depth + 1, root_dev, entry, profiler):
+                    subdirectories.append((filename, depth + 1))
+            elif rules is not None and rules.is_excluded(directory, entry.name):
+                continue
+            else:
+                try:
+                    profiler.count("stat")
+                    st = entry.stat()
+                except FileNotFoundError:
+                    # broken symbolic link
+                    profiler.count("stat")
+                    st = entry.stat(follow_symlinks=False)
+                records.append(FileRecord.from_stat(filename, st))
+    return records, subdirectories
+
+def walk_files(path, rules=None, depth=0, root_dev=None, profiler=NULL_PROFILER):
+    """Function to walk directory tree and yield its files with metadata (one stat per file)
+
+    Args:
+        path (str): path to main directory
+        rules (WalkRules, optional): rules pruning directory tree. Defaults to None.
+        depth (int, optional): depth of directory below the root (for subtrees walked separately). Defaults to 0.
+        root_dev (int, optional): device of the root (read from directory if not given). Defaults to None.
+        profiler (RunProfiler, optional): profiler counting stat calls. Defaults to NULL_PROFILER.
+
+    Yields:
+        FileRecord: record of file
+    """
+    stack = [(path, depth)]
+    # directories are opened relatively to their (still open) parents and scanned by descriptors
+    with DirectoryCache() as directories:
+        directories.profiler = profiler
+        if root_dev is None and rules is not None and rules.one_file_system:
+            root_dev = os.fstat(directories.get(path)).st_dev
+            profiler.count("stat")
+        while stack:
+            (directory, depth) = stack.pop()
+            (records, subdirectories) = read_directory(directory, directories, depth, rules, root_dev)
+            yield from records
+            # keep depth-first order of names
+            stack.extend(reversed(subdirectories))
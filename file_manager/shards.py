@@ -0,0 +1,84 @@
+"""module shards
+
+Scanning main and copy directories in many processes: every top-level subdirectory of every root is walked separately and sent back in compact batches
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from file_manager.dirfd import DirectoryCache
+from file_manager.inventory import FileInventory
+from file_manager.profiler import RunProfiler, NULL_PROFILER
+from file_manager.scanner import read_directory, walk_files
+
+BATCH_SIZE = 65536
+
+
+def scan_shard(path, depth=1, root_dev=None, rules=None, batch_size=BATCH_SIZE):
+    """Function to walk one subtree (run in worker process)
+
+    Files are returned as small inventories (columns of metadata and interned directories),
+    which are much cheaper to send between processes than records of single files.
+
+    Args:
+        path (str): path to subdirectory
+        depth (int, optional): depth of subdirectory below its root. Defaults to 1.
+        root_dev (int, optional): device of the root (used only in one-filesystem mode). Defaults to None.
+        rules (WalkRules, optional): rules pruning directory tree. Defaults to None.
+        batch_size (int, optional): maximal number of files in one batch. Defaults to BATCH_SIZE.
+
+    Returns:
+        list(FileInventory), int, int: batches of files, number of entries pruned in subtree and number of stat calls
+    """
+    # rules are copied to the worker together with entries already pruned by the parent process
+    pruned = rules.pruned if rules is not None else 0
+    profiler = RunProfiler()
+    batches = [FileInventory()]
+    for record in walk_files(path, rules, depth, root_dev, profiler):
+        if len(batches[-1].names) >= batch_size:
+            batches.append(FileInventory())
+        batches[-1].add_record(record)
+    return batches, (rules.pruned - pruned if rules is not None else 0), profiler.counters["stat"]
+
+def scan_parallel(roots, jobs, rules=None, batch_size=BATCH_SIZE, profiler=NULL_PROFILER):
+    """Function to scan directory trees in many processes
+
+    The top level of every root is read by the calling process, its subdirectories are walked
+    by the pool. Batches are merged in the order of sequential walking, so the inventory is
+    the same as the one built by walking roots one after another.
+
+    Args:
+        roots (list(str)): paths to main and copy directories
+        jobs (int): number of processes
+        rules (WalkRules, optional): rules pruning directory trees (pruned entries of all processes are counted). Defaults to None.
+        batch_size (int, optional): maximal number of files in one batch. Defaults to BATCH_SIZE.
+        profiler (RunProfiler, optional): profiler counting stat calls of all processes. Defaults to NULL_PROFILER.
+
+    Returns:
+        FileInventory: inventory of files
+    """
+    parts = []
+    inventory = FileInventory()
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        for root in roots:
+            with DirectoryCache() as directories:
+                directories.profiler = profiler
+                root_dev = None
+                if rules is not None and rules.one_file_system:
+                    root_dev = os.fstat(directories.get(root)).st_dev
+                    profiler.count("stat")
+                (records, subdirectories) = read_directory(root, directories, 0, rules, root_dev)
+            parts.append(FileInventory(records))
+            parts.extend(executor.submit(scan_shard, path, depth, root_dev, rules, batch_size)
+                         for (path, depth) in subdirectories)
+
+        for part in parts:
+            if isinstance(part, FileInventory):
+                inventory.merge(part)
+                continue
+            (batches, pruned, stats) = part.result()
+            for batch in batches:
+                inventory.merge(batch)
+            if rules is not None:
+                rules.pruned += pruned
+            profiler.count("stat", stats)
+    return inventory
@@ -0,0 +1,351 @@
+"""module snapshot
+
+Persistent snapshot of scanned directory trees (SQLite database) used to scan only directories changed since the previous run
+"""
+import os
+import time
+import hashlib
+import sqlite3
+from array import array
+from collections import Counter
+
+from file_manager.cache import to_signed, to_unsigned
+from file_manager.dirfd import DirectoryCache
+from file_manager.inventory import FileInventory
+from file_manager.profiler import NULL_PROFILER
+
+# directories modified so shortly before scanning could be modified again within the same tick of clock
+RACY_WINDOW_NS = 2 * 10**9
+
+
+def configuration_fingerprint(conf_path):
+    """Function to compute fingerprint of configuration (flags of classification are reused only with the same configuration)
+
+    Args:
+        conf_path (str): path to configuration file
+
+    Returns:
+        str: fingerprint of configuration
+    """
+    with open(conf_path, "rb") as f:
+        return hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+
+def stat_file(directories, path):
+    """Function to get metadata of file like during scanning (symbolic links are followed unless they are broken)
+
+    Args:
+        directories (DirectoryCache): open descriptors of directories
+        path (str): name of file
+
+    Returns:
+        os.stat_result: metadata of file
+    """
+    try:
+        return directories.stat(path, follow_symlinks=True)
+    except FileNotFoundError:
+        # broken symbolic link
+        return directories.stat(path)
+
+
+class TreeSnapshot:
+    """class TreeSnapshot
+
+    Class to store modification times of directories and metadata (with flags of classification)
+    of their files between runs. Directory whose modification time did not change is not read
+    again: its files and subdirectories are taken from snapshot, only subdirectories are checked.
+
+    Modification time of directory changes when file is created, removed or renamed in it,
+    but not when content or permissions of existing file are changed in place. Such changes
+    are not noticed until the directory changes (or snapshot is cleared).
+    """
+    def __init__(self, path, fingerprint=""):
+        """init method
+
+        Args:
+            path (str): path to database file
+            fingerprint (str, optional): fingerprint of configuration. Defaults to "".
+        """
+        self.path = path
+        self.fingerprint = fingerprint
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS directories (
+                path TEXT PRIMARY KEY, mtime_ns INTEGER, subdirectories TEXT);
+            CREATE TABLE IF NOT EXISTS files (
+                directory TEXT, name TEXT, size INTEGER, mode INTEGER, mtime_ns INTEGER,
+                ctime_ns INTEGER, ino INTEGER, dev INTEGER, flags INTEGER,
+                PRIMARY KEY (directory, name)) WITHOUT ROWID;
+        """)
+        row = self.connection.execute("SELECT value FROM meta WHERE key = 'fingerprint'").fetchone()
+        self.reuse_flags = row is not None and row[0] == fingerprint
+        self.started_ns = 0
+        self.scanned = dict()
+        self.reused = dict()
+        self.loaded = dict()
+        self.modes = array("I")
+        self.profiler = NULL_PROFILER
+
+    def clear(self):
+        """Method to remove all directories and files from snapshot
+        """
+        with self.connection:
+            self.connection.execute("DELETE FROM directories")
+            self.connection.execute("DELETE FROM files")
+
+    def scan(self, roots, rules=None):
+        """Method to scan directory trees (only directories changed since the previous run are read)
+
+        Args:
+            roots (list(str)): paths to main and copy directories
+            rules (WalkRules, optional): rules pruning directory trees. Defaults to None.
+
+        Returns:
+            FileInventory, bytearray: inventory of files and mask of files whose flags of classification are known
+        """
+        self.started_ns = time.time_ns()
+        inventory = FileInventory()
+        classified = bytearray()
+        profiler = self.profiler
+        with DirectoryCache() as directories:
+            directories.profiler = profiler
+            for root in roots:
+                root_dev = os.fstat(directories.get(root)).st_dev
+                profiler.count("stat")
+                stack = [(root, 0)]
+                while stack:
+                    (directory, depth) = stack.pop()
+                    mtime_ns = os.fstat(directories.get(directory)).st_mtime_ns
+                    profiler.count("stat")
+                    row = self.connection.execute("SELECT mtime_ns, subdirectories FROM directories WHERE path = ?",
+                                                  (directory,)).fetchone()
+                    if row is not None and row[0] == mtime_ns:
+                        start = len(inventory.names)
+                        subdirectories = self.load_directory(directory, row[1], inventory, classified, rules)
+                        self.reused[directory] = mtime_ns
+                        self.loaded[directory] = (start, len(inventory.names), row[1])
+                    else:
+                        subdirectories = self.scan_directory(directory, directories, inventory, classified, rules)
+                        self.scanned[directory] = (mtime_ns, subdirectories, row[1] if row is not None else None)
+                    # all subdirectories are saved, so pruning rules can be changed between runs
+                    if rules is not None:
+                        subdirectories = [name for name in subdirectories
+                                          if not rules.prunes(directory, name, depth + 1, root_dev, profiler=profiler)]
+                    # keep depth-first order of names
+                    stack.extend((os.path.join(directory, name), depth + 1) for name in reversed(subdirectories))
+            self.verify(inventory, classified, directories)
+        self.modes = array("I", inventory.modes)
+        return inventory, classified
+
+    def load_directory(self, directory, subdirectories, inventory, classified, rules=None):
+        """Method to add files of unchanged directory from snapshot
+
+        Args:
+            directory (str): path to directory
+            subdirectories (str): names of subdirectories (separated by "/")
+            inventory (FileInventory): inventory of files (updated in place)
+            classified (bytearray): mask of files whose flags are known (updated in place)
+            rules (WalkRules, optional): rules excluding files. Defaults to None.
+
+        Returns:
+            list(str): names of subdirectories
+        """
+        rows = self.connection.execute("""SELECT name, size, mode, mtime_ns, ctime_ns, ino, dev, flags FROM files
+                                          WHERE directory = ? ORDER BY name""", (directory,))
+        for (name, size, mode, mtime_ns, ctime_ns, ino, dev, flags) in rows:
+            if rules is not None and rules.is_excluded(directory, name):
+                continue
+            index = inventory.add(os.path.join(directory, name), size, mode, mtime_ns, ctime_ns,
+                                  to_unsigned(ino), to_unsigned(dev))
+            if self.reuse_flags:
+                inventory.flags[index] = flags
+            classified.append(self.reuse_flags)
+        return subdirectories.split("/") if subdirectories else []
+
+    def scan_directory(self, directory, directories, inventory, classified, rules=None):
+        """Method to read changed (or new) directory
+
+        Args:
+            directory (str): path to directory
+            directories (DirectoryCache): open descriptors of directories
+            inventory (FileInventory): inventory of files (updated in place)
+            classified (bytearray): mask of files whose flags are known (updated in place)
+            rules (WalkRules, optional): rules excluding files. Defaults to None.
+
+        Returns:
+            list(str): names of subdirectories
+        """
+        subdirectories = []
+        with os.scandir(directories.get(directory)) as entries:
+            for entry in sorted(entries, key=lambda x: x.name):
+                if entry.is_dir():
+                    subdirectories.append(entry.name)
+                    continue
+                if rules is not None and rules.is_excluded(directory, entry.name):
+                    continue
+                try:
+                    self.profiler.count("stat")
+                    st = entry.stat()
+                except FileNotFoundError:
+                    # broken symbolic link
+                    self.profiler.count("stat")
+                    st = entry.stat(follow_symlinks=False)
+                index = inventory.add(os.path.join(directory, entry.name))
+                inventory.update(index, st)
+                classified.append(0)
+        return subdirectories
+
+    def verify(self, inventory, classified, directories):
+        """Method to check files taken from snapshot which could be removed (empty files and files whose size is
+        shared with other files). Content changed in place does not change modification time of directory,
+        so such files are statted again and directory with any changed file is read again.
+
+        Args:
+            inventory (FileInventory): inventory of files (updated in place)
+            classified (bytearray): mask of files whose flags are known (updated in place)
+            directories (DirectoryCache): open descriptors of directories
+
+        Returns:
+            list(str): directories read again
+        """
+        (sizes, mtimes, ctimes, inodes, devices) = (inventory.sizes, inventory.mtimes, inventory.ctimes,
+                                                    inventory.inodes, inventory.devices)
+        counts = Counter(sizes[index] for index in inventory.indices())
+        changed = []
+        for directory, (start, end, _) in self.loaded.items():
+            for index in range(start, end):
+                if sizes[index] != 0 and counts[sizes[index]] < 2:
+                    continue
+                try:
+                    st = stat_file(directories, inventory.path(index))
+                except OSError:
+                    changed.append(directory)
+                    break
+                if (st.st_size, st.st_mtime_ns, st.st_ctime_ns, st.st_ino, st.st_dev) != \
+                        (sizes[index], mtimes[index], ctimes[index], inodes[index], devices[index]):
+                    changed.append(directory)
+                    break
+        for directory in changed:
+            self.rescan_directory(directory, inventory, classified, directories)
+        return changed
+
+    def rescan_directory(self, directory, inventory, classified, directories):
+        """Method to read again metadata of all files of directory taken from snapshot (their flags are classified again)
+
+        Args:
+            directory (str): path to directory
+            inventory (FileInventory): inventory of files (updated in place)
+            classified (bytearray): mask of files whose flags are known (updated in place)
+            directories (DirectoryCache): open descriptors of directories
+        """
+        (start, end, subdirectories) = self.loaded.pop(directory)
+        for index in range(start, end):
+            try:
+                inventory.update(index, stat_file(directories, inventory.path(index)))
+            except FileNotFoundError:
+                inventory.remove(index)
+            inventory.flags[index] = 0
+            classified[index] = 0
+        # files of directory are saved again
+        mtime_ns = self.reused.pop(directory)
+        names = subdirectories.split("/") if subdirectories else []
+        self.scanned[directory] = (mtime_ns, names, subdirectories)
+
+    def save(self, inventory):
+        """Method to save snapshot after managing files (directories changed since scanning are read again next time)
+
+        Args:
+            inventory (FileInventory): inventory of managed files
+        """
+        by_directory = dict()
+        for index in inventory.indices():
+            directory = inventory.directory(index)
+            if directory in self.scanned:
+                by_directory.setdefault(directory, []).append(index)
+
+        with self.connection as connection:
+            for directory, (mtime_ns, subdirectories, old_subdirectories) in self.scanned.items():
+                connection.execute("DELETE FROM files WHERE directory = ?", (directory,))
+                # subtrees of removed subdirectories are forgotten
+                for name in set(old_subdirectories.split("/") if old_subdirectories else []) - set(subdirectories):
+                    removed = os.path.join(directory, name)
+                    pattern = os.path.join(removed, "").replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+                    connection.execute("DELETE FROM directories WHERE path = ? OR path LIKE ? ESCAPE '\\'", (removed, pattern))
+                    connection.execute("DELETE FROM files WHERE directory = ? OR directory LIKE ? ESCAPE '\\'", (removed, pattern))
+                if not self.is_stable(directory, mtime_ns):
+                    connection.execute("DELETE FROM directories WHERE path = ?", (directory,))
+                    continue
+                connection.execute("INSERT OR REPLACE INTO directories VALUES (?, ?, ?)",
+                                   (directory, mtime_ns, "/".join(subdirectories)))
+                connection.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                       (self.row(inventory, index) for index in by_directory.get(directory, [])))
+
+            for directory, mtime_ns in self.reused.items():
+                if not self.is_stable(directory, mtime_ns):
+                    connection.execute("DELETE FROM directories WHERE path = ?", (directory,))
+
+            if not self.reuse_flags:
+                # files of unchanged directories were classified with other configuration
+                connection.executemany("UPDATE files SET flags = ? WHERE directory = ? AND name = ?",
+                                       ((inventory.flags[index], inventory.directory(index), inventory.names[index])
+                                        for index in inventory.indices() if inventory.directory(index) in self.reused))
+
+            # permissions changed in place do not change modification time of directory
+            modes = self.modes
+            for index in inventory.indices():
+                if index < len(modes) and inventory.modes[index] != modes[index] and inventory.directory(index) in self.reused:
+                    try:
+                        self.profiler.count("stat")
+                        inventory.update(index, os.stat(inventory.path(index), follow_symlinks=False))
+                    except OSError:
+                        connection.execute("DELETE FROM directories WHERE path = ?", (inventory.directory(index),))
+                        continue
+                    connection.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                       self.row(inventory, index))
+
+            connection.execute("INSERT OR REPLACE INTO meta VALUES ('fingerprint', ?)", (self.fingerprint,))
+
+    def is_stable(self, directory, mtime_ns):
+        """Method to check whether directory is unchanged since scanning and was not modified just before it
+
+        Args:
+            directory (str): path to directory
+            mtime_ns (int): time of modification of directory during scanning
+
+        Returns:
+            bool: whether snapshot of directory can be trusted next time
+        """
+        self.profiler.count("stat")
+        try:
+            current = os.stat(directory).st_mtime_ns
+        except OSError:
+            return False
+        return current == mtime_ns and mtime_ns < self.started_ns - RACY_WINDOW_NS
+
+    @staticmethod
+    def row(inventory, index):
+        """Method to prepare row of file
+
+        Args:
+            inventory (FileInventory): inventory of files
+            index (int): index of file
+
+        Returns:
+            tuple: row of table of files
+        """
+        return (inventory.directory(index), inventory.names[index], inventory.sizes[index], inventory.modes[index],
+                inventory.mtimes[index], inventory.ctimes[index], to_signed(inventory.inodes[index]),
+                to_signed(inventory.devices[index]), inventory.flags[index])
+
+    def summary(self):
+        """Method to prepare summary of scanning
+
+        Returns:
+            str: summary
+        """
+        return "Scanned {} directories, {} unchanged directories taken from snapshot".format(len(self.scanned), len(self.reused))
+
+    def close(self):
+        """Method to close database
+        """
+        self.connection.close()
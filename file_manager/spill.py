@@ -0,0 +1,431 @@
+"""module spill
+
+Bounded memory for trees larger than RAM: columns of inventory are moved to temporary files (strings to SQLite,
+numbers to memory-mapped files) and files are grouped by size or relative path in temporary SQLite database
+"""
+import os
+import sys
+import mmap
+import sqlite3
+import tempfile
+from array import array
+from collections import OrderedDict
+
+# estimated memory used by sorting one file in memory (pointer in list, index and key objects)
+SORT_BYTES_PER_FILE = 80
+# pages of temporary database kept in memory (in KiB), the rest is written to disk
+CACHE_SIZE = 8 * 1024
+BATCH_SIZE = 10000
+# number of strings written and read at once (one cached block)
+BLOCK_SIZE = 1024
+# number of blocks of strings kept in memory
+CACHE_BLOCKS = 16
+# pages of database of strings kept in memory (in KiB)
+STRINGS_CACHE_SIZE = 1024
+# initial number of items of memory-mapped column
+INITIAL_CAPACITY = 4096
+UNITS = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+
+
+def parse_size(text):
+    """Function to convert size with optional unit (e.g. "512M", "2G", "1.5GiB") to number of bytes
+
+    Args:
+        text (str): size
+
+    Returns:
+        int: number of bytes
+
+    Raises:
+        ValueError: wrong size
+    """
+    value = text.strip().upper()
+    for suffix in ("IB", "B"):
+        if value.endswith(suffix):
+            value = value[:-len(suffix)]
+            break
+    unit = value[-1:] if value[-1:] in UNITS else ""
+    number = float(value[:len(value) - len(unit)])
+    if number < 0:
+        raise ValueError("Wrong size: {}".format(text))
+    return int(number * UNITS[unit])
+
+def needs_spill(inventory, memory_limit):
+    """Function to check whether sorting files in memory would exceed memory limit
+
+    Args:
+        inventory (FileInventory): inventory of files
+        memory_limit (int): maximal number of bytes used by inventory and sorting (no limit if None)
+
+    Returns:
+        bool: whether files should be grouped on disk
+    """
+    if memory_limit is None:
+        return False
+    return inventory.spilled or inventory.memory_usage() + len(inventory) * SORT_BYTES_PER_FILE > memory_limit
+
+def sorted_groups(inventory):
+    """Function to group files by size in memory
+
+    Args:
+        inventory (FileInventory): inventory of files
+
+    Yields:
+        list(int): group of indices of files with the same size (in order of sizes)
+    """
+    sizes = inventory.sizes
+    group = []
+    for index in sorted(inventory.indices(), key=sizes.__getitem__):
+        if len(group) > 0 and sizes[index] != sizes[group[-1]]:
+            yield group
+            group = []
+        group.append(index)
+
+    if len(group) > 0:
+        yield group
+
+def spilled_groups(inventory, cache_size=CACHE_SIZE):
+    """Function to group files by size on disk (only one group at a time is kept in memory)
+
+    Files with unique size cannot be duplicates, so they are not yielded.
+
+    Args:
+        inventory (FileInventory): inventory of files
+        cache_size (int, optional): memory (in KiB) used by database before writing to disk. Defaults to CACHE_SIZE.
+
+    Yields:
+        list(int): group (with at least two files) of indices of files with the same size (in order of sizes)
+    """
+    sizes = inventory.sizes
+    # rows are generated lazily, so the list of all files is never built in memory
+    return grouped_rows(((sizes[index], index) for index in inventory.indices()), cache_size)
+
+def grouped_rows(rows, cache_size=CACHE_SIZE):
+    """Function to group indices by key on disk (only one group at a time is kept in memory)
+
+    Rows are written to temporary SQLite database (deleted when closed) and read back
+    sorted by key (SQLite sorts them by external merge sort).
+
+    Args:
+        rows (iterable(tuple(int or bytes, int))): keys and indices
+        cache_size (int, optional): memory (in KiB) used by database before writing to disk. Defaults to CACHE_SIZE.
+
+    Yields:
+        list(int): group (with at least two indices) of indices with the same key (in order of keys)
+    """
+    # empty name means private temporary database on disk
+    connection = sqlite3.connect("")
+    try:
+        configure(connection, cache_size)
+        connection.execute("CREATE TABLE rows (key, idx INTEGER)")
+        connection.executemany("INSERT INTO rows VALUES (?, ?)", rows)
+
+        rows = connection.execute("SELECT key, idx FROM rows ORDER BY key, idx")
+        (group, group_key) = ([], None)
+        while True:
+            batch = rows.fetchmany(BATCH_SIZE)
+            if not batch:
+                break
+            for (key, index) in batch:
+                if key != group_key:
+                    if len(group) > 1:
+                        yield group
+                    (group, group_key) = ([], key)
+                group.append(index)
+        if len(group) > 1:
+            yield group
+    finally:
+        connection.close()
+
+def configure(connection, cache_size=CACHE_SIZE):
+    """Function to set up temporary database (bounded cache, no journal and no waiting for disk)
+
+    Args:
+        connection (sqlite3.Connection): connection to database
+        cache_size (int, optional): memory (in KiB) used by database before writing to disk. Defaults to CACHE_SIZE.
+    """
+    connection.execute("PRAGMA cache_size = -{}".format(cache_size))
+    connection.execute("PRAGMA journal_mode = OFF")
+    connection.execute("PRAGMA synchronous = OFF")
+
+
+class SpilledArray:
+    """class SpilledArray
+
+    Class to store column of numbers (with the interface of array.array used by inventory) in
+    temporary file mapped to memory. Pages of the file are written back and dropped by the kernel
+    when memory is needed, so the column does not use memory which cannot be reclaimed.
+    """
+    def __init__(self, typecode, values=()):
+        """init method
+
+        Args:
+            typecode (str): type of numbers (as in array.array)
+            values (iterable(int), optional): initial numbers. Defaults to ().
+        """
+        self.typecode = typecode
+        self.itemsize = array(typecode).itemsize
+        self.file = tempfile.TemporaryFile()
+        self.length = 0
+        (self.map, self.view) = (None, None)
+        self.resize(INITIAL_CAPACITY)
+        self.extend(values)
+
+    def resize(self, capacity):
+        """Method to change size of file
+
+        Args:
+            capacity (int): maximal number of items
+        """
+        if self.view is not None:
+            self.view.release()
+            self.map.close()
+        self.file.truncate(capacity * self.itemsize)
+        self.map = mmap.mmap(self.file.fileno(), capacity * self.itemsize)
+        self.view = memoryview(self.map).cast(self.typecode)
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, index):
+        return self.view[self.position(index)]
+
+    def __setitem__(self, index, value):
+        self.view[self.position(index)] = value
+
+    def __iter__(self):
+        view = self.view
+        for index in range(self.length):
+            yield view[index]
+
+    def position(self, index):
+        """Method to check index of item
+
+        Args:
+            index (int): index of item (negative from the end)
+
+        Returns:
+            int: position of item in file
+
+        Raises:
+            IndexError: index out of range
+        """
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError("array index out of range")
+        return index
+
+    def append(self, value):
+        """Method to add number at the end
+
+        Args:
+            value (int): number
+        """
+        if self.length == len(self.view):
+            self.resize(2 * self.length)
+        self.view[self.length] = value
+        self.length += 1
+
+    def extend(self, values):
+        """Method to add numbers at the end
+
+        Args:
+            values (iterable(int)): numbers
+        """
+        values = values if isinstance(values, array) and values.typecode == self.typecode else array(self.typecode, values)
+        end = self.length + len(values)
+        if end > len(self.view):
+            capacity = len(self.view)
+            while capacity < end:
+                capacity *= 2
+            self.resize(capacity)
+        self.view[self.length:end] = values
+        self.length = end
+
+
+class SpilledStrings:
+    """class SpilledStrings
+
+    Class to store list of strings (with the interface of list used by inventory) in temporary
+    SQLite database. Strings are written and read in blocks, only recently used blocks are kept
+    in memory. Indexed strings can be found by value (e.g. to intern paths of directories).
+    """
+    def __init__(self, values=(), indexed=False, cache_blocks=CACHE_BLOCKS):
+        """init method
+
+        Args:
+            values (iterable(str), optional): initial strings. Defaults to ().
+            indexed (bool, optional): whether positions of strings can be found by value. Defaults to False.
+            cache_blocks (int, optional): number of blocks of strings kept in memory. Defaults to CACHE_BLOCKS.
+        """
+        # empty name means private temporary database on disk
+        self.connection = sqlite3.connect("")
+        configure(self.connection, STRINGS_CACHE_SIZE)
+        # names of files are stored as bytes, because they do not have to be valid UTF-8
+        self.connection.execute("CREATE TABLE strings (id INTEGER PRIMARY KEY, value BLOB)")
+        if indexed:
+            self.connection.execute("CREATE INDEX strings_value ON strings (value)")
+        self.stored = 0
+        self.pending = list()
+        self.positions = dict() if indexed else None
+        self.blocks = OrderedDict()
+        self.cache_blocks = cache_blocks
+        self.extend(values)
+
+    def __len__(self):
+        return self.stored + len(self.pending)
+
+    def __getitem__(self, index):
+        index = self.position(index)
+        if index >= self.stored:
+            return self.pending[index - self.stored]
+        return self.block(index // BLOCK_SIZE)[index % BLOCK_SIZE]
+
+    def __setitem__(self, index, value):
+        index = self.position(index)
+        if index >= self.stored:
+            if self.positions is not None:
+                self.positions.pop(self.pending[index - self.stored], None)
+                self.positions[value] = index
+            self.pending[index - self.stored] = value
+            return
+        self.connection.execute("UPDATE strings SET value = ? WHERE id = ?", (os.fsencode(value), index))
+        block = self.blocks.get(index // BLOCK_SIZE)
+        if block is not None:
+            block[index % BLOCK_SIZE] = value
+
+    def __iter__(self):
+        # stored strings are streamed, so they do not replace cached blocks
+        for (value,) in self.connection.execute("SELECT value FROM strings ORDER BY id"):
+            yield os.fsdecode(value)
+        yield from list(self.pending)
+
+    def position(self, index):
+        """Method to check index of string
+
+        Args:
+            index (int): index of string (negative from the end)
+
+        Returns:
+            int: position of string
+
+        Raises:
+            IndexError: index out of range
+        """
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("list index out of range")
+        return index
+
+    def block(self, number):
+        """Method to get block of stored strings (read from database if it is not cached)
+
+        Args:
+            number (int): number of block
+
+        Returns:
+            list(str): strings of block
+        """
+        block = self.blocks.get(number)
+        if block is not None:
+            self.blocks.move_to_end(number)
+            return block
+        rows = self.connection.execute("SELECT value FROM strings WHERE id >= ? AND id < ? ORDER BY id",
+                                       (number * BLOCK_SIZE, (number + 1) * BLOCK_SIZE))
+        block = [os.fsdecode(value) for (value,) in rows]
+        self.blocks[number] = block
+        if len(self.blocks) > self.cache_blocks:
+            self.blocks.popitem(last=False)
+        return block
+
+    def append(self, value):
+        """Method to add string at the end
+
+        Args:
+            value (str): string
+        """
+        if self.positions is not None:
+            self.positions[value] = len(self)
+        self.pending.append(value)
+        # only whole blocks are written, so every block is read by one query
+        if len(self.pending) == BLOCK_SIZE:
+            self.connection.executemany("INSERT INTO strings VALUES (?, ?)",
+                                        ((self.stored + number, os.fsencode(value)) for number, value in enumerate(self.pending)))
+            self.stored += len(self.pending)
+            self.pending = list()
+            if self.positions is not None:
+                self.positions = dict()
+
+    def extend(self, values):
+        """Method to add strings at the end
+
+        Args:
+            values (iterable(str)): strings
+        """
+        for value in values:
+            self.append(value)
+
+    def find(self, value):
+        """Method to find position of indexed string
+
+        Args:
+            value (str): string
+
+        Returns:
+            int: position of string (None if it is not stored)
+        """
+        position = self.positions.get(value)
+        if position is None:
+            row = self.connection.execute("SELECT id FROM strings WHERE value = ? LIMIT 1", (os.fsencode(value),)).fetchone()
+            position = row[0] if row is not None else None
+        return position
+
+    def memory_usage(self):
+        """Method to estimate memory used by cached and not written strings
+
+        Returns:
+            int: number of bytes
+        """
+        blocks = list(self.blocks.values()) + [self.pending]
+        return STRINGS_CACHE_SIZE * 1024 + sum(sys.getsizeof(block) + sum(sys.getsizeof(value) for value in block) for block in blocks)
+
+
+class SpilledIds:
+    """class SpilledIds
+
+    Class to find positions of strings in indexed SpilledStrings (with the interface of dict
+    used by inventory to intern paths of directories)
+    """
+    def __init__(self, strings):
+        """init method
+
+        Args:
+            strings (SpilledStrings): indexed strings
+        """
+        self.strings = strings
+        # files are added directory by directory, so the same path is looked up many times in a row
+        self.last = (None, None)
+
+    def get(self, value, default=None):
+        """Method to get position of string
+
+        Args:
+            value (str): string
+            default (int, optional): value returned if string is not stored. Defaults to None.
+
+        Returns:
+            int: position of string
+        """
+        if self.last[0] == value:
+            return self.last[1]
+        position = self.strings.find(value)
+        if position is None:
+            return default
+        self.last = (value, position)
+        return position
+
+    def __setitem__(self, value, position):
+        # strings are indexed when they are appended
+        self.last = (value, position)
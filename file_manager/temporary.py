@@ -0,0 +1,145 @@
+"""module temporary
+
+Matching names of temporary files with glob patterns compiled once (separate rules for main and copy directories)
+"""
+import os
+import re
+import fnmatch
+
+WILDCARDS = "*?["
+
+
+def has_wildcards(text):
+    """Function to check whether glob pattern contains wildcards
+
+    Args:
+        text (str): glob pattern
+
+    Returns:
+        bool: whether pattern contains wildcards
+    """
+    return any(char in text for char in WILDCARDS)
+
+
+class PatternMatcher:
+    """class PatternMatcher
+
+    Class to match files with many glob patterns at once. Patterns without wildcards and patterns
+    like "*.swp" (suffixes) are checked by lookups in sets, all other patterns of names are joined
+    into one regular expression and patterns with "/" (e.g. "__pycache__/*") into another one,
+    so cost of checking file hardly depends on number of patterns.
+    """
+    def __init__(self, patterns):
+        """init method
+
+        Args:
+            patterns (iterable(str)): glob patterns of names (or of ends of paths if pattern contains "/")
+        """
+        self.patterns = list(patterns)
+        self.names = set()
+        self.suffixes = set()
+        name_patterns = list()
+        path_patterns = list()
+        for pattern in self.patterns:
+            if "/" in pattern:
+                # pattern matches the end of path at any depth
+                path_patterns.append(fnmatch.translate("*/" + pattern.lstrip("/")))
+            elif not has_wildcards(pattern):
+                self.names.add(pattern)
+            elif pattern.startswith("*") and len(pattern) > 1 and not has_wildcards(pattern[1:]):
+                self.suffixes.add(pattern[1:])
+            else:
+                name_patterns.append(fnmatch.translate(pattern))
+        self.suffix_lengths = sorted(set(len(suffix) for suffix in self.suffixes))
+        self.name_pattern = re.compile("|".join(name_patterns)) if name_patterns else None
+        self.path_pattern = re.compile("|".join(path_patterns)) if path_patterns else None
+
+    def matches(self, directory, name):
+        """Method to check whether file matches any pattern
+
+        Args:
+            directory (str): directory of file
+            name (str): basename of file
+
+        Returns:
+            bool: whether file matches
+        """
+        if name in self.names:
+            return True
+        for length in self.suffix_lengths:
+            if name[-length:] in self.suffixes:
+                return True
+        if self.name_pattern is not None and self.name_pattern.match(name) is not None:
+            return True
+        return self.path_pattern is not None and self.path_pattern.match("/" + os.path.join(directory, name)) is not None
+
+
+class TemporaryRules:
+    """class TemporaryRules
+
+    Class to decide whether file is temporary: common patterns apply to all files, other patterns
+    only to files from main directory or only to files from copy directories
+    """
+    def __init__(self, common, main=(), copies=()):
+        """init method
+
+        Args:
+            common (iterable(str)): patterns of temporary files in all directories
+            main (iterable(str), optional): patterns of temporary files in main directory. Defaults to ().
+            copies (iterable(str), optional): patterns of temporary files in copy directories. Defaults to ().
+        """
+        common = list(common)
+        self.main_matcher = PatternMatcher(common + list(main))
+        self.copy_matcher = PatternMatcher(common + list(copies))
+        self.copy_roots = ()
+        self.matchers = dict()
+
+    @classmethod
+    def from_extensions(cls, temp_extensions):
+        """Method to create rules from temporary extensions (and names ending with "~")
+
+        Args:
+            temp_extensions (iterable(str)): temporary extensions of files
+
+        Returns:
+            TemporaryRules: rules
+        """
+        return cls(["*" + extension for extension in sorted(temp_extensions) if extension] + ["*~"])
+
+    def set_roots(self, copy_roots):
+        """Setter of copy directories (files from other directories are treated as files from main directory)
+
+        Args:
+            copy_roots (list(str)): paths to copy directories
+        """
+        self.copy_roots = tuple(os.path.normpath(root) for root in copy_roots)
+        self.matchers.clear()
+
+    def matcher(self, directory):
+        """Method to get matcher of files from directory
+
+        Args:
+            directory (str): path to directory
+
+        Returns:
+            PatternMatcher: matcher
+        """
+        matcher = self.matchers.get(directory)
+        if matcher is None:
+            normalized = os.path.normpath(directory)
+            in_copy = any(normalized == root or normalized.startswith(root.rstrip(os.sep) + os.sep) for root in self.copy_roots)
+            matcher = self.copy_matcher if in_copy else self.main_matcher
+            self.matchers[directory] = matcher
+        return matcher
+
+    def is_temporary(self, directory, name):
+        """Method to check whether file is temporary
+
+        Args:
+            directory (str): directory of file
+            name (str): basename of file
+
+        Returns:
+            bool: whether file is temporary
+        """
+        return self.matcher(directory).matches(directory, name)
@@ -4,7 +4,10 @@ Some useful functions for running the program and testing (for examle: create te
 """
 import os
 import random
-import shutil
+import configparser
+
+from file_manager.scanner import walk_files
+from file_manager.profiler import NULL_PROFILER
 
 
 def file_size(filename):
@@ -133,72 +136,84 @@ def get_files(path):
     Returns:
         list(str): list of all files' names
     """
-    files = os.listdir(path)
-    all_files = list()
-
-    for entry in files:
-        full_path = os.path.join(path, entry)
-
-        if os.path.isdir(full_path):
-            all_files = all_files + get_files(full_path)
-        else:
-            all_files.append(full_path)
-                
-    return all_files
+    return [record.path for record in walk_files(path)]
 
-def get_all_files(path, copy_paths=None):
-    """Function to get all files' names from main and copy directories (Y1, Y2,...) and their subdirectories
+def get_all_files(path, copy_paths=None, rules=None, profiler=NULL_PROFILER):
+    """Function to get all files from main and copy directories (Y1, Y2,...) and their subdirectories
 
     Args:
         path (str): path to main directory
         copy_paths (list(str), optional): paths to copy directories. Defaults to None.
+        rules (WalkRules, optional): rules pruning directory trees. Defaults to None.
+        profiler (RunProfiler, optional): profiler counting stat calls. Defaults to NULL_PROFILER.
 
-    Returns:
-        list(str): list of all files' names
+    Yields:
+        FileRecord: record of file with its metadata
     """
-    files = get_files(path)
+    yield from walk_files(path, rules, profiler=profiler)
 
     if copy_paths:
         for copy_path in copy_paths:
-            files += get_files(copy_path)
-
-    return files
-
-def move_files_to_main_dir(main_dir_path, copy_paths):
-    """Function to move all files from copy directories (Y1, Y2,...) to main directory
-
-    Args:
-        main_dir_path (str): path to main directory
-        copy_paths (list(str)): paths to copy directories
-    """
-    for copy_path in copy_paths:
-        for filename in get_files(copy_path):
-            new_filename = generate_unique_filename(filename, main_dir_path, copy_path)
-            shutil.move(filename, new_filename)
+            yield from walk_files(copy_path, rules, profiler=profiler)
 
-def generate_unique_filename(filename, main_dir_path, copy_path):
+def generate_unique_filename(filename, main_dir_path, copy_path, index=None):
     """Function to generate unique (in main directory) name of file from copy directory
 
     Args:
         filename (str): proposed file name
         main_dir_path (str): path to main directory
         copy_path (str): path to copy directory
+        index (NameIndex, optional): index of used names (if not given, filesystem is checked). Defaults to None.
 
     Returns:
         str: unique file name
     """
-    new_filename = filename.replace(copy_path, main_dir_path)
+    new_filename = os.path.join(main_dir_path, os.path.relpath(filename, copy_path))
+    if index is not None:
+        return index.allocate(new_filename)
     if os.path.exists(new_filename):
         i = 1
         name, extension = os.path.splitext(new_filename)
         new_filename = name + "_" + str(i) + extension
         while os.path.exists(new_filename):
             i += 1
-            new_filename = str(i).join(new_filename.rsplit(str(i-1), 1))
+            new_filename = name + "_" + str(i) + extension
     return new_filename
 
+def is_structured_configuration(conf_path):
+    """Function to check whether configuration file has structured (INI) format
+
+    Args:
+        conf_path (str): path to configuration file
+
+    Returns:
+        bool: whether the first line which is not a comment is a header of section
+    """
+    with open(conf_path, "r") as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith(("#", ";")):
+                return line.startswith("[")
+    return False
+
+def read_structured_configuration(conf_path):
+    """Function to read configuration file in structured (INI) format
+
+    Args:
+        conf_path (str): path to configuration file
+
+    Returns:
+        configparser.ConfigParser: configuration
+    """
+    parser = configparser.ConfigParser(delimiters=("=",), interpolation=None)
+    # names of options are globs of files, so their case is kept
+    parser.optionxform = str
+    with open(conf_path, "r") as f:
+        parser.read_file(f)
+    return parser
+
 def load_configuration(conf_path):
-    """Function to load configuration from file
+    """Function to load configuration from file (structured format or old format of four lines)
 
     Args:
         conf_path (str): path to configuration file
@@ -206,6 +221,17 @@ def load_configuration(conf_path):
     Returns:
         str, set(str), str, set(str): configuration
     """
+    if is_structured_configuration(conf_path):
+        parser = read_structured_configuration(conf_path)
+        files = parser["files"] if parser.has_section("files") else {}
+        permissions = files.get("permissions", "-rw-r--r--")
+        bad_characters = set(files.get("bad-characters", "").split())
+        substitute = files.get("substitute", "_")
+        # extensions are used to generate testing files
+        temp_extensions = set(pattern[1:] for pattern in sum(load_temporary_rules(conf_path), [])
+                              if pattern.startswith("*.") and not any(char in pattern[1:] for char in "*?[/"))
+        return permissions, bad_characters, substitute, temp_extensions
+
     with open(conf_path, "r") as f:
         permissions = f.readline().rstrip().replace("permissions: ", "")
         bad_characters = set(f.readline().rstrip().replace("bad-characters: ", "").split(" "))
@@ -213,3 +239,43 @@ def load_configuration(conf_path):
         temp_extensions = set(f.readline().rstrip().replace("temporary-extensions: ", "").split(" "))
         temp_extensions.add(".tmp")
     return permissions, bad_characters, substitute, temp_extensions
+
+def load_permission_rules(conf_path):
+    """Function to load rules of permissions from configuration file (options "SELECTOR = PERMISSIONS" of section
+    [permissions] or, in old format, lines "permissions SELECTOR: PERMISSIONS" after the four basic lines,
+    e.g. "permissions *.sh: rwxr-xr-x", "permissions .csv .json: 644", "permissions executable: rwxr-xr-x")
+
+    Args:
+        conf_path (str): path to configuration file
+
+    Returns:
+        list(tuple(str, str)): selectors and permissions of rules (in order of priority)
+    """
+    if is_structured_configuration(conf_path):
+        parser = read_structured_configuration(conf_path)
+        return list(parser["permissions"].items()) if parser.has_section("permissions") else []
+
+    rules = list()
+    with open(conf_path, "r") as f:
+        for line in f.readlines()[4:]:
+            line = line.strip()
+            if line.startswith("permissions ") and ":" in line:
+                (selector, permissions) = line[len("permissions "):].rsplit(":", 1)
+                rules.append((selector.strip(), permissions.strip()))
+    return rules
+
+def load_temporary_rules(conf_path):
+    """Function to load glob patterns of temporary files from configuration file (option "patterns" of sections
+    [temporary], [temporary.main] and [temporary.copies]; in old format patterns are made of temporary extensions)
+
+    Args:
+        conf_path (str): path to configuration file
+
+    Returns:
+        list(str), list(str), list(str): patterns for all directories, for main directory and for copy directories
+    """
+    if not is_structured_configuration(conf_path):
+        (_, _, _, temp_extensions) = load_configuration(conf_path)
+        return ["*" + extension for extension in sorted(temp_extensions) if extension] + ["*~"], [], []
+    parser = read_structured_configuration(conf_path)
+    return tuple(parser.get(section, "patterns", fallback="").split() for section in ("temporary", "temporary.main", "temporary.copies"))
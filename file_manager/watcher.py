@@ -0,0 +1,456 @@
+"""module watcher
+
+Watching directory trees with inotify (through ctypes) and managing new files as soon as they are written
+"""
+import os
+import time
+import errno
+import ctypes
+import select
+import struct
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+
+from file_manager.dirfd import DirectoryCache
+from file_manager.inventory import FileInventory
+from file_manager.log import ActionLog
+from file_manager.profiler import NULL_PROFILER
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_ONLYDIR
+EVENT = struct.Struct("iIII")
+BUFFER_SIZE = 64 * 1024
+DEBOUNCE = 1.0
+
+try:
+    _libc = ctypes.CDLL(None, use_errno=True)
+    _inotify_init1 = _libc.inotify_init1
+    _inotify_init1.argtypes = (ctypes.c_int,)
+    _inotify_add_watch = _libc.inotify_add_watch
+    _inotify_add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+except (OSError, AttributeError):
+    _inotify_init1 = None
+
+
+class Inotify:
+    """class Inotify
+
+    Class to receive events about changes in watched directories from kernel (Linux inotify)
+    """
+    def __init__(self):
+        """init method
+
+        Raises:
+            OSError: inotify is not supported
+        """
+        if _inotify_init1 is None:
+            raise OSError(errno.ENOSYS, "inotify is not supported")
+        self.fd = _inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def add_watch(self, path, mask=WATCH_MASK):
+        """Method to start watching directory
+
+        Args:
+            path (str): path to directory
+            mask (int, optional): watched events. Defaults to WATCH_MASK.
+
+        Returns:
+            int: watch descriptor
+        """
+        wd = _inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error), path)
+        return wd
+
+    def read(self, timeout=None):
+        """Method to read waiting events
+
+        Args:
+            timeout (float, optional): maximal time of waiting for first event in seconds (forever if None). Defaults to None.
+
+        Returns:
+            list(tuple(int, int, int, str)): events (watch descriptor, mask, cookie, name of file)
+        """
+        (readable, _, _) = select.select([self.fd], [], [], timeout)
+        events = list()
+        while readable:
+            try:
+                data = os.read(self.fd, BUFFER_SIZE)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                (wd, mask, cookie, length) = EVENT.unpack_from(data, offset)
+                offset += EVENT.size
+                name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+                offset += length
+                events.append((wd, mask, cookie, name))
+        return events
+
+    def close(self):
+        """Method to stop watching all directories
+        """
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class FileWatcher:
+    """class FileWatcher
+
+    Class to watch main and copy directories. Initial scan adds watches to directories before
+    reading them, so no file is missed. Later only files created, closed after writing or moved
+    into watched directories are checked (when nobody writes them for debounce time) by the same
+    rules as in batch mode: empty, temporary and duplicated files, wrong permissions and names.
+    When queue of events overflows, directories changed since they were read are read again.
+    """
+    def __init__(self, roots, debounce=DEBOUNCE, log=None):
+        """init method
+
+        Args:
+            roots (list(str)): paths to main and copy directories
+            debounce (float, optional): time (in seconds) without writing after which file is checked. Defaults to DEBOUNCE.
+            log (ActionLog, optional): log of errors (unbuffered standard output if not given). Defaults to None.
+        """
+        self.roots = roots
+        self.debounce = debounce
+        self.log = log if log is not None else ActionLog(buffer_size=0)
+        self.inotify = Inotify()
+        self.watches = dict()
+        self.mtimes = dict()
+        self.pending = dict()
+        self.inventory = FileInventory()
+        self.manager = None
+        self.members = defaultdict(lambda: array("I"))
+        self.sizes = array("q")
+        self.order = array("I")
+        self.recent = defaultdict(list)
+        self.profiler = NULL_PROFILER
+
+    def scan(self):
+        """Method to read all files from watched directories (directories are watched from now on)
+
+        Returns:
+            FileInventory: inventory of files
+        """
+        for root in self.roots:
+            self.watch_tree(root, initial=True)
+        return self.inventory
+
+    def watch_tree(self, root, initial=False):
+        """Method to watch directory with its subdirectories and read their files
+
+        Args:
+            root (str): path to directory
+            initial (bool, optional): whether files are added to inventory (otherwise they are checked as new files). Defaults to False.
+        """
+        stack = [root]
+        with DirectoryCache() as directories:
+            while stack:
+                directory = stack.pop()
+                try:
+                    self.watch(directory)
+                    fd = directories.get(directory)
+                    self.profiler.count("stat")
+                    self.mtimes[directory] = os.fstat(fd).st_mtime_ns
+                    with os.scandir(fd) as entries:
+                        entries = sorted(entries, key=lambda x: x.name)
+                except OSError as e:
+                    self.log.error("Cannot watch {}: {}".format(directory, e))
+                    continue
+                subdirectories = []
+                for entry in entries:
+                    filename = os.path.join(directory, entry.name)
+                    if entry.is_dir():
+                        subdirectories.append(filename)
+                    elif not initial:
+                        self.schedule(filename)
+                    else:
+                        try:
+                            self.profiler.count("stat")
+                            st = entry.stat()
+                        except FileNotFoundError:
+                            # broken symbolic link
+                            self.profiler.count("stat")
+                            st = entry.stat(follow_symlinks=False)
+                        self.add_file(filename, st)
+                # keep depth-first order of names
+                stack.extend(reversed(subdirectories))
+
+    def watch(self, directory):
+        """Method to start watching one directory
+
+        Args:
+            directory (str): path to directory
+        """
+        self.watches[self.inotify.add_watch(directory)] = directory
+
+    def add_file(self, filename, st):
+        """Method to add file to inventory
+
+        Args:
+            filename (str): name of file
+            st (os.stat_result): metadata of file
+
+        Returns:
+            int: index of file
+        """
+        index = self.inventory.add(filename)
+        self.inventory.update(index, st)
+        if self.manager is not None:
+            self.members[self.inventory.dir_ids[index]].append(index)
+            self.recent[st.st_size].append(index)
+        return index
+
+    def attach(self, manager):
+        """Method to set manager of files and index files of its inventory (after initial managing)
+
+        Args:
+            manager (FileManager): manager of files from inventory of watcher
+        """
+        self.manager = manager
+        manager.set_roots(self.roots)
+        inventory = self.inventory
+        self.members.clear()
+        self.recent.clear()
+        indices = list(inventory.indices())
+        for index in indices:
+            self.members[inventory.dir_ids[index]].append(index)
+        indices.sort(key=inventory.sizes.__getitem__)
+        self.order = array("I", indices)
+        self.sizes = array("q", (inventory.sizes[index] for index in indices))
+
+    def find(self, filename):
+        """Method to find file in inventory
+
+        Args:
+            filename (str): name of file
+
+        Returns:
+            int: index of file (None if file is not known)
+        """
+        inventory = self.inventory
+        (directory, name) = os.path.split(filename)
+        dir_id = inventory.directory_ids.get(directory)
+        if dir_id is None:
+            return None
+        for index in self.members.get(dir_id, ()):
+            if inventory.names[index] == name and inventory.dir_ids[index] == dir_id and not inventory.is_removed(index):
+                return index
+        return None
+
+    def same_size(self, size):
+        """Method to get files with given size
+
+        Args:
+            size (int): size of files
+
+        Returns:
+            list(int): indices of files which are not removed
+        """
+        (start, end) = (bisect_left(self.sizes, size), bisect_right(self.sizes, size))
+        indices = list(self.order[start:end]) + self.recent.get(size, [])
+        return [index for index in indices if not self.inventory.is_removed(index)]
+
+    def stat(self, filename):
+        """Method to read metadata of file
+
+        Args:
+            filename (str): name of file
+
+        Returns:
+            os.stat_result: metadata of file (None if it cannot be read)
+        """
+        try:
+            try:
+                self.profiler.count("stat")
+                return os.stat(filename)
+            except FileNotFoundError:
+                # broken symbolic link
+                self.profiler.count("stat")
+                return os.lstat(filename)
+        except OSError:
+            return None
+
+    def schedule(self, filename, st=None):
+        """Method to check file after debounce time (if its size and modification time do not change until then)
+
+        Args:
+            filename (str): name of file
+            st (os.stat_result, optional): current metadata of file (read if not given). Defaults to None.
+        """
+        st = st if st is not None else self.stat(filename)
+        state = (st.st_size, st.st_mtime_ns) if st is not None else None
+        self.pending[filename] = (time.monotonic() + self.debounce, state)
+
+    def handle(self, events):
+        """Method to handle events from kernel
+
+        Args:
+            events (list(tuple(int, int, int, str))): events (watch descriptor, mask, cookie, name of file)
+        """
+        for (wd, mask, _, name) in events:
+            if mask & IN_Q_OVERFLOW:
+                self.rescan_changed()
+                continue
+            directory = self.watches.get(wd)
+            if directory is None:
+                continue
+            if mask & IN_IGNORED:
+                del self.watches[wd]
+                continue
+            if not name:
+                continue
+            filename = os.path.join(directory, name)
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    self.watch_tree(filename)
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                self.pending.pop(filename, None)
+                index = self.find(filename)
+                if index is not None:
+                    self.inventory.remove(index)
+            else:
+                self.schedule(filename)
+
+    def rescan_changed(self):
+        """Method to read again directories changed since they were read (events were lost)
+        """
+        for directory, mtime_ns in list(self.mtimes.items()):
+            self.profiler.count("stat")
+            try:
+                current = os.stat(directory).st_mtime_ns
+            except OSError:
+                del self.mtimes[directory]
+                continue
+            if current == mtime_ns:
+                continue
+            self.mtimes[directory] = current
+            try:
+                with os.scandir(directory) as entries:
+                    names = set()
+                    for entry in entries:
+                        names.add(entry.name)
+                        if entry.is_dir():
+                            if entry.path not in self.mtimes:
+                                self.watch_tree(entry.path)
+                        else:
+                            self.schedule(entry.path)
+            except OSError as e:
+                self.log.error("Cannot read {}: {}".format(directory, e))
+                continue
+            # files removed while events were lost
+            dir_id = self.inventory.directory_ids.get(directory)
+            for index in self.members.get(dir_id, ()):
+                if self.inventory.names[index] not in names and self.inventory.dir_ids[index] == dir_id:
+                    self.inventory.remove(index)
+
+    def ready(self):
+        """Method to get files whose debounce time has passed
+
+        Returns:
+            list(tuple(str, tuple(int, int))): names of files with their size and modification time when they were scheduled
+        """
+        now = time.monotonic()
+        ready = sorted(filename for filename, (deadline, _) in self.pending.items() if deadline <= now)
+        return [(filename, self.pending.pop(filename)[1]) for filename in ready]
+
+    def process(self, filenames):
+        """Method to manage new (or changed) files
+
+        Args:
+            filenames (list(tuple(str, tuple(int, int)))): names of files with their size and modification time when they were scheduled
+
+        Returns:
+            list(int): indices of new files in inventory
+        """
+        inventory = self.inventory
+        manager = self.manager
+        new = list()
+        for (filename, state) in filenames:
+            st = self.stat(filename)
+            if st is None:
+                continue
+            if (st.st_size, st.st_mtime_ns) != state:
+                # file is still written (its modification time is not compared with clock, which may differ)
+                self.schedule(filename, st)
+                continue
+            index = self.find(filename)
+            if index is not None:
+                # e.g. file renamed by manager itself
+                if (inventory.inodes[index], inventory.sizes[index], inventory.mtimes[index]) == (st.st_ino, st.st_size, st.st_mtime_ns):
+                    continue
+                inventory.remove(index)
+            index = self.add_file(filename, st)
+            inventory.flags[index] = manager.classifier.classify(inventory.names[index], st.st_size, st.st_mode, inventory.directory(index))
+            new.append(index)
+        if not new:
+            return new
+
+        manager.remove_empty_files(new)
+        manager.remove_temporary_files(new)
+        for size in sorted(set(inventory.sizes[index] for index in new if not inventory.is_removed(index))):
+            group = self.same_size(size)
+            if len(group) > 1:
+                manager.remover.process_group_of_inventory(inventory, group, manager.action_duplicate, set(new))
+        manager.change_bad_files_permissions(new)
+        manager.rename_wrong_named_files(new)
+        manager.log.flush()
+        return new
+
+    def poll(self, timeout=None):
+        """Method to wait for events and manage files which are ready
+
+        Args:
+            timeout (float, optional): maximal time of waiting in seconds (forever if None). Defaults to None.
+
+        Returns:
+            list(int): indices of new files in inventory
+        """
+        if self.pending:
+            next_deadline = min(deadline for (deadline, _) in self.pending.values()) - time.monotonic()
+            timeout = max(0, next_deadline) if timeout is None else max(0, min(timeout, next_deadline))
+        self.handle(self.inotify.read(timeout))
+        return self.process(self.ready())
+
+    def run(self, manager):
+        """Method to manage new files until interrupted
+
+        Args:
+            manager (FileManager): manager of files from inventory of watcher
+        """
+        self.attach(manager)
+        try:
+            while True:
+                self.poll()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            manager.directories.close()
+            self.close()
+
+    def close(self):
+        """Method to stop watching
+        """
+        self.inotify.close()
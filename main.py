@@ -3,18 +3,95 @@
 Main script to run program
 """
 import argparse
+import os
 
 from file_manager.manager import FileManager
-from file_manager.utils import get_all_files, move_files_to_main_dir
+from file_manager.cache import HashCache
+from file_manager.snapshot import TreeSnapshot, configuration_fingerprint
+from file_manager.inventory import FileInventory
+from file_manager.plan import ActionPlan, apply_plan
+from file_manager.remover import FileRemover
+from file_manager.utils import get_all_files
+from file_manager.scanner import WalkRules
+from file_manager.mover import move_files_to_main_dir
+from file_manager.watcher import FileWatcher, DEBOUNCE
+from file_manager.pipeline import StreamingPipeline
+from file_manager.profiler import RunProfiler, NULL_PROFILER
+from file_manager.log import ActionLog, LEVELS
+from file_manager.spill import parse_size
+from file_manager.shards import scan_parallel
+from file_manager.manifest import Manifest, DIGESTS, FULL
 
-conf_path = "config/clean_files"
+conf_path = "config/clean_files.ini"
+legacy_conf_path = "config/clean_files"
+cache_path = "config/hash_cache.sqlite"
+snapshot_path = "config/tree_snapshot.sqlite"
+
+def save_profile(profiler, args):
+    """Function to save report of profiler to files given in arguments
+
+    Args:
+        profiler (RunProfiler): profiler of run
+        args (argparse.Namespace): parsed arguments
+    """
+    if args.profile:
+        profiler.save_json(args.profile)
+    if args.profile_prometheus:
+        profiler.save_prometheus(args.profile_prometheus)
+
+def find_configuration(path):
+    """Function to choose configuration file (given in arguments, INI file or, if it does not exist, file in old format)
+
+    Args:
+        path (str): path given in arguments (None if not given)
+
+    Returns:
+        str: path to configuration file
+    """
+    if path is not None:
+        return path
+    if not os.path.exists(conf_path) and os.path.exists(legacy_conf_path):
+        return legacy_conf_path
+    return conf_path
+
+def report_pruned(rules, log, profiler):
+    """Function to report number of entries pruned during walking
+
+    Args:
+        rules (WalkRules): rules pruning directory trees (None if not used)
+        log (ActionLog): log of actions
+        profiler (RunProfiler): profiler of run
+    """
+    if rules is not None:
+        log.message("{} entries pruned (excluded, too deep or on other filesystem)".format(rules.pruned))
+        profiler.count("pruned", rules.pruned)
+
+def export_manifest(manager, roots, args, log, profiler):
+    """Function to write files of directory trees to manifest given in arguments
+
+    Args:
+        manager (FileManager): manager of files (its inventory is exported)
+        roots (list(str)): paths to main and copy directories
+        args (argparse.Namespace): parsed arguments
+        log (ActionLog): log of actions
+        profiler (RunProfiler): profiler of run
+    """
+    with profiler.stage("manifest"):
+        manifest = Manifest(args.manifest)
+        try:
+            written = manifest.export(manager.get_inventory(), roots, manager.remover.finder, args.manifest_digests)
+        finally:
+            manifest.close()
+    log.message("{} files written to manifest {}".format(written, args.manifest))
 
 def main():
     # parsing arguments
     parser = argparse.ArgumentParser()
 
-    parser.add_argument("main_path", type=str)
+    parser.add_argument("main_path", type=str, nargs="?")
     parser.add_argument("copy_paths", type=str, nargs="*")
+    parser.add_argument("--conf", dest="conf", type=str,
+                        help="configuration file in INI or old format (default config/clean_files.ini or, if it does not exist, config/clean_files)")
     parser.add_argument("--temp_del", dest="t_del", action="store_true")
     parser.add_argument("--temp_keep", dest="t_keep", action="store_true")
     parser.add_argument("--empty_del", dest="e_del", action="store_true")
@@ -23,10 +100,83 @@ def main():
     parser.add_argument("--bad_keep", dest="b_keep", action="store_true")
     parser.add_argument("--perm_change", dest="p_change", action="store_true")
     parser.add_argument("--perm_keep", dest="p_keep", action="store_true")
-    parser.add_argument("--same_action", dest="s_action", choices=['old', 'new', 'none'])
+    parser.add_argument("--same_action", dest="s_action", choices=['old', 'new', 'link', 'none'])
+    parser.add_argument("--name_conflict", "--name-conflict", dest="name_conflict", choices=['newer', 'older', 'both'], default='both')
+    parser.add_argument("--jobs", dest="jobs", type=int, default=min(8, os.cpu_count() or 1))
+    parser.add_argument("--no_cache", "--no-cache", dest="no_cache", action="store_true")
+    parser.add_argument("--rebuild_cache", "--rebuild-cache", dest="rebuild_cache", action="store_true")
+    parser.add_argument("--plan", dest="plan", type=str, help="save plan of actions to file instead of performing them")
+    parser.add_argument("--apply", dest="apply", type=str, help="apply plan of actions saved in file")
+    parser.add_argument("--dry_run", "--dry-run", dest="dry_run", action="store_true")
+    parser.add_argument("--incremental", dest="incremental", action="store_true",
+                        help="read only directories changed since the previous incremental run")
+    parser.add_argument("--full_scan", "--full-scan", dest="full_scan", action="store_true",
+                        help="read all directories again and refresh snapshot of incremental runs")
+    parser.add_argument("--watch", dest="watch", action="store_true",
+                        help="after managing all files keep watching directories and manage new files")
+    parser.add_argument("--debounce", dest="debounce", type=float, default=DEBOUNCE,
+                        help="time (in seconds) without writing after which new file is managed in watch mode")
+    parser.add_argument("--stream", dest="stream", action="store_true",
+                        help="remove empty and temporary files and compute digests while directories are walked")
+    parser.add_argument("--profile", dest="profile", type=str,
+                        help="save time of stages and numbers of operations on files to file in JSON format")
+    parser.add_argument("--profile_prometheus", "--profile-prometheus", dest="profile_prometheus", type=str,
+                        help="save the same report to file for textfile collector of Prometheus (*.prom)")
+
+    parser.add_argument("--log_level", "--log-level", dest="log_level", choices=list(LEVELS), default="summary",
+                        help="error - only errors, summary - summary of actions, verbose - every file")
+    parser.add_argument("-v", "--verbose", dest="log_level", action="store_const", const="verbose",
+                        help="the same as --log_level verbose")
+    parser.add_argument("--log_format", "--log-format", dest="log_format", choices=["text", "jsonl"], default="text")
+    parser.add_argument("--exclude", dest="exclude", action="append", default=[],
+                        help="glob of names (or ends of paths) of files and directories which are not read (can be repeated)")
+    parser.add_argument("--max_depth", "--max-depth", dest="max_depth", type=int,
+                        help="number of levels of subdirectories read below main and copy directories")
+    parser.add_argument("--one_file_system", "--one-file-system", dest="one_file_system", action="store_true",
+                        help="do not read directories on other filesystems than main or copy directory")
+    parser.add_argument("--scan_jobs", "--scan-jobs", dest="scan_jobs", type=int, default=1,
+                        help="number of processes walking main and copy directories (and their top-level subdirectories)")
+    parser.add_argument("--manifest", dest="manifest", type=str,
+                        help="file (SQLite) to which relative paths, metadata and digests of files are exported")
+    parser.add_argument("--manifest_digests", "--manifest-digests", dest="manifest_digests", choices=DIGESTS, default=FULL,
+                        help="digests written to manifest (partial digests cover only the beginning and the end of files)")
+    parser.add_argument("--memory_limit", "--memory-limit", dest="memory_limit", type=parse_size,
+                        help="memory (e.g. 512M, 2G) above which list of files is moved to temporary files and files are grouped on disk")
 
     args = parser.parse_args()
     path = args.main_path
+    log = ActionLog(LEVELS[args.log_level], args.log_format == "jsonl")
+    profiler = RunProfiler() if args.profile or args.profile_prometheus else NULL_PROFILER
+    log.profiler = profiler
+
+    if args.apply:
+        remover = FileRemover(log=log)
+        remover.directories.profiler = profiler
+        with profiler.stage("apply"):
+            counts = apply_plan(ActionPlan.load(args.apply), remover, log)
+        log.message(", ".join("{}: {}".format(action, count) for action, count in sorted(counts.items())))
+        log.close()
+        if profiler.enabled:
+            save_profile(profiler, args)
+        return
+    if path is None:
+        parser.error("the following arguments are required: main_path")
+    conf = find_configuration(args.conf)
+    if not os.path.isfile(conf):
+        parser.error("configuration file {} does not exist".format(conf))
+    if args.watch and (args.plan or args.dry_run or args.incremental or args.full_scan):
+        parser.error("--watch cannot be used with --plan, --dry_run, --incremental or --full_scan")
+    if args.stream and (args.plan or args.dry_run or args.incremental or args.full_scan or args.watch):
+        parser.error("--stream cannot be used with --plan, --dry_run, --incremental, --full_scan or --watch")
+    if args.memory_limit is not None and (args.stream or args.watch or args.incremental or args.full_scan or args.scan_jobs > 1):
+        parser.error("--memory_limit cannot be used with --stream, --watch, --incremental, --full_scan or --scan_jobs")
+    if args.scan_jobs > 1 and (args.incremental or args.full_scan or args.watch or args.stream):
+        parser.error("--scan_jobs cannot be used with --incremental, --full_scan, --watch or --stream")
+    rules = None
+    if args.exclude or args.max_depth is not None or args.one_file_system:
+        if args.watch:
+            parser.error("--watch cannot be used with --exclude, --max_depth or --one_file_system")
+        rules = WalkRules(args.exclude, args.max_depth, args.one_file_system)
 
     ask_empty = not (args.e_del or args.e_keep)
     action_empty = args.e_del
@@ -39,17 +189,106 @@ def main():
     action_duplicate = args.s_action
 
     # creating manager
-    filenames = get_all_files(path, args.copy_paths)
-    manager = FileManager(conf_path, filenames)
+    snapshot = None
+    watcher = None
+    cache = None
+    # digests of files are saved (and databases closed) even if run is interrupted
+    try:
+        with profiler.stage("scan"):
+            if args.watch:
+                # directories are watched before they are read, so no new file is missed
+                watcher = FileWatcher([path] + args.copy_paths, args.debounce, log)
+                watcher.profiler = profiler
+                inventory = watcher.scan()
+            elif args.stream:
+                # files are added by the pipeline during walking
+                inventory = FileInventory()
+            elif args.incremental or args.full_scan:
+                snapshot = TreeSnapshot(snapshot_path, configuration_fingerprint(conf))
+                snapshot.profiler = profiler
+                if args.full_scan:
+                    snapshot.clear()
+                (inventory, classified) = snapshot.scan([path] + args.copy_paths, rules)
+                log.message(snapshot.summary())
+            elif args.scan_jobs > 1:
+                inventory = scan_parallel([path] + args.copy_paths, args.scan_jobs, rules, profiler=profiler)
+            else:
+                inventory = FileInventory(get_all_files(path, args.copy_paths, rules, profiler), args.memory_limit)
+        if not args.stream:
+            report_pruned(rules, log, profiler)
+        manager = FileManager(conf, inventory)
+        manager.set_profiler(profiler)
+        manager.set_log(log)
+        if snapshot is not None:
+            manager.set_known_flags(classified)
+
+        manager.set_parameters(ask_empty=ask_empty, action_empty=action_empty, ask_temporary=ask_temp,
+                           action_temporary=action_temp, ask_wrong_name=ask_bad, action_wrong_name=action_bad,
+                           ask_permissions=ask_perm, action_permissions=action_perm, action_duplicate=action_duplicate,
+                           action_name_conflict=args.name_conflict)
+
+        manager.set_jobs(args.jobs)
+        manager.set_memory_limit(args.memory_limit)
+
+        if not args.no_cache:
+            cache = HashCache(cache_path)
+            if args.rebuild_cache:
+                cache.clear()
+            manager.set_hash_cache(cache)
+
+        if args.plan or args.dry_run:
+            if args.manifest:
+                # planning changes inventory, so files are exported as they are now
+                export_manifest(manager, [path] + args.copy_paths, args, log, profiler)
+            with profiler.stage("plan"):
+                plan = manager.plan_files([path] + args.copy_paths)
+            log.close()
+            if args.plan:
+                plan.save(args.plan)
+                print("{} actions saved to {}".format(len(plan), args.plan))
+            else:
+                for action in plan:
+                    print(action)
+            if profiler.enabled:
+                save_profile(profiler, args)
+            return
+
+        if args.stream:
+            StreamingPipeline(manager, [path] + args.copy_paths, rules=rules).run()
+            report_pruned(rules, log, profiler)
+        else:
+            manager.manage_files([path] + args.copy_paths)
+
+        # moving files to main dir
+        with profiler.stage("move"):
+            mover = move_files_to_main_dir(path, args.copy_paths, manager.get_inventory(), args.jobs, log)
+        profiler.count("rename", mover.stats["rename"][0])
+        profiler.count("copy", mover.stats["copy"][0])
+        summary = mover.summary()
+        if summary:
+            log.message(summary)
+
+        if args.manifest:
+            export_manifest(manager, [path] + args.copy_paths, args, log, profiler)
 
-    manager.set_parameters(ask_empty=ask_empty, action_empty=action_empty, ask_temporary=ask_temp,
-                       action_temporary=action_temp, ask_wrong_name=ask_bad, action_wrong_name=action_bad,
-                       ask_permissions=ask_perm, action_permissions=action_perm, action_duplicate=action_duplicate)
+        if snapshot is not None:
+            with profiler.stage("save_snapshot"):
+                snapshot.save(manager.get_inventory())
 
-    manager.manage_files()
+        if profiler.enabled:
+            save_profile(profiler, args)
 
-    # moving files to main dir
-    move_files_to_main_dir(path, args.copy_paths)
+        if watcher is not None:
+            log.message("Watching {} (press Ctrl+C to stop)".format(", ".join([path] + args.copy_paths)))
+            log.flush()
+            watcher.run(manager)
+        # in watch mode summary covers also files managed while watching
+        log.close()
+    finally:
+        if cache is not None:
+            cache.close()
+        if snapshot is not None:
+            snapshot.close()
 
 if __name__ == "__main__":
     main()
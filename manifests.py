@@ -0,0 +1,87 @@
+"""script manifests
+
+Script to compare and merge manifests exported by main.py (--manifest) without touching the files
+"""
+import os
+import argparse
+import json
+
+from file_manager.manifest import Manifest
+from file_manager.log import format_size
+
+
+def compare(args):
+    """Function to print files identical in two manifests and files with the same relative path but different content
+
+    Args:
+        args (argparse.Namespace): parsed arguments
+
+    Returns:
+        int: number of reported files
+    """
+    manifest = Manifest(args.first, read_only=True)
+    reported = 0
+    try:
+        if not args.conflicts_only:
+            for (location, other, size, verified) in manifest.duplicates(args.second):
+                if args.format == "jsonl":
+                    print(json.dumps({"duplicate": location, "of": other, "size": size, "verified": verified}))
+                else:
+                    print("{} and {} are {} ({})".format(location, other, "identical" if verified else "probably identical",
+                                                        format_size(size)))
+                reported += 1
+        if not args.duplicates_only:
+            for (location, other, reason) in manifest.conflicts(args.second):
+                if args.format == "jsonl":
+                    print(json.dumps({"conflict": location, "with": other, "reason": reason}))
+                else:
+                    print("{} and {} differ ({})".format(location, other, reason))
+                reported += 1
+    finally:
+        manifest.close()
+    return reported
+
+def merge(args):
+    """Function to merge manifests (e.g. parts of one tree scanned on many machines) into one
+
+    Args:
+        args (argparse.Namespace): parsed arguments
+
+    Returns:
+        int: number of files in merged manifest
+    """
+    manifest = Manifest(args.output)
+    try:
+        for path in args.manifests:
+            print("{}: {} files".format(path, manifest.merge(path)))
+        return len(manifest)
+    finally:
+        manifest.close()
+
+def main():
+    parser = argparse.ArgumentParser()
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    parser_compare = commands.add_parser("compare", help="list identical and conflicting files of two manifests")
+    parser_compare.add_argument("first", type=str, help="first manifest")
+    parser_compare.add_argument("second", type=str, help="second manifest")
+    parser_compare.add_argument("--format", choices=["text", "jsonl"], default="text")
+    parser_compare.add_argument("--duplicates_only", "--duplicates-only", dest="duplicates_only", action="store_true")
+    parser_compare.add_argument("--conflicts_only", "--conflicts-only", dest="conflicts_only", action="store_true")
+
+    parser_merge = commands.add_parser("merge", help="merge manifests into one")
+    parser_merge.add_argument("output", type=str, help="merged manifest (created if it does not exist)")
+    parser_merge.add_argument("manifests", type=str, nargs="+", help="merged manifests")
+
+    args = parser.parse_args()
+    # read manifests are never created
+    for path in ([args.first, args.second] if args.command == "compare" else args.manifests):
+        if not os.path.isfile(path):
+            parser.error("manifest {} does not exist".format(path))
+    if args.command == "compare":
+        compare(args)
+    else:
+        print("{} files in {}".format(merge(args), args.output))
+
+if __name__ == "__main__":
+    main()
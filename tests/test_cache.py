@@ -0,0 +1,67 @@
+import os
+
+from file_manager.cache import HashCache
+from file_manager.dedup import ContentHasher, DuplicateFinder
+from file_manager.inventory import FileInventory
+from file_manager.utils import get_files
+
+
+class CountingHasher(ContentHasher):
+    def __init__(self):
+        super().__init__()
+        self.read_files = list()
+
+    def partial_digest(self, filename, size):
+        self.read_files.append(filename)
+        return super().partial_digest(filename, size)
+
+def find(path, cache):
+    hasher = CountingHasher()
+    inventory = FileInventory(get_files(path))
+    inventory.load_metadata()
+    classes = DuplicateFinder(hasher, cache).find(inventory, inventory.indices())
+    return classes, hasher.read_files
+
+def test_unchanged_files_are_not_read(tmp_path):
+    data = tmp_path / "data"
+    data.mkdir()
+    for i in range(3):
+        (data / "file{}".format(i)).write_bytes(b"x" * 10000)
+    cache_path = str(tmp_path / "cache.sqlite")
+
+    cache = HashCache(cache_path)
+    classes, read_files = find(str(data), cache)
+    cache.close()
+    assert len(read_files) == 3
+    assert len(classes) == 1 and len(classes[0]) == 3
+
+    (data / "file2").write_bytes(b"y" * 10000)
+    cache = HashCache(cache_path)
+    classes, read_files = find(str(data), cache)
+    cache.close()
+    assert read_files == [str(data / "file2")]
+    assert len(classes) == 1 and len(classes[0]) == 2
+
+def test_eviction(tmp_path):
+    data = tmp_path / "data"
+    data.mkdir()
+    for i in range(4):
+        (data / "file{}".format(i)).write_bytes(b"x")
+    cache_path = str(tmp_path / "cache.sqlite")
+
+    cache = HashCache(cache_path)
+    find(str(data), cache)
+    cache.close()
+
+    os.remove(data / "file0")
+    cache = HashCache(cache_path)
+    assert cache.evict_missing() == 1
+    cache.max_entries = 2
+    assert cache.evict_oldest() == 1
+    cache.close()
+
+    cache = HashCache(cache_path)
+    assert cache.connection.execute("SELECT COUNT(*) FROM digests").fetchone()[0] == 2
+    cache.clear()
+    assert cache.connection.execute("SELECT COUNT(*) FROM digests").fetchone()[0] == 0
+    cache.close(evict=False)
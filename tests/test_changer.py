@@ -94,4 +94,12 @@ def test_process_wrong_named_file_user_decision(sharedFileChanger, monkeypatch):
     new_filename = changer.process_wrong_named_file(filename)
     assert not os.path.exists(filename)
     assert os.path.exists(new_filename)
-    assert filename.replace(",", changer.substitute_of_bad_char) == new_filename
\ No newline at end of file
+    assert filename.replace(",", changer.substitute_of_bad_char) == new_filename
+
+
+def test_generate_correct_filename_changes_only_basename(sharedFileChanger):
+    changer = sharedFileChanger['changer']
+
+    assert changer.sanitizer.is_wrong("bad,file")
+    assert not changer.sanitizer.is_wrong("good_file")
+    assert changer.generate_correct_filename("dir,1/bad,file$") == "dir,1/bad_file_"
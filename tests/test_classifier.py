@@ -0,0 +1,23 @@
+from file_manager.changer import FileNameSanitizer
+from file_manager.classifier import FileClassifier, EMPTY, TEMPORARY, BAD_PERMISSIONS, WRONG_NAME
+from file_manager.inventory import FileInventory
+from file_manager.scanner import FileRecord
+
+
+def test_classify_inventory():
+    classifier = FileClassifier("-rw-r--r--", FileNameSanitizer({":", "$"}, "_"), {".tmp", ".temp"})
+    inventory = FileInventory([
+        FileRecord("dir/good", 10, 0o100644, 0, 0, 1, 1),
+        FileRecord("dir/empty.tmp", 0, 0o100644, 0, 0, 2, 1),
+        FileRecord("dir/backup~", 5, 0o100664, 0, 0, 3, 1),
+        FileRecord("dir/wrong:name", 5, 0o100644, 0, 0, 4, 1),
+        FileRecord("wrong$dir/good", 5, 0o100644, 0, 0, 5, 1),
+    ])
+
+    classifier.classify_inventory(inventory)
+
+    assert list(inventory.flags) == [0, EMPTY | TEMPORARY, TEMPORARY | BAD_PERMISSIONS, WRONG_NAME, 0]
+    assert list(inventory.flagged(TEMPORARY)) == [1, 2]
+
+    inventory.remove(1)
+    assert list(inventory.flagged(TEMPORARY)) == [2]
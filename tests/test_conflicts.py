@@ -0,0 +1,117 @@
+import os
+
+from file_manager.conflicts import ConflictResolver, group_by_relative_path, NEWER, OLDER, BOTH
+from file_manager.dedup import DuplicateFinder, ContentHasher
+from file_manager.inventory import FileInventory
+from file_manager.manager import FileManager
+from file_manager.utils import get_all_files
+
+
+def prepare(tmp_path):
+    roots = [str(tmp_path / name) for name in ("X", "Y1", "Y2")]
+    for root in roots:
+        os.makedirs(os.path.join(root, "sub"))
+    for (root, content, mtime) in zip(roots, ("v1", "v2", "v1"), (100, 300, 200)):
+        filename = os.path.join(root, "sub", "report.txt")
+        with open(filename, "w") as f:
+            f.write(content)
+        os.utime(filename, ns=(mtime, mtime))
+    with open(os.path.join(roots[1], "unique"), "w") as f:
+        f.write("unique")
+    inventory = FileInventory(get_all_files(roots[0], roots[1:]))
+    return roots, inventory
+
+def names(inventory, removed):
+    return sorted((os.path.relpath(inventory.path(r), os.path.dirname(os.path.dirname(inventory.directory(r)))), reason)
+                  for (r, _, reason) in removed)
+
+def test_group_by_relative_path(tmp_path):
+    roots, inventory = prepare(tmp_path)
+
+    groups = group_by_relative_path(inventory, roots)
+
+    assert len(groups) == 1 and len(groups[0]) == 3
+
+def test_resolve_newer(tmp_path):
+    roots, inventory = prepare(tmp_path)
+
+    removed = ConflictResolver(DuplicateFinder(), NEWER).resolve(inventory, roots)
+
+    # identical X and Y2: newer Y2 is kept, then newer Y1 wins with Y2
+    assert names(inventory, removed) == [("X/sub/report.txt", "identical"), ("Y2/sub/report.txt", NEWER)]
+
+def test_resolve_older_and_both(tmp_path):
+    roots, inventory = prepare(tmp_path)
+
+    removed = ConflictResolver(DuplicateFinder(), OLDER).resolve(inventory, roots)
+    assert names(inventory, removed) == [("Y1/sub/report.txt", OLDER), ("Y2/sub/report.txt", "identical")]
+
+    removed = ConflictResolver(DuplicateFinder(), BOTH).resolve(inventory, roots)
+    assert names(inventory, removed) == [("Y2/sub/report.txt", "identical")]
+
+def test_cached_digests_are_used(tmp_path, monkeypatch):
+    roots, inventory = prepare(tmp_path)
+    hasher = ContentHasher()
+    finder = DuplicateFinder(hasher)
+    digests = dict()
+
+    class Cache:
+        def key(self, inventory, index):
+            return index
+        def get(self, key):
+            return digests.get(key, (None, None))
+        def put(self, key, path, partial=None, full=None):
+            digests[key] = (partial, full)
+
+    finder.cache = Cache()
+    finder.find(inventory, inventory.indices())
+    monkeypatch.setattr(hasher, "partial_digest", None)
+
+    removed = ConflictResolver(finder, BOTH).resolve(inventory, roots)
+    assert len(removed) == 1
+
+def test_identical_files_are_kept_if_duplicates_are_kept(tmp_path):
+    roots, inventory = prepare(tmp_path)
+
+    removed = ConflictResolver(DuplicateFinder(), NEWER, identical=False).resolve(inventory, roots)
+
+    # identical X and Y2 are both kept, the only other file has no conflict left
+    assert removed == []
+
+def test_manager_respects_duplicate_action(tmp_path, monkeypatch):
+    roots, inventory = prepare(tmp_path)
+    conf_path = os.path.abspath("tests/clean_files_test")
+    paths = inventory.paths()
+
+    manager = FileManager(conf_path, FileInventory(get_all_files(roots[0], roots[1:])))
+    manager.set_parameters(action_duplicate="none")
+    manager.resolve_name_conflicts(roots)
+    assert all(os.path.exists(path) for path in paths)
+
+    answers = iter(["n"])
+    monkeypatch.setattr("builtins.input", lambda text: next(answers))
+    manager = FileManager(conf_path, FileInventory(get_all_files(roots[0], roots[1:])))
+    manager.set_parameters(action_duplicate=None)
+    manager.resolve_name_conflicts(roots)
+    assert all(os.path.exists(path) for path in paths)
+
+    manager = FileManager(conf_path, FileInventory(get_all_files(roots[0], roots[1:])))
+    manager.set_parameters(action_duplicate="old")
+    manager.resolve_name_conflicts(roots)
+    assert not os.path.exists(os.path.join(roots[2], "sub", "report.txt"))
+
+def test_digests_of_all_groups_are_computed_at_once(tmp_path):
+    roots, inventory = prepare(tmp_path)
+    for (root, content) in zip(roots, ("a1", "a1", "b1")):
+        with open(os.path.join(root, "sub", "other"), "w") as f:
+            f.write(content)
+    inventory = FileInventory(get_all_files(roots[0], roots[1:]))
+    finder = DuplicateFinder()
+    computed = list()
+    compute = finder.compute
+    finder.compute = lambda inventory, indices, function: computed.append(len(indices)) or compute(inventory, indices, function)
+
+    removed = ConflictResolver(finder, BOTH).resolve(inventory, roots)
+
+    assert names(inventory, removed) == [("Y1/sub/other", "identical"), ("Y2/sub/report.txt", "identical")]
+    assert computed == [6, 0]
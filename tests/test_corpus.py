@@ -0,0 +1,33 @@
+import os
+
+from benchmarks.corpus import CorpusSpec, generate_corpus
+
+
+def listing(path):
+    files = list()
+    for (directory, _, names) in os.walk(path):
+        for name in names:
+            filename = os.path.join(directory, name)
+            with open(filename, "rb") as f:
+                files.append((os.path.relpath(filename, path), f.read(), os.stat(filename).st_mode))
+    return sorted(files)
+
+def test_the_same_seed_gives_the_same_corpus(tmp_path):
+    spec = CorpusSpec(files=200, depth=2, fanout=2, median_size=100, duplicate_ratio=0.2, temporary_ratio=0.1, bad_name_ratio=0.1)
+
+    first = generate_corpus(str(tmp_path / "a"), spec, seed=7)
+    second = generate_corpus(str(tmp_path / "b"), spec, seed=7)
+
+    assert listing(tmp_path / "a") == listing(tmp_path / "b")
+    assert {key: value for key, value in first.items() if key != "roots"} == \
+           {key: value for key, value in second.items() if key != "roots"}
+    assert first["directories"] == 2 * 7
+    assert first["duplicate"] > 0 and first["temporary"] > 0 and first["bad_name"] > 0
+
+def test_duplicates_have_identical_content(tmp_path):
+    spec = CorpusSpec(files=100, depth=1, fanout=2, copy_dirs=0, duplicate_ratio=0.5, same_size_ratio=0.0, empty_ratio=0.0)
+
+    summary = generate_corpus(str(tmp_path), spec, seed=1)
+
+    contents = [content for (_, content, _) in listing(tmp_path)]
+    assert len(contents) - len(set(contents)) == summary["duplicate"]
@@ -0,0 +1,90 @@
+import os
+
+from file_manager.dedup import ContentHasher, DuplicateFinder
+from file_manager.inventory import FileInventory
+from file_manager.utils import get_files
+
+
+def write(path, content):
+    with open(path, "wb") as f:
+        f.write(content)
+
+def test_find_equivalence_classes(tmp_path):
+    big = os.urandom(50000)
+    write(tmp_path / "big1", big)
+    write(tmp_path / "big2", big)
+    # the same beginning and end, different middle
+    write(tmp_path / "big3", big[:20000] + b"x" + big[20001:])
+    write(tmp_path / "small1", b"abc")
+    write(tmp_path / "small2", b"abc")
+    write(tmp_path / "small3", b"abd")
+    write(tmp_path / "single", b"abcd")
+
+    inventory = FileInventory(sorted(get_files(str(tmp_path))))
+    inventory.load_metadata()
+    classes = DuplicateFinder().find(inventory, inventory.indices())
+
+    names = sorted(sorted(inventory.names[index] for index in identical) for identical in classes)
+    assert names == [["big1", "big2"], ["small1", "small2"]]
+
+def test_files_are_read_at_most_once(tmp_path, monkeypatch):
+    content = os.urandom(100000)
+    for i in range(5):
+        write(tmp_path / "file{}".format(i), content)
+
+    read_bytes = list()
+    original_open = open
+
+    class CountingFile:
+        def __init__(self, f):
+            self.f = f
+        def __enter__(self):
+            return self
+        def __exit__(self, *args):
+            self.f.close()
+        def read(self, size=-1):
+            data = self.f.read(size)
+            read_bytes.append(len(data))
+            return data
+        def readinto(self, buffer):
+            read = self.f.readinto(buffer)
+            read_bytes.append(read)
+            return read
+        def seek(self, offset):
+            return self.f.seek(offset)
+
+    monkeypatch.setattr("builtins.open", lambda *args, **kwargs: CountingFile(original_open(*args, **kwargs)))
+
+    inventory = FileInventory(get_files(str(tmp_path)))
+    inventory.load_metadata()
+    classes = DuplicateFinder(ContentHasher()).find(inventory, inventory.indices())
+
+    assert len(classes) == 1 and len(classes[0]) == 5
+    assert sum(read_bytes) == 5 * len(content)
+
+def test_parallel_and_memory_mapped_hashing(tmp_path):
+    contents = [os.urandom(30000) for _ in range(3)]
+    for i in range(30):
+        write(tmp_path / "file{:02d}".format(i), contents[i % 3] if i % 4 else os.urandom(30000))
+
+    inventory = FileInventory(sorted(get_files(str(tmp_path))))
+    inventory.load_metadata()
+    indices = list(inventory.indices())
+
+    sequential = DuplicateFinder().find(inventory, indices)
+    parallel = DuplicateFinder(ContentHasher(block_size=1000), jobs=4).find(inventory, indices)
+    mapped = DuplicateFinder(ContentHasher(mmap_threshold=0), jobs=4).find(inventory, indices)
+
+    assert len(sequential) == 3
+    assert sorted(sequential) == sorted(parallel) == sorted(mapped)
+
+def test_hard_links_are_not_read(tmp_path, monkeypatch):
+    write(tmp_path / "file", b"content")
+    os.link(tmp_path / "file", tmp_path / "link")
+
+    inventory = FileInventory(sorted(get_files(str(tmp_path))))
+    inventory.load_metadata()
+    hasher = ContentHasher()
+    monkeypatch.setattr(hasher, "partial_digest", None)
+
+    assert DuplicateFinder(hasher).find(inventory, inventory.indices()) == [[0, 1]]
@@ -0,0 +1,56 @@
+import os
+import pytest
+
+from file_manager.dirfd import DirectoryCache
+
+
+def test_number_of_open_directories_is_bounded(tmp_path):
+    for i in range(5):
+        (tmp_path / str(i)).mkdir()
+        (tmp_path / str(i) / "file").write_text("")
+
+    with DirectoryCache(max_open=3) as directories:
+        for i in range(5):
+            assert directories.stat(str(tmp_path / str(i) / "file")).st_size == 0
+        assert len(directories.descriptors) == 3
+        assert list(directories.descriptors) == [str(tmp_path / str(i)) for i in (2, 3, 4)]
+    assert len(directories.descriptors) == 0
+
+def test_operations_relative_to_directory(tmp_path):
+    (tmp_path / "X").mkdir()
+    (tmp_path / "X" / "a").write_text("a")
+    (tmp_path / "X" / "b").write_text("b")
+    directory = str(tmp_path / "X")
+
+    with DirectoryCache() as directories:
+        directories.chmod(os.path.join(directory, "a"), 0o640)
+        assert (tmp_path / "X" / "a").stat().st_mode & 0o777 == 0o640
+
+        with pytest.raises(FileExistsError):
+            directories.rename(os.path.join(directory, "a"), os.path.join(directory, "b"))
+        directories.rename(os.path.join(directory, "a"), os.path.join(directory, "c"))
+        directories.unlink(os.path.join(directory, "b"))
+    assert os.listdir(directory) == ["c"]
+
+def test_symbolic_link_is_not_followed(tmp_path):
+    (tmp_path / "secret").write_text("")
+    os.chmod(tmp_path / "secret", 0o600)
+    (tmp_path / "link").symlink_to(tmp_path / "secret")
+
+    with DirectoryCache() as directories:
+        with pytest.raises(OSError):
+            directories.chmod(str(tmp_path / "link"), 0o777)
+        directories.unlink(str(tmp_path / "link"))
+    assert (tmp_path / "secret").stat().st_mode & 0o777 == 0o600
+
+def test_removed_directory_is_opened_again(tmp_path):
+    (tmp_path / "X").mkdir()
+    (tmp_path / "X" / "a").write_text("")
+
+    with DirectoryCache() as directories:
+        directories.unlink(str(tmp_path / "X" / "a"))
+        os.rmdir(tmp_path / "X")
+        (tmp_path / "X").mkdir()
+        (tmp_path / "X" / "b").write_text("")
+        directories.unlink(str(tmp_path / "X" / "b"))
+    assert os.listdir(tmp_path / "X") == []
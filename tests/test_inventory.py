@@ -0,0 +1,49 @@
+import os
+
+from file_manager.inventory import FileInventory
+from file_manager.scanner import FileRecord
+
+
+def make_inventory(num_of_files, directory="/data/archive/2022/logs"):
+    inventory = FileInventory()
+    for i in range(num_of_files):
+        path = os.path.join(directory, "file{:06d}.log".format(i))
+        inventory.add_record(FileRecord(path, i, 0o100644, i, i, i, 1))
+    return inventory
+
+def test_directories_are_interned():
+    inventory = make_inventory(100)
+
+    assert len(inventory) == 100
+    assert inventory.directories == ["/data/archive/2022/logs"]
+    assert inventory.path(7) == "/data/archive/2022/logs/file000007.log"
+    assert inventory.record(7).size == 7
+
+def test_remove_and_rename_in_place():
+    inventory = make_inventory(3)
+
+    inventory.remove(1)
+    inventory.remove(1)
+    inventory.rename(2, "/data/other/renamed.log")
+
+    assert len(inventory) == 2
+    assert list(inventory.indices()) == [0, 2]
+    assert inventory.paths() == ["/data/archive/2022/logs/file000000.log", "/data/other/renamed.log"]
+    assert inventory.sizes[2] == 2
+
+def test_unloaded_files(tmp_path):
+    filename = tmp_path / "file"
+    filename.write_text("content")
+    inventory = FileInventory([str(filename)])
+
+    inventory.load_metadata()
+
+    assert inventory.sizes[0] == 7
+    assert inventory.inodes[0] == os.stat(filename).st_ino
+
+def test_memory_usage_per_file():
+    num_of_files = 100000
+    inventory = make_inventory(num_of_files)
+
+    # about 50 bytes of columns + 8 bytes of pointer + basename (49 + 14 bytes)
+    assert inventory.memory_usage() / num_of_files < 130
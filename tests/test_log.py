@@ -0,0 +1,90 @@
+import io
+import os
+import json
+
+from file_manager.log import ActionLog, ERROR, SUMMARY, VERBOSE, KEEP
+from file_manager.inventory import FileInventory
+from file_manager.manager import FileManager
+from file_manager.plan import REMOVE, RENAME, apply_plan
+from file_manager.remover import FileRemover
+from file_manager.utils import get_all_files
+
+conf_path = os.path.abspath("tests/clean_files_test")
+
+
+def test_summary_counts_files_and_bytes():
+    stream = io.StringIO()
+    log = ActionLog(SUMMARY, stream=stream)
+    log.event(REMOVE, "a", "duplicate", "b", 2048)
+    log.event(REMOVE, "c", "duplicate", "b", 1024)
+    log.event(KEEP, "d", "empty")
+    log.flush()
+    assert stream.getvalue() == ""
+
+    log.close()
+    assert stream.getvalue() == "keep (empty): 1 files, 0 B\nremove (duplicate): 2 files, 3.0 KiB\n"
+
+def test_verbose_lines_are_buffered():
+    stream = io.StringIO()
+    log = ActionLog(VERBOSE, stream=stream, buffer_size=2)
+    log.event(REMOVE, "a", "duplicate", "b")
+    log.event(RENAME, "c:d", target="c_d")
+    assert stream.getvalue() == ""
+
+    log.event(KEEP, "e", "empty")
+    assert stream.getvalue() == "a removed (duplicate: b)\nc:d renamed to c_d\ne kept (empty)\n"
+
+def test_json_lines_and_errors():
+    stream = io.StringIO()
+    log = ActionLog(ERROR, json_lines=True, stream=stream)
+    log.event(REMOVE, "a", "temporary", size=5)
+    log.error("Cannot rename b", "b")
+    log.close()
+    assert [json.loads(line) for line in stream.getvalue().splitlines()] == [{"error": "Cannot rename b", "path": "b"}]
+
+    stream = io.StringIO()
+    log = ActionLog(VERBOSE, json_lines=True, stream=stream)
+    log.event(REMOVE, "a", "temporary", size=5)
+    log.close()
+    lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert lines == [{"action": "remove", "path": "a", "reason": "temporary", "target": None, "size": 5},
+                     {"summary": [{"action": "remove", "reason": "temporary", "files": 1, "bytes": 5}]}]
+
+def test_manager_reports_to_log(tmp_path):
+    for name, content in (("empty", ""), ("old.temp", "12345"), ("bad:name", "name")):
+        with open(tmp_path / name, "w") as f:
+            f.write(content)
+        os.chmod(tmp_path / name, 0o644)
+    stream = io.StringIO()
+    manager = FileManager(conf_path, list(get_all_files(str(tmp_path))))
+    manager.set_parameters(action_empty=True, action_temporary=True, action_wrong_name=True)
+    manager.set_log(ActionLog(SUMMARY, stream=stream))
+
+    manager.manage_files()
+    manager.log.close()
+
+    assert stream.getvalue() == "remove (empty): 1 files, 0 B\nremove (temporary): 1 files, 5 B\nrename: 1 files, 0 B\n"
+
+def test_per_file_errors_are_reported_to_log(tmp_path):
+    for name in ("a", "b"):
+        with open(tmp_path / name, "w") as f:
+            f.write("same")
+        os.chmod(tmp_path / name, 0o644)
+    stream = io.StringIO()
+    log = ActionLog(ERROR, json_lines=True, stream=stream)
+    manager = FileManager(conf_path, list(get_all_files(str(tmp_path))))
+    manager.set_log(log)
+    plan = manager.plan_files()
+    [removed] = [action.path for action in plan]
+    os.remove(removed)
+
+    # removed file can be neither read nor removed again
+    inventory = FileInventory([removed])
+    assert manager.remover.finder.compute(inventory, [0], lambda index: open(removed, "rb")) == dict()
+    counts = apply_plan(plan, FileRemover(log=log), log)
+    log.close()
+
+    lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert counts == {"skipped": 1}
+    assert lines[0]["error"].startswith("Cannot read {}".format(removed)) and lines[0]["path"] == removed
+    assert lines[1] == {"error": "{} changed since planning, skipped".format(removed), "path": None}
@@ -270,3 +270,17 @@ def test_manage_files3():
         assert stat.filemode(os.stat(filename).st_mode) == permissions
         # no bad characters
         assert len(bad_characters.intersection(set(filename))) == 0 
+
+def test_rename_wrong_named_files_collisions(configuration):
+    filenames = ["a:b", "a$b", "a_b"]
+    for filename in filenames:
+        with open(filename, "w") as f:
+            f.write(filename)
+
+    manager = FileManager(conf_path, filenames)
+    manager.rename_wrong_named_files()
+
+    assert sorted(manager.get_filenames()) == ["a_b", "a_b_1", "a_b_2"]
+    assert sorted(os.listdir(os.getcwd())) == ["a_b", "a_b_1", "a_b_2"]
+    with open("a_b") as f:
+        assert f.read() == "a_b"
@@ -0,0 +1,70 @@
+import os
+
+import pytest
+
+from file_manager.inventory import FileInventory
+from file_manager.manifest import Manifest, PARTIAL
+from file_manager.utils import get_all_files
+
+
+def prepare(root, files):
+    for name, content in files.items():
+        filename = os.path.join(root, name)
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        with open(filename, "w") as f:
+            f.write(content)
+
+def export(tmp_path, name, host, files, digests="full"):
+    root = str(tmp_path / name)
+    prepare(root, files)
+    manifest = Manifest(str(tmp_path / (name + ".db")))
+    written = manifest.export(FileInventory(get_all_files(root)), [root], digests=digests, host=host)
+    manifest.close()
+    return written
+
+def test_export_and_compare(tmp_path):
+    big = "x" * 20000
+    assert export(tmp_path, "A", "alpha", {"docs/a": "same", "b": big, "c": "one", "empty": ""}) == 4
+    assert export(tmp_path, "B", "beta", {"copy/a": "same", "b": big[:-1] + "y", "c": "two", "empty": ""}) == 4
+
+    manifest = Manifest(str(tmp_path / "A.db"))
+    assert list(manifest.duplicates(str(tmp_path / "B.db"))) == \
+        [("alpha:{}/docs/a".format(tmp_path / "A"), "beta:{}/copy/a".format(tmp_path / "B"), 4, True)]
+    assert [(os.path.basename(a), reason) for (a, b, reason) in manifest.conflicts(str(tmp_path / "B.db"))] == \
+        [("b", "content"), ("c", "content")]
+    manifest.close()
+
+def test_partial_digests_give_probable_duplicates(tmp_path):
+    big = "x" * 20000
+    export(tmp_path, "A", "alpha", {"b": big}, PARTIAL)
+    export(tmp_path, "B", "beta", {"d": big[:10000] + "y" + big[10001:]}, PARTIAL)
+
+    manifest = Manifest(str(tmp_path / "A.db"))
+    assert [verified for (_, _, _, verified) in manifest.duplicates(str(tmp_path / "B.db"))] == [False]
+    manifest.close()
+
+def test_merge_keeps_roots_of_all_manifests(tmp_path):
+    export(tmp_path, "A", "alpha", {"a": "1", "sub/b": "2"})
+    export(tmp_path, "B", "alpha", {"c": "3"})
+    export(tmp_path, "A", "alpha", {"d": "4"})
+
+    merged = Manifest(str(tmp_path / "merged.db"))
+    assert merged.merge(str(tmp_path / "A.db")) == 3
+    assert merged.merge(str(tmp_path / "B.db")) == 1
+    # merging the same manifest again replaces its files
+    assert merged.merge(str(tmp_path / "A.db")) == 3
+    assert len(merged) == 4
+    assert sorted(merged.roots().values()) == ["alpha:{}".format(tmp_path / "A"), "alpha:{}".format(tmp_path / "B")]
+    merged.close()
+
+def test_missing_manifest_is_not_created_when_read(tmp_path):
+    export(tmp_path, "A", "alpha", {"a": "1"})
+
+    with pytest.raises(FileNotFoundError):
+        Manifest(str(tmp_path / "missing.db"), read_only=True)
+    manifest = Manifest(str(tmp_path / "A.db"), read_only=True)
+    with pytest.raises(FileNotFoundError):
+        list(manifest.duplicates(str(tmp_path / "other.db")))
+    assert len(manifest) == 1
+    manifest.close()
+    assert sorted(os.listdir(tmp_path)) == ["A", "A.db"]
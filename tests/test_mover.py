@@ -0,0 +1,95 @@
+import io
+import os
+import errno
+
+import pytest
+
+from file_manager.inventory import FileInventory
+from file_manager.log import ActionLog, ERROR
+from file_manager.mover import FileMover, copy_file, move_files_to_main_dir
+from file_manager.utils import get_all_files
+
+
+def prepare(tmp_path):
+    main_dir = tmp_path / "X"
+    copy_dir = tmp_path / "Y1"
+    (main_dir / "sub").mkdir(parents=True)
+    (copy_dir / "sub").mkdir(parents=True)
+    (main_dir / "sub" / "data.txt").write_text("main")
+    (copy_dir / "sub" / "data.txt").write_text("copy")
+    (copy_dir / "new" ).mkdir()
+    (copy_dir / "new" / "file").write_text("new")
+    return str(main_dir), str(copy_dir)
+
+def test_move_files_to_main_dir_with_inventory(tmp_path):
+    main_dir, copy_dir = prepare(tmp_path)
+    inventory = FileInventory(get_all_files(main_dir, [copy_dir]))
+
+    mover = move_files_to_main_dir(main_dir, [copy_dir], inventory)
+
+    assert sorted(inventory.paths()) == sorted([os.path.join(main_dir, "new", "file"),
+                                                os.path.join(main_dir, "sub", "data.txt"),
+                                                os.path.join(main_dir, "sub", "data_1.txt")])
+    for filename in inventory.paths():
+        assert os.path.exists(filename)
+    assert list(get_all_files(copy_dir)) == []
+    assert "2 files" in mover.summary()
+
+def test_vanished_file_does_not_stop_moving(tmp_path):
+    main_dir, copy_dir = prepare(tmp_path)
+    inventory = FileInventory(get_all_files(main_dir, [copy_dir]))
+    os.remove(os.path.join(copy_dir, "sub", "data.txt"))
+    stream = io.StringIO()
+    log = ActionLog(ERROR, stream=stream)
+
+    move_files_to_main_dir(main_dir, [copy_dir], inventory, log=log)
+    log.flush()
+
+    assert os.path.exists(os.path.join(main_dir, "new", "file"))
+    assert os.path.join(main_dir, "new", "file") in inventory.paths()
+    assert stream.getvalue().startswith("Cannot move {}".format(os.path.join(copy_dir, "sub", "data.txt")))
+
+def test_move_between_devices(tmp_path):
+    main_dir, copy_dir = prepare(tmp_path)
+    mover = FileMover(main_dir)
+    # pretend that the copy directory is on other device
+    mover.main_dev = -1
+
+    files = [(record.path, record.size, record.dev, None) for record in get_all_files(copy_dir)]
+    moved = mover.move(files, copy_dir)
+
+    assert len(moved) == 2
+    assert mover.stats["copy"][:2] == [2, 7]
+    with open(os.path.join(main_dir, "sub", "data_1.txt")) as f:
+        assert f.read() == "copy"
+
+def test_copy_file_preserves_metadata(tmp_path):
+    source = tmp_path / "source"
+    source.write_bytes(os.urandom(100000))
+    os.utime(source, ns=(1000000000, 2000000000))
+    os.chmod(source, 0o640)
+    target = tmp_path / "target"
+
+    copy_file(str(source), str(target))
+
+    assert target.read_bytes() == source.read_bytes()
+    assert os.stat(target).st_mtime_ns == 2000000000
+    assert os.stat(target).st_mode == os.stat(source).st_mode
+
+def test_failed_copy_leaves_no_partial_file(tmp_path, monkeypatch):
+    main_dir, copy_dir = prepare(tmp_path)
+    (tmp_path / "X" / "taken").write_text("other")
+
+    def no_space(*args):
+        raise OSError(errno.ENOSPC, "No space left on device")
+
+    monkeypatch.setattr(os, "copy_file_range", no_space)
+    monkeypatch.setattr(os, "sendfile", no_space)
+    with pytest.raises(OSError):
+        copy_file(os.path.join(copy_dir, "new", "file"), os.path.join(main_dir, "file"))
+    with pytest.raises(FileExistsError):
+        copy_file(os.path.join(copy_dir, "new", "file"), os.path.join(main_dir, "taken"))
+
+    assert sorted(os.listdir(main_dir)) == ["sub", "taken"]
+    assert (tmp_path / "X" / "taken").read_text() == "other"
+    assert os.path.exists(os.path.join(copy_dir, "new", "file"))
@@ -0,0 +1,37 @@
+import os
+import pytest
+
+from file_manager.naming import NameIndex, rename_noreplace
+from file_manager.utils import generate_unique_filename
+
+
+def test_allocate_unique_names():
+    index = NameIndex.from_paths(["X/data.csv", "X/data_1.csv", "X/a1/b_1"])
+
+    assert index.allocate("X/other.csv") == "X/other.csv"
+    assert index.allocate("X/data.csv") == "X/data_2.csv"
+    assert index.allocate("X/data.csv") == "X/data_3.csv"
+    # base name containing digits of counter
+    assert index.allocate("X/a1/b_1") == "X/a1/b_1_1"
+    assert index.allocate("X/a1/b_1") == "X/a1/b_1_2"
+    assert "X/data_3.csv" in index
+
+def test_generate_unique_filename(tmp_path):
+    main_dir = tmp_path / "X"
+    main_dir.mkdir()
+    for name in ("v1", "v1_1", "v1_2"):
+        (main_dir / name).write_text("")
+
+    new_filename = generate_unique_filename(str(tmp_path / "Y1" / "v1"), str(main_dir), str(tmp_path / "Y1"))
+    assert new_filename == str(main_dir / "v1_3")
+
+def test_rename_noreplace(tmp_path):
+    (tmp_path / "a").write_text("a")
+    (tmp_path / "b").write_text("b")
+
+    with pytest.raises(FileExistsError):
+        rename_noreplace(str(tmp_path / "a"), str(tmp_path / "b"))
+    assert (tmp_path / "b").read_text() == "b"
+
+    rename_noreplace(str(tmp_path / "a"), str(tmp_path / "c"))
+    assert sorted(os.listdir(tmp_path)) == ["b", "c"]
@@ -0,0 +1,78 @@
+import os
+import stat
+import pytest
+
+from file_manager.classifier import BAD_PERMISSIONS
+from file_manager.manager import FileManager
+from file_manager.permissions import PermissionPolicy, parse_mode
+from file_manager.utils import get_all_files
+
+
+def write_configuration(path, rules):
+    with open(path, "w") as f:
+        f.write("permissions: -rw-r--r--\nbad-characters: :\nsubstitute: _\ntemporary-extensions: .temp\n")
+        for line in rules:
+            f.write(line + "\n")
+    return str(path)
+
+def test_parse_mode():
+    assert parse_mode("rwxr-xr-x") == 0o755
+    assert parse_mode("-rw-r--r--") == 0o644
+    assert parse_mode("0640") == 0o640
+    with pytest.raises(ValueError):
+        parse_mode("rwz")
+
+def test_first_matching_rule_wins():
+    policy = PermissionPolicy.from_configuration("rw-r--r--", [("bin/*", "750"), (".sh .py", "rwxr-xr-x"),
+                                                               ("executable", "rwxr-x---"), ("*.key", "600")])
+    assert policy.target("bin", "data.txt", 0o100644) == 0o750
+    assert policy.target("src", "run.sh", 0o100644) == 0o755
+    assert policy.target("src", "tool", 0o100744) == 0o750
+    assert policy.target("src", "id.key", 0o100644) == 0o600
+    assert policy.target("src", "data.txt", 0o100664) == 0o644
+    assert policy.is_compliant("src", "data.txt", 0o100644)
+    assert not policy.is_compliant("src", "data.txt", 0o104644)
+    assert policy.is_compliant("src", "link", 0o120777)
+
+def test_path_globs_match_under_absolute_roots():
+    policy = PermissionPolicy.from_configuration("rw-r--r--", [("scripts/*.sh", "755"), ("bin/*", "750")])
+    assert policy.target("/data/X/scripts", "a.sh", 0o100644) == 0o755
+    assert policy.target("/data/X/tools/bin", "run", 0o100644) == 0o750
+    assert policy.target("/data/X/scripts", "a.txt", 0o100644) == 0o644
+    assert policy.target("/data/X/myscripts", "a.sh", 0o100644) == 0o644
+    assert policy.target("/data/X", "bin", 0o100644) == 0o644
+
+def test_manager_applies_rules(tmp_path):
+    conf = write_configuration(tmp_path / "conf", ["permissions *.sh: rwxr-xr-x", "permissions executable: 755"])
+    root = tmp_path / "X"
+    root.mkdir()
+    modes = {"run.sh": 0o644, "tool": 0o700, "data": 0o664, "good": 0o644}
+    for name, mode in modes.items():
+        (root / name).write_text(name)
+        os.chmod(root / name, mode)
+    manager = FileManager(conf, list(get_all_files(str(root))))
+    manager.set_parameters(action_permissions=True)
+
+    manager.change_bad_files_permissions()
+
+    assert {name: stat.S_IMODE(os.stat(root / name).st_mode) for name in modes} == \
+           {"run.sh": 0o755, "tool": 0o755, "data": 0o644, "good": 0o644}
+    assert list(manager.get_inventory().flagged(BAD_PERMISSIONS)) == []
+
+def test_permissions_are_changed_in_parallel(tmp_path):
+    conf = write_configuration(tmp_path / "conf", [])
+    for i in range(300):
+        directory = tmp_path / "X" / "d{}".format(i % 7)
+        directory.mkdir(parents=True, exist_ok=True)
+        (directory / "f{}".format(i)).write_text("x")
+        os.chmod(directory / "f{}".format(i), 0o600 if i % 3 else 0o644)
+    manager = FileManager(conf, list(get_all_files(str(tmp_path / "X"))))
+    manager.set_parameters(action_permissions=True)
+    manager.set_jobs(4)
+
+    manager.change_bad_files_permissions()
+
+    inventory = manager.get_inventory()
+    for index in inventory.indices():
+        assert stat.S_IMODE(os.stat(inventory.path(index)).st_mode) == 0o644
+        assert stat.S_IMODE(inventory.modes[index]) == 0o644
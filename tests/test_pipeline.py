@@ -0,0 +1,81 @@
+import os
+import stat
+import threading
+
+from file_manager.manager import FileManager
+from file_manager.inventory import FileInventory
+from file_manager.pipeline import StreamingPipeline
+from file_manager.utils import get_all_files
+
+conf_path = os.path.abspath("tests/clean_files_test")
+
+
+def prepare(root):
+    files = {
+        "X/a": "same content", "X/sub/b": "same content", "X/sub/c": "other",
+        "X/empty": "", "X/old.temp": "temporary", "X/bad:name": "name",
+        "Y1/sub/c": "different", "Y1/d": "same content", "Y1/big1": "x" * 10000 + "1",
+        "Y1/big2": "x" * 10000 + "2", "Y1/big3": "x" * 10000 + "1",
+    }
+    for i, (name, content) in enumerate(sorted(files.items())):
+        filename = os.path.join(root, name)
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        with open(filename, "w") as f:
+            f.write(content)
+        os.chmod(filename, 0o664 if i % 2 else 0o644)
+        os.utime(filename, ns=(10**9 * (i + 1), 10**9 * (i + 1)))
+    return [os.path.join(root, "X"), os.path.join(root, "Y1")]
+
+def result(root):
+    return sorted((os.path.relpath(os.path.join(directory, name), root), stat.filemode(os.stat(os.path.join(directory, name)).st_mode))
+                  for (directory, _, names) in os.walk(root) for name in names)
+
+def make_manager(inventory):
+    manager = FileManager(conf_path, inventory)
+    manager.set_parameters(action_duplicate="new", action_name_conflict="newer")
+    return manager
+
+def test_streaming_equals_batch(tmp_path):
+    roots = prepare(str(tmp_path / "batch"))
+    make_manager(FileInventory(get_all_files(roots[0], roots[1:]))).manage_files(roots)
+
+    roots = prepare(str(tmp_path / "stream"))
+    manager = make_manager(FileInventory())
+    pipeline = StreamingPipeline(manager, roots, batch_size=2, queue_size=1)
+    pipeline.run()
+
+    assert result(str(tmp_path / "stream")) == result(str(tmp_path / "batch"))
+    # digests of big files were computed during walking
+    assert len([digests for digests in pipeline.memo.digests.values() if digests[1] is not None]) == 2
+
+def test_files_are_not_read_after_walking(tmp_path, monkeypatch):
+    roots = prepare(str(tmp_path))
+    manager = make_manager(FileInventory())
+    pipeline = StreamingPipeline(manager, roots)
+    hasher = manager.remover.finder.hasher
+
+    remove_duplicate_files = manager.remove_duplicate_files
+    def remove_without_reading():
+        monkeypatch.setattr(hasher, "partial_digest", None)
+        monkeypatch.setattr(hasher, "full_digest", None)
+        remove_duplicate_files()
+    monkeypatch.setattr(manager, "remove_duplicate_files", remove_without_reading)
+    pipeline.run()
+
+    assert not os.path.exists(os.path.join(roots[0], "sub", "b"))
+    assert not os.path.exists(os.path.join(roots[0], "empty"))
+
+def test_inventory_is_changed_only_by_event_loop(tmp_path, monkeypatch):
+    roots = prepare(str(tmp_path))
+    inventory = FileInventory()
+    threads = set()
+    remove = inventory.remove
+    def remove_in_thread(index):
+        threads.add(threading.get_ident())
+        remove(index)
+    monkeypatch.setattr(inventory, "remove", remove_in_thread)
+
+    StreamingPipeline(make_manager(inventory), roots, batch_size=2, queue_size=1).run()
+
+    assert threads == {threading.get_ident()}
+    assert len(inventory) == len(inventory.paths())
@@ -0,0 +1,67 @@
+import os
+import stat
+
+from file_manager.manager import FileManager
+from file_manager.plan import ActionPlan, PlannedAction, apply_plan, REMOVE, CHMOD, RENAME
+from file_manager.remover import FileRemover
+
+conf_path = os.path.abspath("tests/clean_files_test")
+
+
+def prepare(path):
+    filenames = list()
+    for name, content in (("empty", ""), ("file.temp", "x"), ("copy1", "same"), ("copy2", "same"), ("bad$name", "bad")):
+        filename = str(path / name)
+        with open(filename, "w") as f:
+            f.write(content)
+        os.chmod(filename, 0o664)
+        filenames.append(filename)
+    return filenames
+
+def test_plan_does_not_touch_files(tmp_path):
+    filenames = prepare(tmp_path)
+    before = {filename: os.stat(filename) for filename in filenames}
+
+    plan = FileManager(conf_path, filenames).plan_files()
+
+    assert {filename: os.stat(filename) for filename in filenames} == before
+    actions = [(action.action, os.path.basename(action.path)) for action in plan]
+    assert (REMOVE, "empty") in actions
+    assert (REMOVE, "file.temp") in actions
+    assert len([action for action in plan if action.reason == "duplicate"]) == 1
+    assert (RENAME, "bad$name") in actions
+    assert (CHMOD, "bad$name") in actions
+
+def test_save_load_and_apply_plan(tmp_path):
+    data = tmp_path / "data"
+    data.mkdir()
+    filenames = prepare(data)
+    plan = FileManager(conf_path, filenames).plan_files()
+    plan.save(str(tmp_path / "plan.jsonl"))
+
+    # file modified after planning is not touched
+    with open(data / "empty", "w") as f:
+        f.write("new content")
+
+    counts = apply_plan(ActionPlan.load(str(tmp_path / "plan.jsonl")), FileRemover())
+
+    assert counts["skipped"] == 1
+    assert sorted(os.listdir(data)) == ["bad_name", "copy2", "empty"]
+    for name in ("bad_name", "copy2"):
+        assert stat.filemode(os.stat(data / name).st_mode) == "-rw-r--r--"
+
+def test_renames_are_applied_after_removing_in_all_directories(tmp_path):
+    (tmp_path / "P" / "a").mkdir(parents=True)
+    (tmp_path / "P" / "b").mkdir()
+    (kept, duplicate) = (str(tmp_path / "P" / "a" / "k,1"), str(tmp_path / "P" / "b" / "dup"))
+    for filename in (kept, duplicate):
+        with open(filename, "w") as f:
+            f.write("same")
+    st = os.stat(duplicate)
+    plan = ActionPlan([PlannedAction(RENAME, kept, "wrong name", 4, os.stat(kept).st_mtime_ns, str(tmp_path / "P" / "a" / "k_1")),
+                       PlannedAction(REMOVE, duplicate, "duplicate", st.st_size, st.st_mtime_ns, kept)])
+
+    counts = apply_plan(plan, FileRemover())
+
+    assert counts == {REMOVE: 1, RENAME: 1}
+    assert os.listdir(tmp_path / "P" / "a") == ["k_1"] and os.listdir(tmp_path / "P" / "b") == []
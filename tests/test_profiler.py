@@ -0,0 +1,88 @@
+import os
+import io
+import json
+import time
+
+from file_manager.manager import FileManager
+from file_manager.inventory import FileInventory
+from file_manager.profiler import RunProfiler, NULL_PROFILER
+from file_manager.log import ActionLog
+from file_manager.utils import get_all_files
+
+conf_path = os.path.abspath("tests/clean_files_test")
+
+
+def prepare(root):
+    files = {"a": "x" * 10000, "sub/b": "x" * 10000, "empty": "", "old.temp": "temporary", "bad:name": "name"}
+    for name, content in files.items():
+        filename = os.path.join(root, name)
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        with open(filename, "w") as f:
+            f.write(content)
+        os.chmod(filename, 0o644)
+    os.chmod(os.path.join(root, "bad:name"), 0o664)
+    os.utime(os.path.join(root, "sub/b"), (1, 1))
+
+def test_profiler_counts_operations(tmp_path):
+    prepare(str(tmp_path))
+    manager = FileManager(conf_path, FileInventory(get_all_files(str(tmp_path))))
+    manager.set_parameters(action_duplicate="new")
+    profiler = RunProfiler()
+    manager.set_profiler(profiler)
+
+    manager.manage_files()
+
+    report = profiler.report()
+    assert report["counters"] == {"files_examined": 5, "unlink": 3, "chmod": 1, "rename": 1, "bytes_read": 2 * 10000}
+    assert set(report["stages"]) == {"classify", "remove_empty_files", "remove_temporary_files", "remove_duplicate_files",
+                                     "change_bad_files_permissions", "rename_wrong_named_files"}
+    assert report["peak_rss_bytes"] > 0
+
+def test_profiler_reports(tmp_path):
+    profiler = RunProfiler()
+    with profiler.stage("scan"):
+        profiler.count("stat", 3)
+    profiler.save_json(str(tmp_path / "profile.json"))
+    profiler.save_prometheus(str(tmp_path / "profile.prom"))
+
+    with open(tmp_path / "profile.json") as f:
+        assert json.load(f)["counters"] == {"stat": 3}
+    with open(tmp_path / "profile.prom") as f:
+        text = f.read()
+    assert 'file_manager_operations{operation="stat"} 3\n' in text
+    assert 'file_manager_stage_seconds{stage="scan"} ' in text
+    assert sorted(os.listdir(tmp_path)) == ["profile.json", "profile.prom"]
+
+def test_disabled_profiler_is_default(tmp_path):
+    manager = FileManager(conf_path, [])
+    assert manager.profiler is NULL_PROFILER
+    with manager.profiler.stage("scan"):
+        manager.profiler.count("stat")
+    assert not manager.profiler.enabled
+
+def test_walker_counts_stat_calls(tmp_path):
+    prepare(str(tmp_path))
+    os.symlink(str(tmp_path / "missing"), str(tmp_path / "broken"))
+    profiler = RunProfiler()
+
+    files = list(get_all_files(str(tmp_path), profiler=profiler))
+
+    assert len(files) == 6
+    # broken symbolic link is statted twice
+    assert profiler.counters == {"stat": 7}
+
+def test_prompt_time_is_not_counted_in_stage(monkeypatch):
+    def answer(question):
+        time.sleep(0.2)
+        return "y"
+    monkeypatch.setattr("builtins.input", answer)
+    profiler = RunProfiler()
+    log = ActionLog(stream=io.StringIO())
+    log.profiler = profiler
+
+    with profiler.stage("plan"):
+        assert log.ask("Remove? ") == "y"
+
+    assert profiler.stages["prompt"] >= 0.2
+    assert profiler.stages["plan"] < 0.1
+    assert profiler.counters == {"prompts": 1}
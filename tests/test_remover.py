@@ -115,3 +115,42 @@ def test_process_group_of_filenames_by_size():
     assert not os.path.exists(filename1)
     assert not os.path.exists(filename2)
     assert os.path.exists(filename3)
+
+def test_process_group_of_filenames_by_size_link():
+    remover = FileRemover()
+    filenames = ["file1", "file2", "file3"]
+    for filename in filenames:
+        with open(filename, "w") as f:
+            f.write("content")
+    os.link("file1", "hard_link")
+    filenames.append("hard_link")
+
+    assert remover.process_group_of_filenames_by_size(filenames, "link") == []
+
+    inodes = set(os.stat(filename).st_ino for filename in filenames)
+    assert len(inodes) == 1
+    for filename in filenames:
+        with open(filename) as f:
+            assert f.read() == "content"
+    assert sorted(os.listdir(os.getcwd())) == sorted(filenames)
+
+def test_failed_linking_keeps_files(monkeypatch):
+    remover = FileRemover()
+    for filename in ("file1", "file2"):
+        with open(filename, "w") as f:
+            f.write("content")
+    # stale temporary file of other process is not touched
+    with open(".file2.{}.tmp".format(os.getpid()), "w") as f:
+        f.write("stale")
+
+    assert remover.process_linked_files("file1", "file2") is None
+    assert sorted(os.listdir(os.getcwd())) == [".file2.{}.tmp".format(os.getpid()), "file1", "file2"]
+    os.remove(".file2.{}.tmp".format(os.getpid()))
+
+    def no_replace(source, target):
+        raise PermissionError("Permission denied")
+
+    monkeypatch.setattr(remover.directories, "replace", no_replace)
+    assert remover.process_linked_files("file1", "file2") is None
+    assert sorted(os.listdir(os.getcwd())) == ["file1", "file2"]
+    assert os.stat("file1").st_ino != os.stat("file2").st_ino
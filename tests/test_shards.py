@@ -0,0 +1,46 @@
+import os
+
+from file_manager.inventory import FileInventory
+from file_manager.scanner import WalkRules
+from file_manager.shards import scan_shard, scan_parallel
+from file_manager.utils import get_all_files
+
+
+def prepare(root):
+    for name in ("a", "b/c", "b/d/e", "b/d/.git/f", "g/h", "g/.git/i", "j/k/l/m"):
+        filename = os.path.join(root, name)
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        with open(filename, "w") as f:
+            f.write(name)
+
+def test_parallel_scan_matches_sequential_walk(tmp_path):
+    roots = [str(tmp_path / "X"), str(tmp_path / "Y1"), str(tmp_path / "Y2")]
+    for root in roots:
+        prepare(root)
+    sequential = FileInventory(get_all_files(roots[0], roots[1:]))
+
+    inventory = scan_parallel(roots, 3, batch_size=2)
+
+    assert inventory.paths() == sequential.paths()
+    for column in ("sizes", "modes", "mtimes", "inodes", "devices"):
+        assert getattr(inventory, column) == getattr(sequential, column)
+    assert len(inventory.directories) == len(sequential.directories)
+
+def test_parallel_scan_counts_pruned_entries(tmp_path):
+    prepare(str(tmp_path))
+    rules = WalkRules([".git"], max_depth=2)
+    expected = FileInventory(get_all_files(str(tmp_path), rules=WalkRules([".git"], max_depth=2))).paths()
+
+    inventory = scan_parallel([str(tmp_path)], 2, rules)
+
+    assert inventory.paths() == expected
+    # b/d/.git, g/.git and j/k/l
+    assert rules.pruned == 3
+
+def test_shard_is_split_into_batches(tmp_path):
+    prepare(str(tmp_path))
+    (batches, pruned, stats) = scan_shard(str(tmp_path / "b"), batch_size=1)
+    assert [batch.paths() for batch in batches] == [[str(tmp_path / "b/c")], [str(tmp_path / "b/d/e")],
+                                                    [str(tmp_path / "b/d/.git/f")]]
+    assert pruned == 0
+    assert stats == 3
@@ -0,0 +1,117 @@
+import os
+import pytest
+
+from file_manager.changer import FileNameSanitizer
+from file_manager.classifier import FileClassifier, EMPTY, WRONG_NAME
+from file_manager.snapshot import TreeSnapshot
+from file_manager.cache import HashCache
+from file_manager.dedup import DuplicateFinder
+from file_manager.manager import FileManager
+
+PAST = 10**9
+conf_path = os.path.abspath("tests/clean_files_test")
+
+
+@pytest.fixture
+def tree(tmp_path):
+    root = tmp_path / "X"
+    (root / "a" / "b").mkdir(parents=True)
+    (root / "a" / "b" / "data").write_text("data")
+    (root / "a" / "empty").write_text("")
+    (root / "wrong:name").write_text("x")
+    settle(root)
+    return root
+
+def settle(root):
+    # directories modified just before scanning are always read again
+    for (directory, _, _) in os.walk(root):
+        os.utime(directory, ns=(PAST, PAST))
+
+def scan(snapshot_path, root):
+    snapshot = TreeSnapshot(str(snapshot_path), "conf")
+    (inventory, classified) = snapshot.scan([str(root)])
+    classifier = FileClassifier("-rw-rw-r--", FileNameSanitizer({":"}, "_"), {".tmp"})
+    classifier.classify_inventory(inventory, classified)
+    return snapshot, inventory, classified
+
+def test_unchanged_tree_is_not_read(tmp_path, tree, monkeypatch):
+    (snapshot, inventory, _) = scan(tmp_path / "snapshot", tree)
+    snapshot.save(inventory)
+    snapshot.close()
+    paths = inventory.paths()
+    flags = list(inventory.flags)
+
+    monkeypatch.setattr(os, "scandir", None)
+    (snapshot, inventory, classified) = scan(tmp_path / "snapshot", tree)
+
+    assert inventory.paths() == paths
+    assert list(inventory.flags) == flags
+    assert all(classified)
+    assert inventory.flags[paths.index(str(tree / "a" / "empty"))] & EMPTY
+    assert inventory.flags[paths.index(str(tree / "wrong:name"))] & WRONG_NAME
+    assert (len(snapshot.scanned), len(snapshot.reused)) == (0, 3)
+
+def test_only_changed_directories_are_read(tmp_path, tree):
+    (snapshot, inventory, _) = scan(tmp_path / "snapshot", tree)
+    snapshot.save(inventory)
+    snapshot.close()
+
+    (tree / "a" / "new").write_text("new")
+    os.remove(tree / "a" / "b" / "data")
+    os.rmdir(tree / "a" / "b")
+    (snapshot, inventory, classified) = scan(tmp_path / "snapshot", tree)
+
+    assert sorted(snapshot.scanned) == [str(tree / "a")]
+    assert inventory.paths() == [str(tree / "wrong:name"), str(tree / "a" / "empty"), str(tree / "a" / "new")]
+    assert list(classified) == [1, 0, 0]
+    snapshot.save(inventory)
+    assert snapshot.connection.execute("SELECT COUNT(*) FROM directories WHERE path = ?",
+                                       (str(tree / "a" / "b"),)).fetchone()[0] == 0
+
+def test_flags_are_not_reused_with_other_configuration(tmp_path, tree):
+    (snapshot, inventory, _) = scan(tmp_path / "snapshot", tree)
+    snapshot.save(inventory)
+    snapshot.close()
+
+    snapshot = TreeSnapshot(str(tmp_path / "snapshot"), "other conf")
+    (inventory, classified) = snapshot.scan([str(tree)])
+
+    assert len(snapshot.reused) == 3
+    assert not any(classified)
+    assert not any(inventory.flags)
+
+@pytest.mark.parametrize("change", ["same size", "appended"])
+def test_files_changed_in_place_are_not_removed_as_duplicates(tmp_path, change):
+    root = tmp_path / "X"
+    (root / "d").mkdir(parents=True)
+    for name in ("a", "b"):
+        (root / "d" / name).write_text("x" * 10000)
+        os.utime(root / "d" / name, ns=(PAST, PAST))
+    (root / "c").write_text("y" * 10000)
+    settle(root)
+    (snapshot, inventory, _) = scan(tmp_path / "snapshot", root)
+    cache = HashCache(str(tmp_path / "cache"))
+    DuplicateFinder(cache=cache).find(inventory, list(inventory.indices()))
+    snapshot.save(inventory)
+    snapshot.close()
+
+    # content changed in place does not change modification time of directory
+    with open(root / "d" / "b", "r+" if change == "same size" else "a") as f:
+        f.write("z" * 100)
+    settle(root)
+    (snapshot, inventory, classified) = scan(tmp_path / "snapshot", root)
+    assert sorted(snapshot.scanned) == [str(root / "d")]
+    assert inventory.sizes[inventory.paths().index(str(root / "d" / "b"))] == os.path.getsize(root / "d" / "b")
+    manager = FileManager(conf_path, inventory)
+    manager.set_known_flags(classified)
+    manager.set_hash_cache(cache)
+    manager.set_parameters(action_duplicate="new")
+
+    manager.manage_files()
+
+    assert os.path.exists(root / "d" / "a") and os.path.exists(root / "d" / "b")
+    snapshot.save(inventory)
+    assert snapshot.connection.execute("SELECT size FROM files WHERE name = 'b'").fetchone()[0] == \
+        os.path.getsize(root / "d" / "b")
+    snapshot.close()
+    cache.close()
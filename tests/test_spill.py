@@ -0,0 +1,117 @@
+import os
+import random
+from array import array
+
+import pytest
+
+from file_manager.inventory import FileInventory
+from file_manager.manager import FileManager
+from file_manager.profiler import RunProfiler
+from file_manager.mover import move_files_to_main_dir
+from file_manager.spill import parse_size, needs_spill, sorted_groups, spilled_groups, SpilledArray, SpilledStrings, BLOCK_SIZE
+from file_manager.utils import get_all_files
+
+conf_path = os.path.abspath("tests/clean_files_test")
+
+
+def test_parse_size():
+    assert parse_size("1024") == 1024
+    assert parse_size("512M") == 512 * 1024 ** 2
+    assert parse_size("1.5GiB") == 3 * 1024 ** 3 // 2
+    assert parse_size("2kb") == 2048
+    with pytest.raises(ValueError):
+        parse_size("much")
+
+def test_spilled_groups_match_sorted_groups():
+    generator = random.Random(7)
+    inventory = FileInventory()
+    for number in range(5000):
+        inventory.add("dir{}/file{}".format(number % 13, number), size=generator.randrange(300), ino=number)
+    for index in range(0, 5000, 7):
+        inventory.remove(index)
+
+    expected = [group for group in sorted_groups(inventory) if len(group) > 1]
+    assert list(spilled_groups(inventory, cache_size=64)) == expected
+    assert needs_spill(inventory, 100 * 1024)
+    assert not needs_spill(inventory, 10 * 1024 * 1024)
+    assert not needs_spill(inventory, None)
+
+def test_spilled_columns_behave_like_in_memory_ones():
+    numbers = SpilledArray("q", [5, -1])
+    for number in range(10000):
+        numbers.append(number)
+    numbers.extend(array("q", [7, 8]))
+    numbers[1] = 3
+    assert len(numbers) == 10004 and numbers[1] == 3 and numbers[-1] == 8 and list(numbers)[:3] == [5, 3, 0]
+    with pytest.raises(IndexError):
+        numbers[10004]
+
+    strings = SpilledStrings(indexed=True, cache_blocks=2)
+    names = ["name{}".format(number) for number in range(3 * BLOCK_SIZE + 10)] + [os.fsdecode(b"bad\xff")]
+    strings.extend(names)
+    strings[5] = names[5] = "renamed"
+    strings[-1] = names[-1] = "last"
+    assert [strings[index] for index in range(len(names))] == names
+    assert list(strings) == names
+    assert strings.find("name2000") == 2000 and strings.find("last") == len(names) - 1 and strings.find("name5") is None
+
+def test_inventory_is_spilled_while_files_are_added():
+    files = [("dir{}/file{}".format(number // 10, number), number % 100) for number in range(50000)]
+    inventory = FileInventory(memory_limit=256 * 1024)
+    in_memory = FileInventory()
+    for (path, size) in files:
+        inventory.add(path, size=size, ino=size)
+        in_memory.add(path, size=size, ino=size)
+    for index in range(0, 50000, 3):
+        inventory.remove(index)
+        in_memory.remove(index)
+    inventory.rename(1, "other/name")
+    in_memory.rename(1, "other/name")
+
+    assert inventory.spilled and not in_memory.spilled
+    assert inventory.memory_usage() < in_memory.memory_usage()
+    assert inventory.paths() == in_memory.paths()
+    assert inventory.directory_id("dir5") == in_memory.directory_id("dir5")
+    assert len(inventory) == len(in_memory)
+    assert list(spilled_groups(inventory)) == list(spilled_groups(in_memory))
+
+def test_manager_removes_duplicates_on_disk(tmp_path):
+    for name, content in (("a", "same"), ("b", "same"), ("c", "other"), ("d", "alone!"), ("sub/e", "same")):
+        os.makedirs(os.path.dirname(tmp_path / name), exist_ok=True)
+        with open(tmp_path / name, "w") as f:
+            f.write(content)
+        os.chmod(tmp_path / name, 0o644)
+        os.utime(tmp_path / name, (1, 1))
+    manager = FileManager(conf_path, FileInventory(get_all_files(str(tmp_path))))
+    manager.set_parameters(action_duplicate="new")
+    manager.set_memory_limit(1)
+    profiler = RunProfiler()
+    manager.set_profiler(profiler)
+
+    manager.manage_files()
+
+    remaining = sorted(os.path.relpath(os.path.join(root, name), tmp_path)
+                       for (root, _, names) in os.walk(tmp_path) for name in names)
+    assert len(remaining) == 3 and {"c", "d"} < set(remaining)
+    assert profiler.report()["counters"]["spilled_files"] == 5
+    assert manager.get_inventory().spilled
+
+def test_spilled_run_equals_run_in_memory(tmp_path):
+    def run(root, memory_limit):
+        roots = [os.path.join(root, name) for name in ("X", "Y1")]
+        for name, content in (("X/sub/a", "same"), ("Y1/sub/a", "same"), ("Y1/sub/b", "b"), ("X/c", "c"),
+                              ("Y1/c", "other c"), ("Y1/new/d", "d"), ("X/e", "e"), ("Y1/f", "e")):
+            filename = os.path.join(root, name)
+            os.makedirs(os.path.dirname(filename), exist_ok=True)
+            with open(filename, "w") as f:
+                f.write(content)
+            os.chmod(filename, 0o644)
+        manager = FileManager(conf_path, FileInventory(get_all_files(roots[0], roots[1:]), memory_limit))
+        manager.set_parameters(action_duplicate="new", action_name_conflict="both")
+        manager.set_memory_limit(memory_limit)
+        manager.manage_files(roots)
+        move_files_to_main_dir(roots[0], roots[1:], manager.get_inventory())
+        assert manager.get_inventory().spilled == (memory_limit is not None)
+        return sorted(os.path.relpath(path, root) for path in manager.get_inventory().paths())
+
+    assert run(str(tmp_path / "spilled"), 1) == run(str(tmp_path / "memory"), None)
@@ -0,0 +1,74 @@
+import os
+
+from file_manager.manager import FileManager
+from file_manager.temporary import PatternMatcher, TemporaryRules
+from file_manager.utils import load_configuration, load_permission_rules, load_temporary_rules, get_all_files
+
+old_conf_path = os.path.abspath("tests/clean_files_test")
+
+INI = """# test configuration
+[files]
+permissions = rw-r--r--
+bad-characters = : $ ,
+substitute = _
+
+[permissions]
+*.sh = rwxr-xr-x
+executable = 755
+
+[temporary]
+patterns = *.swp .#* ~$*.docx core.[0-9]* __pycache__/*
+
+[temporary.copies]
+patterns = *.bak
+    *.orig
+"""
+
+
+def test_pattern_matcher():
+    matcher = PatternMatcher(["*.swp", ".#*", "~$*.docx", "core.[0-9]*", "__pycache__/*", "Thumbs.db", "*~"])
+
+    for (directory, name) in (("a", "x.swp"), ("a", ".#notes"), ("a", "~$report.docx"), ("a", "core.123"),
+                              ("a/__pycache__", "m.pyc"), ("__pycache__", "m.pyc"), ("a", "Thumbs.db"), ("a", "backup~")):
+        assert matcher.matches(directory, name), name
+    for (directory, name) in (("a", "x.swp.txt"), ("a", "notes.#"), ("a", "report.docx"), ("a", "core.dump"),
+                              ("a/pycache", "m.pyc"), ("a", "thumbs.db")):
+        assert not matcher.matches(directory, name), name
+
+def test_rules_of_copy_directories():
+    rules = TemporaryRules(["*.tmp"], main=["*.log"], copies=["*.bak"])
+    rules.set_roots(["root/Y1/"])
+
+    assert rules.is_temporary("root/X", "a.tmp") and rules.is_temporary("root/Y1/sub", "a.tmp")
+    assert rules.is_temporary("root/X", "a.log") and not rules.is_temporary("root/Y1", "a.log")
+    assert rules.is_temporary("root/Y1/sub", "a.bak") and not rules.is_temporary("root/X", "a.bak")
+    assert not rules.is_temporary("root/Y10", "a.bak")
+
+def test_structured_configuration(tmp_path):
+    conf = tmp_path / "conf.ini"
+    conf.write_text(INI)
+
+    assert load_configuration(str(conf)) == ("rw-r--r--", {":", "$", ","}, "_", {".swp", ".bak", ".orig"})
+    assert load_permission_rules(str(conf)) == [("*.sh", "rwxr-xr-x"), ("executable", "755")]
+    assert load_temporary_rules(str(conf)) == (["*.swp", ".#*", "~$*.docx", "core.[0-9]*", "__pycache__/*"], [], ["*.bak", "*.orig"])
+
+def test_old_configuration_still_loads():
+    assert load_temporary_rules(old_conf_path) == (["*.temp", "*.tmp", "*~"], [], [])
+    assert load_permission_rules(old_conf_path) == []
+
+def test_manager_removes_temporary_files_by_patterns(tmp_path):
+    conf = tmp_path / "conf.ini"
+    conf.write_text(INI)
+    files = ["X/a.swp", "X/keep.bak", "X/__pycache__/m.pyc", "X/good", "Y1/b.bak", "Y1/good.orig", "Y1/other"]
+    for name in files:
+        os.makedirs(os.path.dirname(tmp_path / name), exist_ok=True)
+        (tmp_path / name).write_text(name)
+    roots = [str(tmp_path / "X"), str(tmp_path / "Y1")]
+    manager = FileManager(str(conf), list(get_all_files(roots[0], roots[1:])))
+    manager.set_parameters(action_temporary=True, action_duplicate="none")
+
+    manager.manage_files(roots)
+
+    remaining = sorted(os.path.relpath(os.path.join(directory, name), tmp_path)
+                       for (directory, _, names) in os.walk(tmp_path) for name in names if name != "conf.ini")
+    assert remaining == ["X/good", "X/keep.bak", "Y1/other"]
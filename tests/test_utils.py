@@ -1,6 +1,28 @@
-from file_manager.utils import perm_to_num
+import os
+
+from file_manager.utils import perm_to_num, get_files, get_all_files
 
 def test_perm_to_num():
     assert perm_to_num("---------") == 0
     assert perm_to_num("-rwxrwxrwx") == 511
-    assert perm_to_num("r---w---x") == 273
\ No newline at end of file
+    assert perm_to_num("r---w---x") == 273
+
+def test_get_all_files(tmp_path):
+    main_dir = tmp_path / "X"
+    copy_dir = tmp_path / "Y1"
+    (main_dir / "a" / "b").mkdir(parents=True)
+    copy_dir.mkdir()
+    (main_dir / "file1").write_text("1")
+    (main_dir / "a" / "b" / "file2").write_text("22")
+    (copy_dir / "file3").write_text("")
+
+    assert sorted(get_files(str(main_dir))) == [str(main_dir / "a" / "b" / "file2"), str(main_dir / "file1")]
+
+    records = list(get_all_files(str(main_dir), [str(copy_dir)]))
+    assert len(records) == 3
+    for record in records:
+        st = os.stat(record.path)
+        assert record.size == st.st_size
+        assert record.mode == st.st_mode
+        assert (record.ino, record.dev) == (st.st_ino, st.st_dev)
+        assert record.mtime_ns == st.st_mtime_ns
@@ -0,0 +1,69 @@
+import os
+
+from file_manager.scanner import WalkRules, walk_files
+from file_manager.snapshot import TreeSnapshot
+
+
+def prepare(root):
+    for name in ("a", ".git/objects/1", "node_modules/m/index.js", "src/b", "src/deep/c", "src/deep/deeper/d",
+                 "src/x.swp", "data/.git/e"):
+        filename = os.path.join(root, name)
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        with open(filename, "w") as f:
+            f.write(name)
+
+def walked(root, rules):
+    return sorted(os.path.relpath(record.path, root) for record in walk_files(root, rules))
+
+def test_excluded_entries_are_pruned(tmp_path):
+    prepare(str(tmp_path))
+    rules = WalkRules([".git", "node_modules", "*.swp"])
+
+    assert walked(str(tmp_path), rules) == ["a", "src/b", "src/deep/c", "src/deep/deeper/d"]
+    # .git, data/.git, node_modules and x.swp
+    assert rules.pruned == 4
+
+def test_excluded_path_globs(tmp_path):
+    prepare(str(tmp_path))
+
+    assert walked(str(tmp_path), WalkRules(["src/deep"])) == \
+        [".git/objects/1", "a", "data/.git/e", "node_modules/m/index.js", "src/b", "src/x.swp"]
+
+def test_max_depth(tmp_path):
+    prepare(str(tmp_path))
+
+    assert walked(str(tmp_path), WalkRules(max_depth=0)) == ["a"]
+    rules = WalkRules(max_depth=2)
+    assert walked(str(tmp_path / "src"), rules) == ["b", "deep/c", "deep/deeper/d", "x.swp"]
+    assert walked(str(tmp_path / "src"), WalkRules(max_depth=1)) == ["b", "deep/c", "x.swp"]
+
+def test_one_file_system_stays_on_device(tmp_path):
+    prepare(str(tmp_path))
+    rules = WalkRules(one_file_system=True)
+    assert walked(str(tmp_path), rules) == walked(str(tmp_path), None)
+    assert rules.pruned == 0
+
+    class Entry:
+        def stat(self):
+            return os.stat_result((0o40755, 1, 2, 1, 0, 0, 0, 0, 0, 0))
+
+    assert rules.prunes(str(tmp_path), "mnt", 1, 1, Entry())
+    assert not rules.prunes(str(tmp_path), "mnt", 1, 2, Entry())
+    assert rules.pruned == 1
+
+def test_snapshot_scan_prunes_and_keeps_subdirectories(tmp_path):
+    root = str(tmp_path / "root")
+    prepare(root)
+    snapshot = TreeSnapshot(str(tmp_path / "snapshot.db"))
+    rules = WalkRules(["node_modules", ".git"], max_depth=1)
+
+    inventory, _ = snapshot.scan([root], rules)
+    snapshot.save(inventory)
+    assert sorted(os.path.relpath(path, root) for path in inventory.paths()) == ["a", "src/b", "src/x.swp"]
+    # .git, node_modules, data/.git and src/deep
+    assert rules.pruned == 4
+
+    # pruned subdirectories are still saved, so the next run without rules reads them
+    inventory, _ = snapshot.scan([root])
+    assert len(inventory) == 8
+    snapshot.close()
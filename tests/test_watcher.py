@@ -0,0 +1,81 @@
+import os
+import time
+import pytest
+
+from file_manager.manager import FileManager
+from file_manager.watcher import FileWatcher, IN_Q_OVERFLOW
+
+conf_path = os.path.abspath("tests/clean_files_test")
+PAST = 10**9
+
+
+def write(filename, content):
+    with open(filename, "w") as f:
+        f.write(content)
+    os.chmod(filename, 0o644)
+    os.utime(filename, ns=(PAST, PAST))
+
+def wait_for(watcher, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        processed = watcher.poll(0.05)
+        if processed:
+            return processed
+    raise AssertionError("no file was processed")
+
+@pytest.fixture
+def watched(tmp_path):
+    root = tmp_path / "X"
+    root.mkdir()
+    write(root / "original", "content")
+    watcher = FileWatcher([str(root)], debounce=0)
+    manager = FileManager(conf_path, watcher.scan())
+    manager.set_parameters(action_duplicate="new", action_wrong_name=True, action_permissions=True)
+    manager.manage_files()
+    watcher.attach(manager)
+    yield root, watcher
+    watcher.close()
+
+def test_new_files_are_managed(watched):
+    (root, watcher) = watched
+
+    write(root / "file.temp", "temporary")
+    wait_for(watcher)
+    write(root / "copy", "content")
+    wait_for(watcher)
+    write(root / "bad:name", "other")
+    wait_for(watcher)
+
+    assert sorted(os.listdir(root)) == ["bad_name", "original"]
+
+def test_files_with_future_modification_time_are_managed(watched):
+    (root, watcher) = watched
+
+    # e.g. copied with modification time from host with skewed clock
+    write(root / "copy", "content")
+    future = time.time_ns() + 86400 * 10**9
+    os.utime(root / "copy", ns=(future, future))
+    wait_for(watcher)
+
+    assert os.listdir(root) == ["original"]
+
+def test_new_directories_are_watched(watched):
+    (root, watcher) = watched
+
+    (root / "sub").mkdir()
+    watcher.poll(0.5)
+    write(root / "sub" / "empty", "")
+    wait_for(watcher)
+
+    assert os.listdir(root / "sub") == []
+
+def test_overflow_rescans_changed_directories(watched):
+    (root, watcher) = watched
+
+    # events are lost: only modification time of directory tells about new file
+    write(root / "copy", "content")
+    watcher.inotify.read(0.5)
+    watcher.handle([(-1, IN_Q_OVERFLOW, 0, "")])
+    watcher.process(watcher.ready())
+
+    assert os.listdir(root) == ["original"]